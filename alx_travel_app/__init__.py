@@ -1 +1,4 @@
-# This file marks the directory as a Python package. 
\ No newline at end of file
+# This file marks the directory as a Python package. 
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -1,9 +1,9 @@
 from django.contrib import admin
-from .models import Listing, Booking, Payment
+from .models import AuthToken, Listing, Booking, Payment, RatePeriod, StayDiscount
 
 @admin.register(Listing)
 class ListingAdmin(admin.ModelAdmin):
-    list_display = ['title', 'price', 'location', 'owner', 'created_at']
+    list_display = ['title', 'price', 'location', 'latitude', 'longitude', 'owner', 'created_at']
     list_filter = ['created_at', 'price']
     search_fields = ['title', 'description', 'location']
 
@@ -18,4 +18,21 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ['id', 'booking', 'amount', 'currency', 'status', 'created_at']
     list_filter = ['status', 'currency', 'created_at']
     search_fields = ['booking__user__username', 'booking__listing__title', 'chapa_reference']
-    readonly_fields = ['id', 'created_at', 'updated_at'] 
\ No newline at end of file
+    readonly_fields = ['id', 'created_at', 'updated_at'] 
+
+@admin.register(RatePeriod)
+class RatePeriodAdmin(admin.ModelAdmin):
+    list_display = ['listing', 'name', 'first_night', 'last_night', 'price', 'weekend_price', 'priority']
+    list_filter = ['first_night']
+    search_fields = ['listing__title', 'name']
+
+@admin.register(StayDiscount)
+class StayDiscountAdmin(admin.ModelAdmin):
+    list_display = ['listing', 'min_nights', 'percent']
+    search_fields = ['listing__title']
+
+@admin.register(AuthToken)
+class AuthTokenAdmin(admin.ModelAdmin):
+    list_display = ['user', 'created_at', 'expires_at']
+    search_fields = ['user__username']
+    readonly_fields = ['digest', 'created_at']
@@ -0,0 +1,254 @@
+"""
+Per-listing revenue, occupancy and booking counts from rollup tables.
+
+Figures are keyed by the stay, not by when they were recorded: a
+confirmed booking adds a booked night to each night of its stay and one
+booking to its check-in day, and a completed payment adds its amount to
+the check-in day of its booking. ``transitions`` applies the increments
+as statuses move (and the decrements when a confirmed booking or a
+completed payment is cancelled), so the tables are a function of the
+current bookings and payments: :func:`rebuild_rollups` recomputes them
+exactly, and a report is a range scan over at most one row per listing
+and day (or month), however many bookings there are.
+"""
+from calendar import monthrange
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Sum, Value, When
+from .availability import nights_between
+from .models import Booking, ListingDailyStats, ListingMonthlyStats, Payment
+from .pricing import ZERO
+
+# The status in which a booking or payment counts towards the rollups
+COUNTED = {Booking: 'confirmed', Payment: 'completed'}
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def record(listing_id, check_in, check_out, stays=0, revenue=ZERO):
+    """
+    Add ``stays`` confirmed stays of [check_in, check_out) and ``revenue``
+    to a listing's rollups; negative values take them out again
+    """
+    if not stays and not revenue:
+        return
+    days = list(nights_between(check_in, check_out)) if stays else [check_in]
+    months = defaultdict(int)
+    for day in days:
+        months[month_of(day)] += 1
+    # Part of the caller's transaction (the status change) when there is one
+    with transaction.atomic(savepoint=False):
+        if stays > 0 or revenue > 0:
+            # Removals only touch rows their earlier addition created
+            ListingDailyStats.objects.bulk_create(
+                [ListingDailyStats(listing_id=listing_id, day=day) for day in days],
+                ignore_conflicts=True
+            )
+            ListingMonthlyStats.objects.bulk_create(
+                [ListingMonthlyStats(listing_id=listing_id, month=month) for month in months],
+                ignore_conflicts=True
+            )
+        ListingDailyStats.objects.filter(
+            listing_id=listing_id, day__gte=days[0], day__lte=days[-1]
+        ).update(
+            nights_booked=F('nights_booked') + stays,
+            bookings=F('bookings') + _on(check_in, 'day', stays),
+            revenue=F('revenue') + _on(check_in, 'day', revenue),
+        )
+        first_month = month_of(check_in)
+        ListingMonthlyStats.objects.filter(listing_id=listing_id, month__in=list(months)).update(
+            nights_booked=F('nights_booked') + Case(
+                *(When(month=month, then=Value(stays * nights)) for month, nights in months.items()),
+                default=Value(0), output_field=IntegerField()
+            ),
+            bookings=F('bookings') + _on(first_month, 'month', stays),
+            revenue=F('revenue') + _on(first_month, 'month', revenue),
+        )
+
+
+def _on(key, field, value):
+    """``value`` for the row whose ``field`` is ``key``, zero for the others"""
+    if isinstance(value, int):
+        return Case(When(**{field: key}, then=Value(value)), default=Value(0))
+    return Case(
+        When(**{field: key}, then=Value(value)), default=Value(ZERO),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+def record_booking(booking, stays=0, revenue=ZERO):
+    record(booking.listing_id, booking.check_in, booking.check_out, stays, revenue)
+
+
+def contribution(booking):
+    """What a booking adds to the rollups as it stands: (stays, revenue)"""
+    stays = int(booking.status == COUNTED[Booking])
+    try:
+        payment = booking.payment
+    except Payment.DoesNotExist:
+        payment = None
+    if payment is not None and payment.status == COUNTED[Payment]:
+        return stays, payment.amount
+    return stays, ZERO
+
+
+def record_transition(instance, previous, target):
+    """Apply a status change made by ``transitions`` to the rollups"""
+    model = type(instance)
+    sign = (target == COUNTED[model]) - (previous == COUNTED[model])
+    if not sign:
+        return
+    if model is Booking:
+        record_booking(instance, stays=sign)
+    else:
+        record_booking(instance.booking, revenue=sign * instance.amount)
+
+
+def record_update(before, booking):
+    """Move a booking's figures after its listing or dates were edited"""
+    if (before.listing_id, before.check_in, before.check_out) == (
+            booking.listing_id, booking.check_in, booking.check_out):
+        return
+    stays, revenue = contribution(booking)
+    with transaction.atomic():
+        record_booking(before, -stays, -revenue)
+        record_booking(booking, stays, revenue)
+
+
+def record_removal(booking):
+    """Take out the figures of a booking that is being deleted"""
+    stays, revenue = contribution(booking)
+    record_booking(booking, -stays, -revenue)
+
+
+def rebuild_rollups(listing_id):
+    """Recompute a listing's rollup rows from its bookings and payments"""
+    daily = defaultdict(lambda: [0, 0, ZERO])
+    stays = Booking.objects.filter(
+        listing_id=listing_id, status=COUNTED[Booking]
+    ).values_list('check_in', 'check_out')
+    for check_in, check_out in stays:
+        daily[check_in][1] += 1
+        for night in nights_between(check_in, check_out):
+            daily[night][0] += 1
+    payments = Payment.objects.filter(
+        booking__listing_id=listing_id, status=COUNTED[Payment]
+    ).values_list('booking__check_in', 'amount')
+    for check_in, amount in payments:
+        daily[check_in][2] += amount
+    monthly = defaultdict(lambda: [0, 0, ZERO])
+    for day, figures in daily.items():
+        totals = monthly[month_of(day)]
+        for index, value in enumerate(figures):
+            totals[index] += value
+    with transaction.atomic():
+        ListingDailyStats.objects.filter(listing_id=listing_id).delete()
+        ListingMonthlyStats.objects.filter(listing_id=listing_id).delete()
+        ListingDailyStats.objects.bulk_create([
+            ListingDailyStats(
+                listing_id=listing_id, day=day, nights_booked=nights, bookings=count, revenue=revenue
+            )
+            for day, (nights, count, revenue) in daily.items()
+        ], batch_size=1000)
+        ListingMonthlyStats.objects.bulk_create([
+            ListingMonthlyStats(
+                listing_id=listing_id, month=month, nights_booked=nights, bookings=count,
+                revenue=revenue
+            )
+            for month, (nights, count, revenue) in monthly.items()
+        ])
+    return len(daily)
+
+
+def buckets(period, start, end):
+    """The (first day, days) of each day or month from ``start`` to ``end`` inclusive"""
+    if period == 'day':
+        return [(day, 1) for day in nights_between(start, end + timedelta(days=1))]
+    result, month = [], month_of(start)
+    while month <= end:
+        days = monthrange(month.year, month.month)[1]
+        result.append((month, days))
+        month += timedelta(days=days)
+    return result
+
+
+def report(listings, period, start, end):
+    """
+    Figures for ``listings`` (id -> currency) over [start, end], per day or month
+
+    Revenue is summed per currency. Months are whole: ``start`` and ``end``
+    widen to the months they fall in.
+    """
+    periods = buckets(period, start, end)
+    start, end = periods[0][0], periods[-1][0] + timedelta(days=periods[-1][1] - 1)
+    if period == 'day':
+        rows = ListingDailyStats.objects.filter(
+            listing_id__in=listings, day__gte=start, day__lte=end
+        ).values_list('listing_id', 'day')
+    else:
+        rows = ListingMonthlyStats.objects.filter(
+            listing_id__in=listings, month__gte=start, month__lte=end
+        ).values_list('listing_id', 'month')
+    rows = rows.annotate(
+        nights=Sum('nights_booked'), count=Sum('bookings'), revenue=Sum('revenue')
+    ).order_by()
+
+    by_bucket = defaultdict(lambda: [0, 0, defaultdict(lambda: ZERO)])
+    by_listing = defaultdict(lambda: [0, 0, ZERO])
+    for listing_id, bucket, nights, count, revenue in rows:
+        figures = by_bucket[bucket]
+        figures[0] += nights
+        figures[1] += count
+        figures[2][listings[listing_id]] += revenue
+        totals = by_listing[listing_id]
+        totals[0] += nights
+        totals[1] += count
+        totals[2] += revenue
+
+    available = len(listings) * sum(days for _, days in periods)
+    series = []
+    for bucket, days in periods:
+        nights, count, revenue = by_bucket[bucket]
+        series.append(_figures(
+            nights, len(listings) * days, count, revenue, date=bucket
+        ))
+    totals = _figures(
+        sum(figures[0] for figures in by_bucket.values()), available,
+        sum(figures[1] for figures in by_bucket.values()),
+        _merge(figures[2] for figures in by_bucket.values())
+    )
+    listing_days = sum(days for _, days in periods)
+    per_listing = {}
+    for listing_id, currency in listings.items():
+        nights, count, revenue = by_listing[listing_id]
+        per_listing[listing_id] = _figures(nights, listing_days, count, {currency: revenue})
+    return {
+        'period': period,
+        'start': start,
+        'end': end,
+        'totals': totals,
+        'series': series,
+        'listings': per_listing,
+    }
+
+
+def _merge(revenues):
+    merged = defaultdict(lambda: ZERO)
+    for revenue in revenues:
+        for currency, amount in revenue.items():
+            merged[currency] += amount
+    return merged
+
+
+def _figures(nights, available, count, revenue, **extra):
+    return dict(
+        extra,
+        nights_booked=nights,
+        occupancy=round(nights / available, 4) if available else 0.0,
+        bookings=count,
+        # Amounts as exact strings, as everywhere else in the API
+        revenue={currency: str(amount) for currency, amount in sorted(revenue.items()) if amount},
+    )
@@ -0,0 +1,188 @@
+"""
+Async versions of the Chapa-bound payment actions.
+
+The DRF actions under ``/api/bookings/`` and ``/api/payments/`` queue a
+payment job and return 202. These views call Chapa inline instead and
+answer with the outcome, awaiting the HTTP call rather than holding a
+worker thread for it, so under an ASGI server one process can keep many
+slow Chapa calls in flight. ORM work runs in ``sync_to_async`` (or the
+async queryset API) and reuses the helpers the payment jobs use.
+"""
+import logging
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .bulk import payment_for
+from .chapa_service import ChapaService
+from .models import Booking, Payment
+from .tasks import apply_verification, record_checkout
+from .throttling import PAYMENT_THROTTLES, first_refusal
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """What the throttles read off a DRF view, for these plain views"""
+    throttle_scope = 'payments'
+
+    def __init__(self, action):
+        self.action = action
+
+
+@sync_to_async
+def authenticate(request, action):
+    """
+    Authenticate with the API's configured DRF authenticators and apply the
+    payment throttles, as the DRF actions of the same name do.
+
+    Returns ``(drf_request, None)`` for an authenticated user and
+    ``(None, response)`` with the 401/403/429/503 DRF would have sent otherwise.
+    """
+    authenticators = [cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    parsers = [cls() for cls in api_settings.DEFAULT_PARSER_CLASSES]
+    drf_request = Request(request, parsers=parsers, authenticators=authenticators)
+    try:
+        user = drf_request.user
+        if not user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        throttle = first_refusal(
+            drf_request, Endpoint(action), (cls() for cls in PAYMENT_THROTTLES)
+        )
+        if throttle is not None:
+            raise exceptions.Throttled(throttle.wait())
+        # Parse the body here too, while we are off the event loop
+        drf_request.data
+    except exceptions.APIException as e:
+        response = JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+        header = authenticators[0].authenticate_header(drf_request) if authenticators else None
+        if isinstance(e, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            if header:
+                response['WWW-Authenticate'] = header
+            else:
+                response.status_code = status.HTTP_403_FORBIDDEN
+        if getattr(e, 'wait', None):
+            response['Retry-After'] = str(e.wait)
+        return None, response
+    request.user = user
+    return drf_request, None
+
+
+def not_found(model):
+    return JsonResponse(
+        {'detail': f'No {model._meta.object_name} matches the given query.'},
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+
+def chapa_error(result):
+    """Map a failed ChapaService result to 503 (worth retrying) or 502"""
+    code = status.HTTP_503_SERVICE_UNAVAILABLE if result.get('retryable') else status.HTTP_502_BAD_GATEWAY
+    return JsonResponse({'error': result['error']}, status=code)
+
+
+@sync_to_async
+def create_payment(booking):
+    """Create the booking's payment, or fetch the one a concurrent request created"""
+    try:
+        with transaction.atomic():
+            payment = payment_for(booking)
+            payment.save()
+    except IntegrityError:
+        # Lost the race on the one-to-one with the booking
+        return Payment.objects.get(booking=booking)
+    logger.info('Payment record created for booking %s', booking.id)
+    return payment
+
+
+@csrf_exempt
+@require_POST
+async def initiate_payment(request, pk):
+    """Create the Chapa checkout for a booking and return its URL"""
+    drf_request, denied = await authenticate(request, 'initiate_payment')
+    if denied:
+        return denied
+
+    bookings = Booking.objects.select_related('user', 'listing', 'payment')
+    if not drf_request.user.is_staff:
+        bookings = bookings.filter(user=drf_request.user)
+    booking = await bookings.filter(pk=pk).afirst()
+    if booking is None:
+        return not_found(Booking)
+
+    payment = getattr(booking, 'payment', None)
+    if payment is not None and payment.payment_url:
+        return JsonResponse({
+            'message': 'Payment already initiated',
+            'payment_url': payment.payment_url,
+            'payment_id': str(payment.id)
+        })
+    if payment is None:
+        payment = await create_payment(booking)
+
+    result = await ChapaService().ainitiate_payment(
+        booking, amount=float(payment.amount), currency=payment.currency
+    )
+    if not result['success']:
+        return chapa_error(result)
+    checkout = await sync_to_async(record_checkout)(payment, result)
+    return JsonResponse({
+        'message': 'Payment initiated',
+        'payment_id': str(payment.id),
+        **checkout
+    })
+
+
+async def _verify(payment):
+    result = await ChapaService().averify_payment(payment.chapa_reference)
+    if not result['success']:
+        return chapa_error(result)
+    outcome = await sync_to_async(apply_verification)(payment, result['status'])
+    return JsonResponse({'payment_id': str(payment.id), **outcome})
+
+
+@csrf_exempt
+@require_POST
+async def verify_payment(request):
+    """Verify a payment by its Chapa reference and apply the result"""
+    drf_request, denied = await authenticate(request, 'verify')
+    if denied:
+        return denied
+
+    reference = drf_request.data.get('reference')
+    if not reference:
+        return JsonResponse({
+            'error': 'Reference is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    payments = Payment.objects.select_related('booking__user', 'booking__listing')
+    if not drf_request.user.is_staff:
+        payments = payments.filter(booking__user=drf_request.user)
+    payment = await payments.filter(chapa_reference=reference).afirst()
+    if payment is None:
+        return not_found(Payment)
+    return await _verify(payment)
+
+
+@csrf_exempt
+@require_POST
+async def check_status(request, pk):
+    """Fetch one payment's status from Chapa and apply it"""
+    drf_request, denied = await authenticate(request, 'check_status')
+    if denied:
+        return denied
+
+    payments = Payment.objects.select_related('booking__user', 'booking__listing')
+    if not drf_request.user.is_staff:
+        payments = payments.filter(booking__user=drf_request.user)
+    payment = await payments.filter(pk=pk).afirst()
+    if payment is None:
+        return not_found(Payment)
+    if not payment.chapa_reference:
+        return JsonResponse({
+            'error': 'No Chapa reference found for this payment'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return await _verify(payment)
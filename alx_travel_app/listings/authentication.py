@@ -0,0 +1,181 @@
+"""
+Token authentication that resolves users without a password hash or a
+database query per request.
+
+Clients exchange a username and password for an opaque token once, at
+``POST /api/auth/token/``, and send ``Authorization: Token <key>``. Keys
+carry 256 random bits, so a SHA-256 digest is all the database stores and
+all a lookup needs. Resolved tokens are kept in a per-process LRU for
+``AUTH_TOKEN_CACHE_TTL`` seconds; a hit costs one read of the shared cache
+for revocation marks. Deleting a token (logout, the admin, the user's
+deletion) or saving its user marks the digest there, so every process
+drops its copy on the next request, provided that cache really is shared:
+with a per-process backend such as locmem a revoked token stays valid in
+the other workers until their copy expires, which ``check --deploy``
+reports as an error.
+"""
+import copy
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from .metrics import auth_token_lookups
+from .models import AuthToken
+
+KEYWORD = 'Token'
+
+
+def digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def revoked_key(token_digest):
+    return f'auth:revoked:{token_digest}'
+
+
+class TokenCache:
+    """Least-recently-used map of token digests to (user, expiry, cached at)"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token_digest):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token_digest)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[token_digest]
+                return None
+            self._entries.move_to_end(token_digest)
+            return entry
+
+    def put(self, token_digest, user, expires_at):
+        now = time.time()
+        entry = (user, min(now + settings.AUTH_TOKEN_CACHE_TTL, expires_at.timestamp()), now)
+        with self._lock:
+            self._entries[token_digest] = entry
+            self._entries.move_to_end(token_digest)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def discard(self, token_digest):
+        with self._lock:
+            self._entries.pop(token_digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+tokens = TokenCache()
+
+
+def get_cache():
+    return caches[settings.AUTH_TOKEN_CACHE_ALIAS]
+
+
+# Backends whose entries no other process can see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.security, deploy=True)
+def check_revocation_cache(app_configs, **kwargs):
+    """Revocation marks must reach every worker, so their cache cannot be per-process"""
+    backend = settings.CACHES.get(settings.AUTH_TOKEN_CACHE_ALIAS, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Error(
+        f'AUTH_TOKEN_CACHE_ALIAS {settings.AUTH_TOKEN_CACHE_ALIAS!r} uses {backend}, which '
+        'other processes cannot read, so a revoked token stays valid in them.',
+        hint='Point CACHE_URL (or the alias) at a shared cache such as Redis.',
+        id='listings.E001',
+    )]
+
+
+def issue_token(user):
+    """Create a token for ``user`` and return its key, which is not stored"""
+    key = secrets.token_urlsafe(32)
+    token = AuthToken.objects.create(
+        digest=digest(key), user=user,
+        expires_at=timezone.now() + timedelta(seconds=settings.AUTH_TOKEN_TTL)
+    )
+    return key, token
+
+
+def mark_revoked(digests):
+    """Make every process reload these tokens from the database"""
+    digests = list(digests)
+    for token_digest in digests:
+        tokens.discard(token_digest)
+    if digests:
+        # Cached copies live at most AUTH_TOKEN_CACHE_TTL, so the marks need not outlive them
+        get_cache().set_many(
+            {revoked_key(token_digest): time.time() for token_digest in digests},
+            settings.AUTH_TOKEN_CACHE_TTL
+        )
+
+
+def resolve(key):
+    """The active user a token key belongs to, or None"""
+    token_digest = digest(key)
+    entry = tokens.get(token_digest)
+    if entry is not None:
+        user, _, cached_at = entry
+        revoked_at = get_cache().get(revoked_key(token_digest))
+        if revoked_at is None or revoked_at < cached_at:
+            auth_token_lookups.inc(('hit',))
+            # A copy, so a view changing request.user cannot touch the cached one
+            return copy.copy(user)
+        tokens.discard(token_digest)
+    auth_token_lookups.inc(('miss',))
+    token = AuthToken.objects.select_related('user').filter(
+        digest=token_digest, expires_at__gt=timezone.now()
+    ).first()
+    if token is None or not token.user.is_active:
+        return None
+    tokens.put(token_digest, token.user, token.expires_at)
+    return copy.copy(token.user)
+
+
+class CachedTokenAuthentication(BaseAuthentication):
+    """
+    ``Authorization: Token <key>`` against the in-process token cache.
+
+    ``request.auth`` is the key, so a view can revoke the token it was
+    called with.
+    """
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != KEYWORD.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        user = resolve(key)
+        if user is None:
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+        return user, key
+
+    def authenticate_header(self, request):
+        return KEYWORD
@@ -0,0 +1,72 @@
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .models import Listing, BookedNight
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Listing is not available for the requested dates.'
+    default_code = 'booking_conflict'
+
+
+def nights_between(check_in, check_out):
+    """Yield every night from check_in up to (not including) check_out"""
+    for offset in range((check_out - check_in).days):
+        yield check_in + timedelta(days=offset)
+
+
+def lock_listing(listing_id):
+    """
+    Serialize booking writes for one listing.
+
+    Takes a row lock on the listing only, so bookings for other listings
+    proceed in parallel. Must be called inside a transaction. On backends
+    without SELECT ... FOR UPDATE the unique (listing, night) constraint
+    still rejects the losing writer.
+    """
+    Listing.objects.select_for_update().filter(pk=listing_id).values_list('pk').first()
+
+
+def unavailable_nights(listing_id, check_in, check_out):
+    """Return the booked nights of a listing within [check_in, check_out)"""
+    return list(
+        BookedNight.objects.filter(
+            listing_id=listing_id, night__gte=check_in, night__lt=check_out
+        ).order_by('night').values_list('night', flat=True)
+    )
+
+
+def is_available(listing_id, check_in, check_out):
+    """Answer with a single range lookup on the (listing, night) index"""
+    return not BookedNight.objects.filter(
+        listing_id=listing_id, night__gte=check_in, night__lt=check_out
+    ).exists()
+
+
+def reserve_nights(booking):
+    """Claim the booking's nights, raising BookingConflict if any is taken"""
+    if not is_available(booking.listing_id, booking.check_in, booking.check_out):
+        raise BookingConflict()
+    nights = [
+        BookedNight(listing_id=booking.listing_id, booking=booking, night=night)
+        for night in nights_between(booking.check_in, booking.check_out)
+    ]
+    try:
+        with transaction.atomic():
+            BookedNight.objects.bulk_create(nights)
+    except IntegrityError:
+        raise BookingConflict()
+
+
+def release_nights(booking):
+    """Free the nights held by a booking"""
+    BookedNight.objects.filter(booking=booking).delete()
+
+
+def sync_nights(booking):
+    """Re-derive the nights held by a booking after its dates or status changed"""
+    release_nights(booking)
+    if booking.status != 'cancelled':
+        reserve_nights(booking)
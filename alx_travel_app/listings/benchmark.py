@@ -0,0 +1,323 @@
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import StringIO
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_test_environment, teardown_test_environment
+)
+from rest_framework.test import APIClient
+from .chapa_service import reset_chapa_client
+from .chapa_stub import ChapaStub
+from .models import Booking, Listing, Payment
+
+PERCENTILES = (50, 95, 99)
+
+
+class Request:
+    """One request of a benchmark route"""
+
+    def __init__(self, method, url, user=None, data=None):
+        self.method = method
+        self.url = url
+        self.user = user
+        self.data = data
+
+
+class Targets:
+    """
+    Rows picked at random from the seeded tables to aim requests at.
+
+    Routes that change state (confirm, cancel, initiate_payment) each get
+    their own bookings so every request exercises the same code path.
+    """
+
+    def __init__(self, count, rng):
+        self.rng = rng
+        listing_ids = list(Listing.objects.values_list('id', flat=True))
+        self.listings = rng.sample(listing_ids, min(count, len(listing_ids)))
+        self.listing_titles = list(
+            Listing.objects.filter(id__in=self.listings).values_list('title', flat=True)
+        )
+        self.bookings = self._sample(Booking.objects.exclude(status='cancelled'), count)
+        pending = self._sample(Booking.objects.filter(status='pending'), 3 * count)
+        self.to_confirm = pending[0::3]
+        self.to_cancel = pending[1::3]
+        self.to_initiate = pending[2::3]
+        self.payments = self._sample(
+            Payment.objects.filter(chapa_reference__isnull=False), count,
+            fields=('id', 'chapa_reference', 'booking__user_id')
+        )
+        user_ids = {row[-1] for row in self.bookings + pending + self.payments}
+        self.users = User.objects.in_bulk(user_ids)
+
+    def _sample(self, queryset, count, fields=('id', 'listing_id', 'user_id')):
+        ids = list(queryset.values_list('id', flat=True))
+        picked = self.rng.sample(ids, min(count, len(ids)))
+        rows = {row[0]: row for row in queryset.filter(id__in=picked).values_list(*fields)}
+        return [rows[pk] for pk in picked]
+
+    def user(self, user_id):
+        return self.users[user_id]
+
+
+def listing_requests(targets):
+    return {
+        'listing-list': [Request('get', '/api/listings/') for _ in targets.listings],
+        'listing-retrieve': [Request('get', f'/api/listings/{pk}/') for pk in targets.listings],
+        'listing-search': [
+            Request('get', '/api/listings/search/', data={'q': title.split()[0]})
+            for title in targets.listing_titles
+        ],
+        'listing-available': [
+            Request('get', f'/api/listings/{pk}/available/',
+                    data={'check_in': '2026-03-01', 'check_out': '2026-03-08'})
+            for pk in targets.listings
+        ],
+        'listing-bookings': [
+            Request('get', f'/api/listings/{listing_id}/bookings/')
+            for _, listing_id, _ in targets.bookings
+        ],
+    }
+
+
+def booking_requests(targets):
+    return {
+        'booking-list': [
+            Request('get', '/api/bookings/', targets.user(user_id))
+            for _, _, user_id in targets.bookings
+        ],
+        'booking-retrieve': [
+            Request('get', f'/api/bookings/{pk}/', targets.user(user_id))
+            for pk, _, user_id in targets.bookings
+        ],
+        'booking-confirm': [
+            Request('post', f'/api/bookings/{pk}/confirm/', targets.user(user_id))
+            for pk, _, user_id in targets.to_confirm
+        ],
+        'booking-cancel': [
+            Request('post', f'/api/bookings/{pk}/cancel/', targets.user(user_id))
+            for pk, _, user_id in targets.to_cancel
+        ],
+        'booking-initiate-payment': [
+            Request('post', f'/api/bookings/{pk}/initiate_payment/', targets.user(user_id))
+            for pk, _, user_id in targets.to_initiate
+        ],
+    }
+
+
+def payment_requests(targets):
+    return {
+        'payment-list': [
+            Request('get', '/api/payments/', targets.user(user_id))
+            for _, _, user_id in targets.payments
+        ],
+        'payment-verify': [
+            Request('post', '/api/payments/verify/', targets.user(user_id), {'reference': reference})
+            for _, reference, user_id in targets.payments
+        ],
+        'payment-check-status': [
+            Request('post', f'/api/payments/{pk}/check_status/', targets.user(user_id))
+            for pk, _, user_id in targets.payments
+        ],
+    }
+
+
+ROUTE_GROUPS = (listing_requests, booking_requests, payment_requests)
+
+
+@contextmanager
+def benchmark_database(on_disk=False):
+    """
+    Run the body against a throwaway test database.
+
+    Chapa is replaced by a local stub (yielded, so callers can add latency
+    or failures) and payment jobs run in-process, as in the test suite;
+    throttles and load shedding are off, since one client drives every
+    request, and info logging is muted so it does not swamp reports.
+    SQLite's in-memory test database fails concurrent writers with "table
+    is locked" instead of waiting, so multi-threaded benchmarks pass
+    ``on_disk=True``.
+    """
+    setup_test_environment()
+    logging.disable(logging.INFO)
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    directory = None
+    options = connection.settings_dict.setdefault('OPTIONS', {})
+    old_options = dict(options)
+    if on_disk and connection.vendor == 'sqlite':
+        directory = tempfile.TemporaryDirectory()
+        test_settings['NAME'] = os.path.join(directory.name, 'benchmark.sqlite3')
+        # Throwaway data: skip the fsyncs, let readers run beside the writer
+        options['init_command'] = 'PRAGMA journal_mode=WAL; PRAGMA synchronous=OFF'
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with ChapaStub() as stub, override_settings(
+            CHAPA_BASE_URL=stub.url, CELERY_TASK_ALWAYS_EAGER=True, THROTTLE_ENABLED=False,
+            LOAD_SHED_MAX_IN_FLIGHT=0, LOAD_SHED_CHAPA_LATENCY_MS=0
+        ):
+            reset_chapa_client()
+            yield stub
+    finally:
+        reset_chapa_client()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        options.clear()
+        options.update(old_options)
+        if directory is not None:
+            directory.cleanup()
+        teardown_test_environment()
+        logging.disable(logging.NOTSET)
+
+
+def without_listing_cache():
+    """Settings override that sends the listing cache to a dummy backend"""
+    return override_settings(
+        CACHES=dict(settings.CACHES, benchmark={
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+        }),
+        LISTING_CACHE_ALIAS='benchmark',
+    )
+
+
+def seed_dataset(size, seed):
+    """Replace the database contents with a dataset of ``size`` listings"""
+    call_command('flush', interactive=False, verbosity=0)
+    call_command(
+        'seed', f'--users={max(size // 5, 10)}', f'--listings={size}',
+        f'--bookings={size * 5}', f'--seed={seed}', '--prefix=bench', stdout=StringIO()
+    )
+
+
+def percentile(samples, pct):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+def send(client, request):
+    if request.user is None:
+        # force_authenticate(None) logs out through the session table; skip it
+        client = APIClient()
+    else:
+        client.force_authenticate(request.user)
+    if request.method == 'post':
+        return client.post(request.url, request.data, format='json')
+    return client.get(request.url, request.data)
+
+
+def measure(client, requests):
+    """Send requests one after another, returning latency, query and memory figures"""
+    latencies, queries, statuses = [], [], {}
+    # The last request is repeated under tracemalloc only, so tracing does not skew latency
+    timed, traced = requests[:-1] or requests, requests[-1]
+    for request in timed:
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = send(client, request)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(ctx.captured_queries))
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    peak = None
+    if len(requests) > 1:
+        tracemalloc.start()
+        try:
+            send(client, traced)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    result = {
+        'requests': len(latencies),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'mean_ms': statistics.fmean(latencies),
+        'queries_max': max(queries),
+        'queries_mean': statistics.fmean(queries),
+        'peak_kib': round(peak / 1024, 1) if peak is not None else None,
+    }
+    for pct in PERCENTILES:
+        result[f'p{pct}_ms'] = percentile(latencies, pct)
+    return result
+
+
+def run_benchmark(requests_per_route, seed=42, use_cache=False):
+    """
+    Benchmark every route against the dataset in the current database.
+
+    The listing cache is bypassed unless ``use_cache`` is set, so the
+    figures reflect the database and serializer work of each request.
+    """
+    rng = random.Random(seed)
+    targets = Targets(requests_per_route, rng)
+    client = APIClient()
+    results = {}
+    with override_settings() if use_cache else without_listing_cache():
+        for group in ROUTE_GROUPS:
+            for route, requests in group(targets).items():
+                if requests:
+                    results[route] = measure(client, requests)
+    return results
+
+
+def check_budgets(results, budgets, tolerance=None):
+    """
+    Compare benchmark results against committed budgets.
+
+    ``results`` maps dataset size to route results. Query budgets apply to
+    every size; latency baselines are p95 milliseconds per size, exceeded
+    when the measured p95 is over ``tolerance`` times the baseline (skipped
+    if ``tolerance`` is ``None``). Returns a list of violation messages.
+    """
+    violations = []
+    for size, routes in results.items():
+        baselines = budgets.get('p95_ms', {}).get(str(size), {})
+        for route, result in routes.items():
+            failed = {code: n for code, n in result['statuses'].items() if int(code) >= 400}
+            if failed:
+                violations.append(f'{route} @ {size}: error responses {failed}')
+            budget = budgets.get('queries', {}).get(route)
+            if budget is None:
+                violations.append(f'{route}: no query budget committed')
+            elif result['queries_max'] > budget:
+                violations.append(
+                    f"{route} @ {size}: {result['queries_max']} queries, budget {budget}"
+                )
+            baseline = baselines.get(route)
+            if tolerance is not None and baseline is not None:
+                if result['p95_ms'] > baseline * tolerance:
+                    violations.append(
+                        f"{route} @ {size}: p95 {result['p95_ms']:.1f}ms, "
+                        f"baseline {baseline:.1f}ms x {tolerance}"
+                    )
+    return violations
+
+
+def budgets_from(results):
+    """Build a budget file from observed results, e.g. to commit a new baseline"""
+    return {
+        'queries': {
+            route: max(routes[route]['queries_max'] for routes in results.values() if route in routes)
+            for route in sorted({route for routes in results.values() for route in routes})
+        },
+        'p95_ms': {
+            str(size): {route: round(result['p95_ms'], 2) for route, result in routes.items()}
+            for size, routes in results.items()
+        },
+    }
+
+
+def load_budgets(path):
+    with open(path) as f:
+        return json.load(f)
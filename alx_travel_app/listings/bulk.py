@@ -0,0 +1,187 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from rest_framework import exceptions, serializers, status
+from .availability import BookingConflict, nights_between
+from .models import BookedNight, Booking, Listing, Payment
+from .serializers import BookingSerializer, ListingSerializer
+from . import cache as listing_cache
+from . import pricing
+
+
+class BulkItemsInvalid(Exception):
+    """Some items of a bulk request were rejected; ``errors`` lines up with the input"""
+
+    def __init__(self, errors, status_code=400):
+        super().__init__('Invalid bulk items')
+        self.errors = errors
+        self.status_code = status_code
+
+
+class BulkBookingItemSerializer(BookingSerializer):
+    """
+    Booking fields for bulk creation.
+
+    ``listing_id`` is only type-checked here; the listings are resolved in
+    one query for the whole batch instead of one lookup per item.
+    """
+    listing_id = serializers.IntegerField(write_only=True, min_value=1)
+
+
+def validate_items(serializer_class, items, context=None):
+    """Validate an array of items, returning their validated data in input order"""
+    serializer = serializer_class(
+        data=items, many=True, context=context or {},
+        allow_empty=False, max_length=settings.BULK_CREATE_MAX_ITEMS
+    )
+    if not serializer.is_valid():
+        errors = serializer.errors
+        if 'non_field_errors' in errors:
+            # Not a list, empty or too long: the error is about the whole payload
+            raise BulkItemsInvalid(errors['non_field_errors'])
+        # Item errors come keyed by index; report one entry per item
+        raise BulkItemsInvalid([errors.get(index, {}) for index in range(len(items))])
+    return serializer.validated_data
+
+
+def _insert(model, objs):
+    """bulk_create that leaves primary keys set on every backend"""
+    if model._meta.pk.has_default() or connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size=settings.BULK_CREATE_BATCH_SIZE)
+    # e.g. MySQL: no RETURNING, so fall back to row inserts in the same transaction
+    for obj in objs:
+        obj.save(force_insert=True)
+    return objs
+
+
+def payment_for(booking, quote=None):
+    """Build the (unsaved) payment record that goes with a booking"""
+    if quote is None:
+        quote = pricing.quote(booking.listing, booking.check_in, booking.check_out)
+    return Payment(booking=booking, amount=quote['total'], currency=quote['currency'])
+
+
+class PaymentStarted(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The price of the stay cannot change once its payment has been started.'
+    default_code = 'payment_started'
+
+
+def reprice_payment(booking):
+    """
+    Charge a moved stay at its new price, inside the booking's transaction.
+
+    Only a pending payment with no Chapa checkout yet can be repriced. Once
+    a checkout exists (or the payment settled) its amount is fixed, so a
+    move is only allowed if it keeps the price.
+    """
+    payment = Payment.objects.select_for_update().filter(booking=booking).first()
+    if payment is None:
+        return
+    quote = pricing.quote(booking.listing, booking.check_in, booking.check_out)
+    if (quote['total'], quote['currency']) == (payment.amount, payment.currency):
+        return
+    if payment.status != 'pending' or payment.payment_url or payment.chapa_reference:
+        raise PaymentStarted()
+    payment.amount, payment.currency = quote['total'], quote['currency']
+    payment.save(update_fields=['amount', 'currency', 'updated_at'])
+    booking.payment = payment
+
+
+def create_listings(items, owner, context=None):
+    """Validate and insert many listings owned by ``owner`` in one transaction"""
+    validated = validate_items(ListingSerializer, items, context)
+    listings = [Listing(owner=owner, **attrs) for attrs in validated]
+    for listing in listings:
+        listing.update_geohash()
+    with transaction.atomic():
+        _insert(Listing, listings)
+    # bulk_create sends no post_save, so cached list pages are dropped here
+    listing_cache.invalidate_lists()
+    return listings
+
+
+def create_bookings(items, user, context=None):
+    """
+    Validate and insert many bookings for ``user`` in one transaction.
+
+    The listings involved are fetched and locked with one query, and the
+    requested nights are checked against the booked nights of all of them
+    with one more, as well as against each other. Bookings, their nights
+    and their payments are then written with one bulk insert each, the
+    payments priced from one read of the listings' rate tables. Nothing is
+    written unless every item is accepted.
+    """
+    validated = validate_items(BulkBookingItemSerializer, items, context)
+    errors = [{} for _ in validated]
+
+    with transaction.atomic():
+        listing_ids = {attrs['listing_id'] for attrs in validated}
+        # Lock in pk order so concurrent bulk requests cannot deadlock
+        listings = {
+            listing.pk: listing for listing in
+            Listing.objects.select_for_update(of=('self',)).select_related('owner')
+            .filter(pk__in=listing_ids).order_by('pk')
+        }
+        for index, attrs in enumerate(validated):
+            if attrs['listing_id'] not in listings:
+                errors[index]['listing_id'] = [
+                    f'Invalid pk "{attrs["listing_id"]}" - object does not exist.'
+                ]
+
+        requested = [attrs for attrs in validated if attrs['listing_id'] in listings]
+        taken = defaultdict(set)
+        if requested:
+            booked = BookedNight.objects.filter(
+                listing_id__in={attrs['listing_id'] for attrs in requested},
+                night__gte=min(attrs['check_in'] for attrs in requested),
+                night__lt=max(attrs['check_out'] for attrs in requested),
+            ).values_list('listing_id', 'night')
+            for listing_id, night in booked:
+                taken[listing_id].add(night)
+
+        bookings, nights = [], []
+        for index, attrs in enumerate(validated):
+            if errors[index]:
+                continue
+            booking = Booking(user=user, **attrs)
+            booking.listing = listings[attrs['listing_id']]
+            wanted = set(nights_between(booking.check_in, booking.check_out))
+            clash = wanted & taken[booking.listing_id]
+            if clash:
+                errors[index]['non_field_errors'] = [BookingConflict.default_detail]
+                errors[index]['unavailable_nights'] = sorted(clash)
+                continue
+            # Later items in the batch must not overlap earlier ones either
+            taken[booking.listing_id] |= wanted
+            nights.append((booking, sorted(wanted)))
+            bookings.append(booking)
+
+        if any(errors):
+            conflict = all(
+                set(error) <= {'non_field_errors', 'unavailable_nights'} for error in errors
+            )
+            raise BulkItemsInvalid(errors, 409 if conflict else 400)
+
+        _insert(Booking, bookings)
+        try:
+            with transaction.atomic():
+                BookedNight.objects.bulk_create(
+                    [
+                        BookedNight(listing_id=booking.listing_id, booking=booking, night=night)
+                        for booking, booking_nights in nights for night in booking_nights
+                    ],
+                    batch_size=settings.BULK_CREATE_BATCH_SIZE
+                )
+        except IntegrityError:
+            # Only reachable on backends without row locks
+            raise BookingConflict()
+        rates = pricing.RateBook(
+            list(listings), min(booking.check_in for booking in bookings),
+            max(booking.check_out for booking in bookings)
+        )
+        _insert(Payment, [
+            payment_for(booking, rates.quote(booking.listing, booking.check_in, booking.check_out))
+            for booking in bookings
+        ])
+    return bookings
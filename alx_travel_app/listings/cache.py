@@ -0,0 +1,176 @@
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Listing
+
+LIST_VERSION_KEY = 'listings:list-version'
+
+
+class CacheMetrics:
+    """In-process hit/miss counters per cache namespace"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, namespace: str, outcome: str):
+        with self._lock:
+            counts = self._counts.setdefault(namespace, {'hit': 0, 'miss': 0, 'not_modified': 0})
+            counts[outcome] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = {}
+            for namespace, counts in self._counts.items():
+                lookups = counts['hit'] + counts['miss']
+                stats[namespace] = dict(counts, hit_ratio=counts['hit'] / lookups if lookups else 0.0)
+            return stats
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+metrics = CacheMetrics()
+
+
+def get_cache():
+    return caches[settings.LISTING_CACHE_ALIAS]
+
+
+def _version(key: str) -> int:
+    # Seed with the clock so a flushed cache never reuses an old version
+    return get_cache().get_or_set(key, int(time.time() * 1000), None)
+
+
+def _bump(key: str):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def listing_version_key(pk) -> str:
+    return f'listings:version:{pk}'
+
+
+def detail_key(pk, version) -> str:
+    return f'listings:detail:{pk}:{version}'
+
+
+def owner_version_key(owner_id) -> str:
+    return f'listings:owner-version:{owner_id}'
+
+
+def invalidate_listing(pk):
+    """Drop the cached payload of one listing and every cached list page"""
+    _bump(listing_version_key(pk))
+    invalidate_lists()
+
+
+def invalidate_lists():
+    """Drop every cached list page, e.g. after rows were written without signals"""
+    _bump(LIST_VERSION_KEY)
+
+
+def invalidate_owner(owner_id):
+    """An owner's details are embedded in their listings; drop all of them"""
+    for pk in Listing.objects.filter(owner_id=owner_id).values_list('id', flat=True):
+        _bump(listing_version_key(pk))
+    _bump(owner_version_key(owner_id))
+    invalidate_lists()
+
+
+def _opaque(etag: str) -> str:
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def _not_modified(request, etag, last_modified=None) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # Weak comparison, as RFC 9110 prescribes for If-None-Match
+        tags = parse_etags(if_none_match)
+        return '*' in tags or _opaque(etag) in {_opaque(tag) for tag in tags}
+    if last_modified is not None:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return since is not None and int(last_modified) <= since
+    return False
+
+
+def _respond(request, namespace, entry, outcome):
+    if _not_modified(request, entry['etag'], entry.get('last_modified')):
+        metrics.record(namespace, 'not_modified')
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        metrics.record(namespace, outcome)
+        response = Response(entry['data'])
+    response['ETag'] = entry['etag']
+    if entry.get('last_modified') is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+def cached_detail(request, pk, render):
+    """
+    Serve a listing's serialized payload through the cache.
+
+    On a miss the validators are read from ``updated_at`` first, so a
+    conditional request for an unchanged listing gets a 304 without the
+    row being loaded or serialized. ``render`` is only called to build a
+    full response.
+
+    Entries are keyed by the listing's version, read before rendering: an
+    invalidation that lands while a payload is rendered bumps the version,
+    so the stale payload is stored under a key nobody reads any more.
+    """
+    try:
+        pk = Listing._meta.pk.to_python(pk)
+    except ValidationError:
+        return render()
+    cache = get_cache()
+    key = detail_key(pk, _version(listing_version_key(pk)))
+    entry = cache.get(key)
+    if entry is not None:
+        return _respond(request, 'detail', entry, 'hit')
+
+    row = Listing.objects.filter(pk=pk).values_list('updated_at', 'owner_id').first()
+    if row is None:
+        # Let the view raise its usual 404
+        return render()
+    updated_at, owner_id = row
+    last_modified = updated_at.timestamp()
+    etag = f'W/"{pk}.{updated_at.timestamp():.6f}.{_version(owner_version_key(owner_id))}"'
+    if _not_modified(request, etag, last_modified):
+        return _respond(request, 'detail', {'etag': etag, 'last_modified': last_modified}, 'miss')
+
+    response = render()
+    if response.status_code == status.HTTP_200_OK:
+        entry = {'data': response.data, 'etag': etag, 'last_modified': last_modified}
+        cache.set(key, entry, settings.LISTING_CACHE_TIMEOUT)
+        return _respond(request, 'detail', entry, 'miss')
+    return response
+
+
+def cached_list(request, render):
+    """Serve a listing list page through the cache, keyed by list version and URL"""
+    cache = get_cache()
+    version = _version(LIST_VERSION_KEY)
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    key = f'listings:list:{version}:{digest}'
+    entry = cache.get(key)
+    if entry is not None:
+        return _respond(request, 'list', entry, 'hit')
+
+    response = render()
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    entry = {'data': response.data, 'etag': f'W/"list.{version}.{digest[:16]}"'}
+    cache.set(key, entry, settings.LISTING_CACHE_TIMEOUT)
+    return _respond(request, 'list', entry, 'miss')
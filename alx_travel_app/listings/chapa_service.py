@@ -1,21 +1,349 @@
+import asyncio
+import functools
 import os
+import random
+import threading
+import time
+import weakref
+import httpx
 import requests
 import logging
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from .metrics import observe_chapa
 from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+
+class ChapaUnavailable(Exception):
+    """Raised when a Chapa call is refused by the circuit breaker or exhausted its retries"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast while Chapa is degraded.
+
+    Opens after ``threshold`` consecutive failures. While open, calls are
+    refused until ``reset_timeout`` seconds have passed; then a single trial
+    call is let through (half-open) and its outcome closes or re-opens the
+    breaker.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class ChapaClient:
+    """
+    Process-wide HTTP client for the Chapa API.
+
+    Holds one ``requests.Session`` with a bounded keep-alive connection pool,
+    applies connect/read timeouts to every call, retries idempotent calls
+    with jittered exponential backoff and guards everything with a
+    :class:`CircuitBreaker`.
+    """
+
+    # Status codes worth retrying: throttling and transient server errors
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, base_url: str, timeout: tuple, pool_size: int, max_retries: int,
+                 backoff_base: float, backoff_max: float, breaker: CircuitBreaker):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+        self.session = requests.Session()
+        # Keep up to pool_size idle connections alive; bursts beyond that open
+        # short-lived extra connections rather than queueing
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method: str, path: str, idempotent: bool = False, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying only when it is safe to do so
+
+        Non-idempotent calls are retried only when the connection could not be
+        established, since the request can then not have reached Chapa.
+        """
+        attempts = self.max_retries + 1
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise ChapaUnavailable('Chapa circuit breaker is open')
+            try:
+                response = self._send(method, path, **kwargs)
+            except requests.ConnectTimeout:
+                self.breaker.record_failure()
+                retryable = True
+                error = 'connect timeout'
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record_failure()
+                retryable = idempotent
+                error = str(e)
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+                retryable = False
+                error = str(e)
+            else:
+                if response.status_code not in self.RETRY_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if not idempotent or attempt == attempts - 1:
+                    return response
+                response.close()
+                retryable = True
+                error = f'HTTP {response.status_code}'
+
+            if not retryable or attempt == attempts - 1:
+                raise ChapaUnavailable(f'Chapa request failed: {error}')
+            delay = self.backoff(attempt)
+            logger.warning('Chapa %s %s failed (%s); retrying in %.2fs', method, path, error, delay)
+            time.sleep(delay)
+
+    def _send(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Make one attempt, recording its latency and outcome in the metrics"""
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = self.session.request(
+                method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs
+            )
+            outcome = str(response.status_code)
+            return response
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            observe_chapa(method, path, time.perf_counter() - started, outcome)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number ``attempt + 1``"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def close(self):
+        self.session.close()
+
+
+@functools.cache
+def _ssl_context():
+    # Loading the CA bundle takes ~50ms; share one context across clients
+    return httpx.create_ssl_context()
+
+
+class AsyncChapaClient:
+    """
+    Asyncio counterpart of :class:`ChapaClient` built on ``httpx.AsyncClient``.
+
+    Same timeouts, retry rules and backoff; it shares the circuit breaker of
+    the sync client so both see one view of Chapa's health. An httpx client
+    is bound to the event loop it first ran on, so use
+    :func:`get_async_chapa_client` to get the one for the running loop.
+    """
+
+    RETRY_STATUSES = ChapaClient.RETRY_STATUSES
+
+    def __init__(self, base_url: str, timeout: tuple, pool_size: int, max_connections: int,
+                 max_retries: int, backoff_base: float, backoff_max: float,
+                 breaker: CircuitBreaker):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+        connect, read = timeout
+        # Unlike the sync pool, calls beyond max_connections wait for a free
+        # connection (for at most the read timeout) instead of opening more
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            verify=_ssl_context(),
+            timeout=httpx.Timeout(read, connect=connect, pool=read),
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=pool_size
+            ),
+        )
+
+    backoff = ChapaClient.backoff
+
+    async def request(self, method: str, path: str, idempotent: bool = False,
+                      **kwargs) -> httpx.Response:
+        """Send a request with the same retry rules as :meth:`ChapaClient.request`"""
+        attempts = self.max_retries + 1
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise ChapaUnavailable('Chapa circuit breaker is open')
+            try:
+                response = await self._send(method, path, **kwargs)
+            except httpx.ConnectTimeout:
+                self.breaker.record_failure()
+                retryable = True
+                error = 'connect timeout'
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                retryable = idempotent
+                error = str(e) or type(e).__name__
+            except httpx.HTTPError as e:
+                self.breaker.record_failure()
+                retryable = False
+                error = str(e) or type(e).__name__
+            else:
+                if response.status_code not in self.RETRY_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if not idempotent or attempt == attempts - 1:
+                    return response
+                retryable = True
+                error = f'HTTP {response.status_code}'
+
+            if not retryable or attempt == attempts - 1:
+                raise ChapaUnavailable(f'Chapa request failed: {error}')
+            delay = self.backoff(attempt)
+            logger.warning('Chapa %s %s failed (%s); retrying in %.2fs', method, path, error, delay)
+            await asyncio.sleep(delay)
+
+    async def _send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            outcome = str(response.status_code)
+            return response
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            observe_chapa(method, path, time.perf_counter() - started, outcome)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+# One async client per event loop; entries go away with their loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_chapa_client() -> ChapaClient:
+    """Return the shared client, creating it from settings on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ChapaClient(
+                    base_url=settings.CHAPA_BASE_URL,
+                    timeout=(settings.CHAPA_CONNECT_TIMEOUT, settings.CHAPA_READ_TIMEOUT),
+                    pool_size=settings.CHAPA_POOL_SIZE,
+                    max_retries=settings.CHAPA_MAX_RETRIES,
+                    backoff_base=settings.CHAPA_BACKOFF_BASE,
+                    backoff_max=settings.CHAPA_BACKOFF_MAX,
+                    breaker=CircuitBreaker(
+                        threshold=settings.CHAPA_BREAKER_THRESHOLD,
+                        reset_timeout=settings.CHAPA_BREAKER_RESET_TIMEOUT,
+                    ),
+                )
+    return _client
+
+
+def get_async_chapa_client() -> AsyncChapaClient:
+    """Return the async client for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncChapaClient(
+            base_url=settings.CHAPA_BASE_URL,
+            timeout=(settings.CHAPA_CONNECT_TIMEOUT, settings.CHAPA_READ_TIMEOUT),
+            pool_size=settings.CHAPA_POOL_SIZE,
+            max_connections=settings.CHAPA_ASYNC_MAX_CONNECTIONS,
+            max_retries=settings.CHAPA_MAX_RETRIES,
+            backoff_base=settings.CHAPA_BACKOFF_BASE,
+            backoff_max=settings.CHAPA_BACKOFF_MAX,
+            breaker=get_chapa_client().breaker,
+        )
+    return client
+
+
+async def aclose_async_chapa_client():
+    """Close and forget the running loop's async client, e.g. before the loop ends"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def reset_chapa_client():
+    """Drop the shared clients so the next call rebuilds them from settings"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        # Async clients can only be closed from their own loop; forgetting
+        # them is enough for the next call to build a fresh one
+        _async_clients.clear()
+
+
 class ChapaService:
     """Service class for handling Chapa API operations"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[ChapaClient] = None,
+                 async_client: Optional[AsyncChapaClient] = None):
         self.secret_key = os.getenv('CHAPA_SECRET_KEY')
-        self.base_url = 'https://api.chapa.co/v1'
+        self.client = client or get_chapa_client()
+        self._async_client = async_client
         self.headers = {
             'Authorization': f'Bearer {self.secret_key}',
             'Content-Type': 'application/json'
         }
+
+    @property
+    def async_client(self) -> AsyncChapaClient:
+        if self._async_client is None:
+            self._async_client = get_async_chapa_client()
+        return self._async_client
     
     def initiate_payment(self, booking, amount: float, currency: str = 'USD') -> Dict:
         """
@@ -30,53 +358,81 @@ class ChapaService:
             Dict containing payment response from Chapa
         """
         try:
-            # Calculate number of nights
-            nights = (booking.check_out - booking.check_in).days
-            
-            payload = {
-                'amount': str(amount),
-                'currency': currency,
-                'email': booking.user.email,
-                'first_name': booking.user.first_name or booking.user.username,
-                'last_name': booking.user.last_name or '',
-                'tx_ref': f"booking_{booking.id}_{booking.user.id}",
-                'callback_url': f"{settings.BASE_URL}/api/payments/verify/",
-                'return_url': f"{settings.BASE_URL}/api/payments/success/",
-                'customization': {
-                    'title': f'Payment for {booking.listing.title}',
-                    'description': f'Booking for {nights} nights at {booking.listing.title}'
-                }
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/transaction/initialize",
+            response = self.client.request(
+                'POST',
+                '/transaction/initialize',
                 headers=self.headers,
-                json=payload
+                json=self.initiate_payload(booking, amount, currency)
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Payment initiated successfully for booking {booking.id}")
-                return {
-                    'success': True,
-                    'data': data,
-                    'payment_url': data.get('data', {}).get('checkout_url'),
-                    'reference': data.get('data', {}).get('reference')
-                }
-            else:
-                logger.error(f"Failed to initiate payment: {response.text}")
-                return {
-                    'success': False,
-                    'error': f"Chapa API error: {response.status_code}",
-                    'details': response.text
-                }
-                
+            return self._initiate_result(booking, response)
+        except Exception as e:
+            return self._initiate_error(e)
+
+    async def ainitiate_payment(self, booking, amount: float, currency: str = 'USD') -> Dict:
+        """Async version of :meth:`initiate_payment`; ``booking.user`` and ``.listing`` must be loaded"""
+        try:
+            response = await self.async_client.request(
+                'POST',
+                '/transaction/initialize',
+                headers=self.headers,
+                json=self.initiate_payload(booking, amount, currency)
+            )
+            return self._initiate_result(booking, response)
         except Exception as e:
-            logger.error(f"Error initiating payment: {str(e)}")
+            return self._initiate_error(e)
+
+    def initiate_payload(self, booking, amount: float, currency: str) -> Dict:
+        """Build the ``/transaction/initialize`` request body for a booking"""
+        # Calculate number of nights
+        nights = (booking.check_out - booking.check_in).days
+        
+        return {
+            'amount': str(amount),
+            'currency': currency,
+            'email': booking.user.email,
+            'first_name': booking.user.first_name or booking.user.username,
+            'last_name': booking.user.last_name or '',
+            'tx_ref': f"booking_{booking.id}_{booking.user.id}",
+            'callback_url': f"{settings.BASE_URL}/api/payments/webhook/",
+            'return_url': f"{settings.BASE_URL}/api/payments/success/",
+            'customization': {
+                'title': f'Payment for {booking.listing.title}',
+                'description': f'Booking for {nights} nights at {booking.listing.title}'
+            }
+        }
+
+    def _initiate_result(self, booking, response) -> Dict:
+        if response.status_code == 200:
+            data = response.json()
+            logger.info('Payment initiated successfully for booking %s', booking.id)
+            return {
+                'success': True,
+                'data': data,
+                'payment_url': data.get('data', {}).get('checkout_url'),
+                'reference': data.get('data', {}).get('reference')
+            }
+        else:
+            logger.error('Failed to initiate payment: %s', response.text)
+            return {
+                'success': False,
+                'error': f"Chapa API error: {response.status_code}",
+                'details': response.text,
+                'retryable': response.status_code in ChapaClient.RETRY_STATUSES
+            }
+
+    def _initiate_error(self, e: Exception) -> Dict:
+        if isinstance(e, ChapaUnavailable):
+            logger.error('Chapa unavailable while initiating payment: %s', e)
             return {
                 'success': False,
-                'error': f"Payment initiation failed: {str(e)}"
+                'error': f"Payment initiation failed: {str(e)}",
+                'retryable': True
             }
+        logger.error('Error initiating payment: %s', e)
+        return {
+            'success': False,
+            'error': f"Payment initiation failed: {str(e)}"
+        }
     
     def verify_payment(self, reference: str) -> Dict:
         """
@@ -89,33 +445,60 @@ class ChapaService:
             Dict containing verification response
         """
         try:
-            response = requests.get(
-                f"{self.base_url}/transaction/verify/{reference}",
+            response = self.client.request(
+                'GET',
+                f"/transaction/verify/{reference}",
+                idempotent=True,
                 headers=self.headers
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Payment verification successful for reference {reference}")
-                return {
-                    'success': True,
-                    'data': data,
-                    'status': data.get('data', {}).get('status')
-                }
-            else:
-                logger.error(f"Failed to verify payment: {response.text}")
-                return {
-                    'success': False,
-                    'error': f"Verification failed: {response.status_code}",
-                    'details': response.text
-                }
-                
+            return self._verify_result(reference, response)
+        except Exception as e:
+            return self._verify_error(e)
+
+    async def averify_payment(self, reference: str) -> Dict:
+        """Async version of :meth:`verify_payment`"""
+        try:
+            response = await self.async_client.request(
+                'GET',
+                f"/transaction/verify/{reference}",
+                idempotent=True,
+                headers=self.headers
+            )
+            return self._verify_result(reference, response)
         except Exception as e:
-            logger.error(f"Error verifying payment: {str(e)}")
+            return self._verify_error(e)
+
+    def _verify_result(self, reference: str, response) -> Dict:
+        if response.status_code == 200:
+            data = response.json()
+            logger.info('Payment verification successful for reference %s', reference)
+            return {
+                'success': True,
+                'data': data,
+                'status': data.get('data', {}).get('status')
+            }
+        else:
+            logger.error('Failed to verify payment: %s', response.text)
             return {
                 'success': False,
-                'error': f"Payment verification failed: {str(e)}"
+                'error': f"Verification failed: {response.status_code}",
+                'details': response.text,
+                'retryable': response.status_code in ChapaClient.RETRY_STATUSES
             }
+
+    def _verify_error(self, e: Exception) -> Dict:
+        if isinstance(e, ChapaUnavailable):
+            logger.error('Chapa unavailable while verifying payment: %s', e)
+            return {
+                'success': False,
+                'error': f"Payment verification failed: {str(e)}",
+                'retryable': True
+            }
+        logger.error('Error verifying payment: %s', e)
+        return {
+            'success': False,
+            'error': f"Payment verification failed: {str(e)}"
+        }
     
     def get_payment_status(self, reference: str) -> Optional[str]:
         """
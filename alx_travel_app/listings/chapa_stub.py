@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open many connections at once; the default backlog of 5
+    # makes the kernel drop SYNs and clients stall for a second retrying
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here
+        pass
+
+
+class ChapaStub:
+    """
+    Local stand-in for the Chapa API, for tests and benchmarks.
+
+    Serves ``/transaction/initialize`` and ``/transaction/verify/<reference>``
+    over HTTP/1.1 keep-alive on an ephemeral port. ``latency`` delays every
+    response, ``failures`` holds status codes returned (one per request)
+    before normal service resumes, and ``statuses`` maps references to the
+    payment status reported by verify (default ``success``).
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.failures = deque()
+        self.statuses = {}
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._server = _StubServer(('127.0.0.1', 0), self._handler_class())
+        threading.Thread(
+            target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _next_failure(self):
+        with self._lock:
+            self.requests += 1
+            return self.failures.popleft() if self.failures else None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without this,
+            # Nagle plus delayed ACKs add ~40ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                if self.path.endswith('/transaction/initialize'):
+                    reference = payload.get('tx_ref')
+                    self._respond({
+                        'message': 'Hosted Link',
+                        'status': 'success',
+                        'data': {
+                            'checkout_url': f'{stub.url}/checkout/{reference}',
+                            'reference': reference,
+                        },
+                    })
+                else:
+                    self._respond({'message': 'Not found'}, 404)
+
+            def do_GET(self):
+                prefix = '/transaction/verify/'
+                if prefix in self.path:
+                    reference = self.path.split(prefix, 1)[1]
+                    self._respond({
+                        'message': 'Payment details',
+                        'status': 'success',
+                        'data': {
+                            'tx_ref': reference,
+                            'status': stub.statuses.get(reference, 'success'),
+                        },
+                    })
+                else:
+                    self._respond({'message': 'Not found'}, 404)
+
+            def _respond(self, body, status=200):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                failure = stub._next_failure()
+                if failure is not None:
+                    status, body = failure, {'message': 'Stub failure', 'status': 'failed'}
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,135 @@
+"""
+Read-only serializer fast path over ``values()`` rows.
+
+Rendering a list through a ``ModelSerializer`` builds a model instance per
+row (and per joined relation), then walks every field through
+``get_attribute`` and ``to_representation``. For serializers made only of
+concrete columns, local foreign-key ids and nested serializers over
+forward foreign keys or reverse one-to-ones, the same payload can be built
+straight from ``values()`` dicts. A :class:`ValuesPlan` is compiled once
+per serializer class and field selection: the lookups to fetch and, per
+field, either the raw value or the serializer field's own
+``to_representation`` for types whose JSON form differs from the Python
+value (decimals, datetimes, dates, UUIDs). The output matches the
+serializer's.
+"""
+from functools import lru_cache
+from django.conf import settings
+from rest_framework import relations, serializers
+from rest_framework.response import Response
+from .query_shaping import SparseFieldsMixin
+from . import metrics
+
+# Fields whose representation of a non-null column value is the value itself
+PASSTHROUGH = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.ChoiceField, serializers.ReadOnlyField,
+)
+# The timing mixin's to_representation only wraps the default one
+PLAIN_TO_REPRESENTATION = (
+    serializers.Serializer.to_representation, metrics.TimedSerializerMixin.to_representation,
+)
+
+
+class Unsupported(Exception):
+    """The serializer reads something a values() row cannot provide"""
+
+
+class ValuesPlan:
+    """The values() lookups of a serializer and how to build its output from them"""
+
+    def __init__(self, serializer, prefix=''):
+        serializer_type = type(serializer)
+        if serializer_type.to_representation not in PLAIN_TO_REPRESENTATION:
+            raise Unsupported(f'{serializer_type.__name__} overrides to_representation')
+        meta = serializer.Meta.model._meta
+        self.pk = prefix + meta.pk.name
+        self.lookups = [self.pk]
+        # (output key, 'value' | 'nested', lookup or child plan, converter)
+        self.steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if source == '*' or '.' in source or isinstance(field, serializers.ListSerializer):
+                raise Unsupported(f'{serializer_type.__name__}.{name}')
+            if isinstance(field, serializers.BaseSerializer):
+                model_field = meta.get_field(source)
+                if not (model_field.one_to_one or model_field.many_to_one):
+                    raise Unsupported(f'{serializer_type.__name__}.{name}')
+                child = ValuesPlan(field, prefix + source + '__')
+                self.lookups.extend(child.lookups)
+                self.steps.append((name, 'nested', child, None))
+                continue
+            model_field = meta.get_field(source)
+            if not model_field.concrete:
+                raise Unsupported(f'{serializer_type.__name__}.{name}')
+            if isinstance(field, relations.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    raise Unsupported(f'{serializer_type.__name__}.{name}')
+                converter = None
+            elif model_field.is_relation:
+                raise Unsupported(f'{serializer_type.__name__}.{name}')
+            elif isinstance(field, PASSTHROUGH):
+                converter = None
+            else:
+                converter = field.to_representation
+            self.lookups.append(prefix + source)
+            self.steps.append((name, 'value', prefix + source, converter))
+        self.lookups = list(dict.fromkeys(self.lookups))
+
+    def build(self, row):
+        data = {}
+        for name, kind, target, extra in self.steps:
+            if kind == 'nested':
+                # A null FK or missing reverse one-to-one, as select_related leaves it
+                data[name] = None if row[target.pk] is None else target.build(row)
+                continue
+            value = row[target]
+            data[name] = value if value is None or extra is None else extra(value)
+        return data
+
+
+@lru_cache(maxsize=512)
+def values_plan(serializer_class, selection=None):
+    """The ValuesPlan of a serializer class, or None if it cannot be built from rows"""
+    kwargs = selection._asdict() if selection is not None else {}
+    try:
+        return ValuesPlan(serializer_class(**kwargs))
+    except Unsupported:
+        return None
+
+
+class ValuesListMixin:
+    """
+    Serve ``list`` from ``values()`` rows when the serializer allows it.
+
+    For viewsets using :class:`~.query_shaping.QueryShapingMixin`. The
+    queryset keeps its filters and ordering; the paginator sees plain dicts,
+    which is why it is given the primary key and its ordering columns too.
+    Set ``API_VALUES_FAST_PATH = False`` to render through the serializer.
+    """
+
+    def list(self, request, *args, **kwargs):
+        plan = self.values_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        rows = self.filter_queryset(self.get_queryset()).values(
+            *plan.lookups, 'pk', *self.ordering_columns()
+        )
+        page = self.paginate_queryset(rows)
+        with metrics.serializer_timing():
+            data = [plan.build(row) for row in (rows if page is None else page)]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def values_plan(self):
+        if not settings.API_VALUES_FAST_PATH:
+            return None
+        serializer_class = self.get_serializer_class()
+        selection = self.field_selection()
+        if selection is not None and not issubclass(serializer_class, SparseFieldsMixin):
+            selection = None
+        return values_plan(serializer_class, selection)
+
@@ -0,0 +1,186 @@
+"""
+Nearby listing search on a geohash index.
+
+Each listing with coordinates stores their geohash: a base-32 string
+whose every character halves the cell alternately along longitude and
+latitude, so listings sharing a prefix lie in the same cell and a cell
+is one contiguous range of an ordinary B-tree index (SQLite and MySQL
+alike). A radius or bounding-box query picks the finest precision at
+which at most ``GEO_MAX_CELLS`` cells cover the box, reads the id and
+coordinates of the listings in those ranges, and keeps those inside the
+circle or box, nearest first by great-circle distance. The box is also
+filtered on the indexed coordinates in SQL, so rows of a cell that fall
+outside it never leave the database, and the search widens from a small
+ring around the point, stopping once it holds a full page. Only the
+final page of listings is loaded in full.
+"""
+import heapq
+import math
+from django.conf import settings
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Sorts after every BASE32 character, so [cell, cell + END) is all of a cell
+END = '~'
+PRECISION = 9
+# nearby() starts at the radius over 2 ** RINGS and doubles it
+RINGS = 4
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """The geohash of a point"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate, longitude first
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(latitude, longitude) extent in degrees of a cell at ``precision``"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle (haversine) distance"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_box(latitude, longitude, radius_km):
+    """(min_lat, min_lng, max_lat, max_lng) around a circle; longitudes may pass ±180"""
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    if min_lat == -90.0 or max_lat == 90.0:
+        # The circle holds a pole, so every longitude
+        return min_lat, -180.0, max_lat, 180.0
+    ratio = math.sin(math.radians(dlat)) / math.cos(math.radians(latitude))
+    dlng = math.degrees(math.asin(min(1.0, ratio)))
+    return min_lat, longitude - dlng, max_lat, longitude + dlng
+
+
+def split_box(min_lat, min_lng, max_lat, max_lng):
+    """Boxes within [-180, 180], cutting one that crosses the antimeridian in two"""
+    if max_lng - min_lng >= 360:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    if min_lng < -180:
+        return [(min_lat, min_lng + 360, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+    if max_lng > 180:
+        return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng - 360)]
+    if min_lng > max_lng:
+        # A box given west-to-east across the antimeridian, e.g. 170 to -170
+        return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+    return [(min_lat, min_lng, max_lat, max_lng)]
+
+
+def _cell_indexes(low, high, origin, size, count):
+    first = max(int((low - origin) // size), 0)
+    last = min(int((high - origin) // size), count - 1)
+    return range(first, last + 1)
+
+
+def covering_cells(boxes, max_cells=None):
+    """The fewest-row set of at most ``max_cells`` geohash cells covering ``boxes``"""
+    max_cells = max_cells or settings.GEO_MAX_CELLS
+    for precision in range(PRECISION, 0, -1):
+        lat_size, lng_size = cell_size(precision)
+        grids = [
+            (
+                _cell_indexes(min_lat, max_lat, -90.0, lat_size, round(180 / lat_size)),
+                _cell_indexes(min_lng, max_lng, -180.0, lng_size, round(360 / lng_size)),
+            )
+            for min_lat, min_lng, max_lat, max_lng in boxes
+        ]
+        if sum(len(rows) * len(columns) for rows, columns in grids) <= max_cells or precision == 1:
+            break
+    cells = {
+        encode(-90.0 + (row + 0.5) * lat_size, -180.0 + (column + 0.5) * lng_size, precision)
+        for rows, columns in grids for row in rows for column in columns
+    }
+    return sorted(cells)
+
+
+def intersect(boxes, others):
+    """The parts of ``boxes`` that lie inside ``others``; both already split"""
+    parts = []
+    for min_lat, min_lng, max_lat, max_lng in boxes:
+        for other_min_lat, other_min_lng, other_max_lat, other_max_lng in others:
+            part = (
+                max(min_lat, other_min_lat), max(min_lng, other_min_lng),
+                min(max_lat, other_max_lat), min(max_lng, other_max_lng),
+            )
+            if part[0] <= part[2] and part[1] <= part[3]:
+                parts.append(part)
+    return parts
+
+
+def candidates(queryset, boxes):
+    """``(id, latitude, longitude)`` of the listings inside ``boxes``, off the index alone"""
+    cells, within = Q(), Q()
+    for cell in covering_cells(boxes):
+        cells |= Q(geohash__gte=cell, geohash__lt=cell + END)
+    for min_lat, min_lng, max_lat, max_lng in boxes:
+        within |= Q(latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+    return queryset.filter(cells, within).values_list('id', 'latitude', 'longitude')
+
+
+def nearby(queryset, latitude, longitude, radius_km=None, bbox=None, limit=20):
+    """
+    Ids and distances of the listings in ``queryset`` nearest a point
+
+    Within ``radius_km`` of it, or inside ``bbox`` (min_lat, min_lng,
+    max_lat, max_lng) when given. Returns up to ``limit`` ``(id, km)``
+    pairs, nearest first.
+
+    The search widens ring by ring, from a sixteenth of the radius (or
+    of the farthest corner of ``bbox``) doubling out to all of it. Each
+    ring is a smaller box, so it is covered by finer cells, and as every
+    listing within a ring's radius has then been read, the search stops
+    at the first ring holding ``limit`` of them: a dense neighbourhood
+    costs its own few rows rather than every row in the area.
+    """
+    if bbox is None:
+        area, full = None, radius_km
+    else:
+        area = split_box(*bbox)
+        full = max(
+            distance_km(latitude, longitude, lat, lng)
+            for lat in (bbox[0], bbox[2]) for lng in (bbox[1], bbox[3])
+        )
+    for ring in range(RINGS, -1, -1):
+        reach = full / 2 ** ring
+        boxes = split_box(*radius_box(latitude, longitude, reach))
+        if area is not None:
+            # The last ring is all of the box, wherever its corners lie
+            boxes = intersect(boxes, area) if ring else area
+        if not boxes:
+            continue
+        matches = []
+        for pk, lat, lng in candidates(queryset, boxes).iterator(chunk_size=5000):
+            distance = distance_km(latitude, longitude, lat, lng)
+            if bbox is None and distance > radius_km:
+                continue
+            matches.append((distance, pk))
+        nearest = heapq.nsmallest(limit, matches)
+        if len(nearest) == limit and nearest[-1][0] <= reach:
+            break
+    return [(pk, distance) for distance, pk in nearest]
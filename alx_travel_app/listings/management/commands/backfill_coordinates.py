@@ -0,0 +1,102 @@
+import csv
+import unicodedata
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from alx_travel_app.listings import cache as listing_cache, geo
+from alx_travel_app.listings.models import Listing
+
+DEFAULT_GAZETTEER = Path(__file__).resolve().parents[2] / 'gazetteer.csv'
+
+# Columns of a GeoNames dump (cities15000.txt, KE.txt, ...)
+GEONAMES_NAME, GEONAMES_ASCII_NAME, GEONAMES_LATITUDE, GEONAMES_LONGITUDE = 1, 2, 4, 5
+GEONAMES_POPULATION = 14
+
+
+def place_key(location):
+    """'Diani Beach, Kwale' and 'diani beach' both match the place 'Diani Beach'"""
+    place = location.split(',')[0]
+    place = unicodedata.normalize('NFKD', place).encode('ascii', 'ignore').decode()
+    return ' '.join(place.lower().split())
+
+
+def read_gazetteer(path):
+    """Map place keys to (latitude, longitude), the most populous place winning"""
+    path, places = Path(path), {}
+    with open(path, encoding='utf-8', newline='') as handle:
+        if path.suffix == '.csv':
+            rows = (
+                (row['name'], float(row['latitude']), float(row['longitude']),
+                 int(row.get('population') or 0))
+                for row in csv.DictReader(handle)
+            )
+        else:
+            rows = _geonames_rows(handle)
+        for name, latitude, longitude, population in rows:
+            key = place_key(name)
+            if key and population >= places.get(key, (None, None, -1))[2]:
+                places[key] = (latitude, longitude, population)
+    return {key: (latitude, longitude) for key, (latitude, longitude, _) in places.items()}
+
+
+def _geonames_rows(handle):
+    for line in handle:
+        columns = line.rstrip('\n').split('\t')
+        latitude, longitude = float(columns[GEONAMES_LATITUDE]), float(columns[GEONAMES_LONGITUDE])
+        population = int(columns[GEONAMES_POPULATION] or 0)
+        yield columns[GEONAMES_NAME], latitude, longitude, population
+        if columns[GEONAMES_ASCII_NAME] != columns[GEONAMES_NAME]:
+            yield columns[GEONAMES_ASCII_NAME], latitude, longitude, population
+
+
+def invalidate(ids):
+    for pk in ids:
+        listing_cache.invalidate_listing(pk)
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill in listing coordinates from an offline gazetteer by matching the '
+        'place name at the start of each listing\'s location. Takes a CSV with '
+        'name, latitude, longitude and optional population columns, or a '
+        'GeoNames tab-separated dump; defaults to the bundled list of Kenyan towns.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gazetteer', type=Path, default=DEFAULT_GAZETTEER)
+        parser.add_argument('--overwrite', action='store_true',
+                            help='Also replace coordinates that are already set')
+
+    def handle(self, *args, **options):
+        try:
+            places = read_gazetteer(options['gazetteer'])
+        except (OSError, KeyError, ValueError, IndexError) as exc:
+            raise CommandError(f'Cannot read gazetteer {options["gazetteer"]}: {exc!r}')
+
+        listings = Listing.objects.all()
+        if not options['overwrite']:
+            listings = listings.filter(latitude__isnull=True)
+        # One UPDATE per distinct location rather than one per listing
+        locations = listings.order_by().values_list('location', flat=True).distinct()
+        updated, unmatched = 0, set()
+        with transaction.atomic():
+            for location in list(locations):
+                point = places.get(place_key(location))
+                if point is None:
+                    unmatched.add(location)
+                    continue
+                matched = listings.filter(location=location)
+                ids = list(matched.values_list('pk', flat=True))
+                updated += matched.update(
+                    latitude=point[0], longitude=point[1], geohash=geo.encode(*point)
+                )
+                # update() sends no post_save, so the cached payloads are dropped
+                # here, once the rows are committed: a version bumped earlier
+                # could be cached again with the old row
+                transaction.on_commit(lambda ids=ids: invalidate(ids))
+        self.stdout.write(f'Set coordinates on {updated} listings')
+        if unmatched:
+            self.stdout.write(
+                f'No gazetteer match for {len(unmatched)} locations: '
+                + ', '.join(sorted(unmatched)[:20])
+            )
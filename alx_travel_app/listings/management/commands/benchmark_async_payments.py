@@ -0,0 +1,120 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from alx_travel_app.listings.benchmark import benchmark_database, percentile
+from alx_travel_app.listings.bulk import payment_for
+from alx_travel_app.listings.chapa_service import aclose_async_chapa_client
+from alx_travel_app.listings.models import Booking, Listing, Payment
+
+SYNC_URL = '/api/bookings/{}/initiate_payment/'
+ASYNC_URL = '/api/async/bookings/{}/initiate_payment/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent initiate_payment throughput against a local Chapa '
+        'stub with injected latency: the DRF action (Chapa called from the '
+        'eager job) and the async view on a WSGI thread pool, and the async '
+        'view on the ASGI handler with many requests in flight on one loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='initiate_payment calls per configuration')
+        parser.add_argument('--latency', type=float, default=0.2,
+                            help='Seconds the Chapa stub waits before answering')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='WSGI worker threads, as in a gthread worker')
+        parser.add_argument('--concurrency', type=int, default=100,
+                            help='Requests in flight at once against the ASGI handler')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        with benchmark_database(on_disk=True) as stub:
+            stub.latency = options['latency']
+            self.stdout.write(
+                f"{count} initiate_payment calls per row, Chapa stub answering "
+                f"after {options['latency'] * 1000:.0f}ms"
+            )
+            self.stdout.write(
+                f'{"configuration":<36}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"errors":>8}'
+            )
+            staff, bookings = self._setup(3 * count)
+            runs = [
+                (f"WSGI, {options['threads']} threads, DRF action",
+                 lambda ids: self._wsgi(staff, SYNC_URL, ids, options['threads'])),
+                (f"WSGI, {options['threads']} threads, async view",
+                 lambda ids: self._wsgi(staff, ASYNC_URL, ids, options['threads'])),
+                (f"ASGI, {options['concurrency']} in flight, async view",
+                 lambda ids: asyncio.run(self._asgi(staff, ids, options['concurrency']))),
+            ]
+            for n, (name, run) in enumerate(runs):
+                ids = bookings[n * count:(n + 1) * count]
+                started = time.perf_counter()
+                results = run(ids)
+                elapsed = time.perf_counter() - started
+                latencies = [ms for ms, ok in results]
+                errors = sum(not ok for ms, ok in results)
+                initiated = Payment.objects.filter(
+                    booking_id__in=ids, payment_url__isnull=False
+                ).count()
+                if initiated + errors < count:
+                    raise CommandError(f'{name}: only {initiated} of {count} payments were initiated')
+                self.stdout.write(
+                    f'{name:<36}{count / elapsed:>9.1f}'
+                    f'{statistics.median(latencies):>9.1f}'
+                    f'{percentile(latencies, 95):>9.1f}{errors:>8}'
+                )
+
+    def _setup(self, count):
+        staff = User.objects.create_user('bench-staff', 'staff@example.com', is_staff=True)
+        guest = User.objects.create_user('bench-guest', 'guest@example.com')
+        listing = Listing.objects.create(
+            title='Benchmark stay', description='Async payment benchmark',
+            location='Nairobi', price=100, owner=staff
+        )
+        start = date(2026, 1, 1)
+        bookings = Booking.objects.bulk_create(
+            Booking(listing=listing, user=guest, check_in=start + timedelta(days=2 * n),
+                    check_out=start + timedelta(days=2 * n + 1))
+            for n in range(count)
+        )
+        Payment.objects.bulk_create(payment_for(booking) for booking in bookings)
+        return staff, [booking.id for booking in bookings]
+
+    def _wsgi(self, user, url, ids, threads):
+        # One client per worker thread; the pool caps concurrency like a WSGI server
+        local = threading.local()
+
+        def call(pk):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(user)
+            started = time.perf_counter()
+            response = local.client.post(url.format(pk))
+            return (time.perf_counter() - started) * 1000, response.status_code in (200, 202)
+
+        with ThreadPoolExecutor(threads) as pool:
+            return list(pool.map(call, ids))
+
+    async def _asgi(self, user, ids, concurrency):
+        client = AsyncClient()
+        await client.aforce_login(user)
+        limit = asyncio.Semaphore(concurrency)
+
+        async def call(pk):
+            async with limit:
+                started = time.perf_counter()
+                response = await client.post(ASYNC_URL.format(pk))
+                return (time.perf_counter() - started) * 1000, response.status_code == 200
+
+        try:
+            return await asyncio.gather(*(call(pk) for pk in ids))
+        finally:
+            await aclose_async_chapa_client()
@@ -0,0 +1,82 @@
+import base64
+import time
+from importlib import import_module
+from django.contrib.auth import get_user
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.request import Request
+from alx_travel_app.listings.authentication import CachedTokenAuthentication, issue_token, tokens
+from alx_travel_app.listings.benchmark import benchmark_database, percentile
+
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-request cost of resolving the user under HTTP Basic, '
+        'database and cached sessions, and cached token authentication, with the '
+        'project\'s password hasher, on a throwaway database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = User.objects.create_user('bench-auth', password=PASSWORD)
+            factory = RequestFactory()
+            basic = base64.b64encode(f'bench-auth:{PASSWORD}'.encode()).decode()
+            key, _ = issue_token(user)
+
+            def drf(authenticator, header):
+                return lambda: authenticator.authenticate(
+                    Request(factory.get('/api/bookings/', HTTP_AUTHORIZATION=header))
+                )
+
+            def token_cold():
+                tokens.clear()
+                return CachedTokenAuthentication().authenticate(
+                    Request(factory.get('/api/bookings/', HTTP_AUTHORIZATION=f'Token {key}'))
+                )
+
+            schemes = [
+                ('HTTP Basic', drf(BasicAuthentication(), f'Basic {basic}')),
+                ('session (db)', self._session('django.contrib.sessions.backends.db', user, factory)),
+                ('session (cached_db)',
+                 self._session('django.contrib.sessions.backends.cached_db', user, factory)),
+                ('token, cache miss', token_cold),
+                ('token, cache hit', drf(CachedTokenAuthentication(), f'Token {key}')),
+            ]
+            self.stdout.write(f"{options['requests']} requests per scheme")
+            self.stdout.write(f'{"scheme":<22}{"p50 us":>10}{"p95 us":>10}{"queries":>9}')
+            for name, authenticate in schemes:
+                authenticate()
+                latencies = []
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(options['requests']):
+                        started = time.perf_counter()
+                        authenticate()
+                        latencies.append((time.perf_counter() - started) * 1e6)
+                self.stdout.write(
+                    f'{name:<22}{percentile(latencies, 50):>10.1f}{percentile(latencies, 95):>10.1f}'
+                    f'{len(queries) / options["requests"]:>9.1f}'
+                )
+
+    def _session(self, engine, user, factory):
+        """What SessionMiddleware and AuthenticationMiddleware do for a logged-in request"""
+        store_class = import_module(engine).SessionStore
+        store = store_class()
+        store['_auth_user_id'] = str(user.pk)
+        store['_auth_user_backend'] = 'django.contrib.auth.backends.ModelBackend'
+        store['_auth_user_hash'] = user.get_session_auth_hash()
+        store.save()
+
+        def authenticate():
+            request = factory.get('/api/bookings/')
+            request.session = store_class(store.session_key)
+            return get_user(request)
+        return authenticate
@@ -0,0 +1,108 @@
+import json
+import os
+import platform
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from alx_travel_app.listings.benchmark import (
+    benchmark_database, budgets_from, check_budgets, load_budgets, run_benchmark, seed_dataset
+)
+from alx_travel_app.listings.management.commands.seed import scaled_count
+
+DEFAULT_BUDGETS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'benchmark_budgets.json'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every API route against seeded datasets of several sizes, '
+        'with Chapa replaced by a local stub and payment jobs run in-process. '
+        'Runs in a throwaway test database. Fails if a committed query budget '
+        'or latency baseline is exceeded.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000',
+                            help='Comma-separated dataset sizes in listings, e.g. 1k,10k,100k')
+        parser.add_argument('--requests', type=int, default=30,
+                            help='Requests per route and size')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--budgets', default=DEFAULT_BUDGETS,
+                            help='JSON file with query budgets and p95 latency baselines')
+        parser.add_argument('--tolerance', type=float, default=3.0,
+                            help='Allowed multiple of the p95 baseline before failing')
+        parser.add_argument('--no-latency-check', action='store_true',
+                            help='Only enforce query budgets (e.g. on noisy CI machines)')
+        parser.add_argument('--with-cache', action='store_true',
+                            help='Serve listings through the payload cache')
+        parser.add_argument('--output', default=None,
+                            help='Write machine-readable results to this JSON file')
+        parser.add_argument('--update-budgets', action='store_true',
+                            help='Rewrite the budget file from this run instead of checking it')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [scaled_count(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError(f"Invalid --sizes {options['sizes']!r}")
+        if options['requests'] < 2:
+            raise CommandError('--requests must be at least 2')
+
+        results = {}
+        with benchmark_database():
+            for size in sizes:
+                self.stdout.write(f'Seeding {size:,} listings...')
+                seed_dataset(size, options['seed'])
+                results[size] = run_benchmark(
+                    options['requests'], options['seed'], options['with_cache']
+                )
+                self._table(size, results[size])
+
+        if options['update_budgets']:
+            with open(options['budgets'], 'w') as f:
+                json.dump(budgets_from(results), f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote budgets to {options['budgets']}"))
+            violations = []
+        else:
+            tolerance = None if options['no_latency_check'] else options['tolerance']
+            violations = check_budgets(results, load_budgets(options['budgets']), tolerance)
+
+        if options['output']:
+            self._write_results(options, results, violations)
+        if violations:
+            for violation in violations:
+                self.stderr.write(f'  {violation}')
+            raise CommandError(f'{len(violations)} budget violation(s)')
+        self.stdout.write(self.style.SUCCESS('All routes within budget'))
+
+    def _table(self, size, routes):
+        self.stdout.write(
+            f'{"route":<26}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+            f'{"queries":>9}{"peak KiB":>10}'
+        )
+        for route, result in routes.items():
+            peak = result['peak_kib'] if result['peak_kib'] is not None else '-'
+            self.stdout.write(
+                f"{route:<26}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                f"{result['p99_ms']:>9.2f}{result['queries_max']:>9}{peak:>10}"
+            )
+
+    def _write_results(self, options, results, violations):
+        document = {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'requests_per_route': options['requests'],
+            'seed': options['seed'],
+            'cache': options['with_cache'],
+            'results': {str(size): routes for size, routes in results.items()},
+            'violations': violations,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(document, f, indent=2)
+            f.write('\n')
@@ -0,0 +1,93 @@
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from alx_travel_app.listings.benchmark import benchmark_database
+from alx_travel_app.listings.models import Booking, Listing, Payment
+from alx_travel_app.listings.serializers import PaymentSerializer
+
+BATCH = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure time to first byte, throughput and peak memory of the streaming '
+        'payments export at growing table sizes, against rendering the same rows '
+        'as one in-memory JSON list.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,50000',
+                            help='Comma-separated payment counts')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        with benchmark_database(on_disk=True), override_settings(
+            EXPORT_CHUNK_SIZE=options['chunk_size']
+        ):
+            staff = User.objects.create_user('bench-staff', is_staff=True)
+            client = APIClient()
+            client.force_authenticate(staff)
+            self.stdout.write(
+                f'{"rows":>9}{"method":>16}{"first byte ms":>15}{"total s":>9}'
+                f'{"rows/s":>10}{"peak MiB":>10}'
+            )
+            created = 0
+            for size in sizes:
+                self._grow(staff, created, size)
+                created = size
+                for output in ('csv', 'ndjson'):
+                    self._report(size, output, *self._stream(client, output))
+                self._report(size, 'json list', *self._in_memory())
+
+    def _report(self, rows, method, first_byte, total, peak):
+        self.stdout.write(
+            f'{rows:>9,}{method:>16}{first_byte * 1000:>15.1f}{total:>9.2f}'
+            f'{rows / total:>10,.0f}{peak / 2 ** 20:>10.1f}'
+        )
+
+    def _grow(self, user, start, end):
+        listing = Listing.objects.create(
+            title='Export stay', description='Export benchmark', location='Nairobi',
+            price=Decimal('100.00'), owner=user
+        )
+        first = date(2030, 1, 1)
+        for offset in range(start, end, BATCH):
+            bookings = Booking.objects.bulk_create(
+                Booking(listing=listing, user=user, check_in=first + timedelta(days=n),
+                        check_out=first + timedelta(days=n + 1))
+                for n in range(offset, min(offset + BATCH, end))
+            )
+            Payment.objects.bulk_create(
+                Payment(booking=booking, amount=Decimal('100.00')) for booking in bookings
+            )
+
+    def _stream(self, client, output):
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = client.get(f'/api/payments/export/?output={output}')
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        first_byte = time.perf_counter() - started
+        for _ in chunks:
+            pass
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return first_byte, total, peak
+
+    def _in_memory(self):
+        tracemalloc.start()
+        started = time.perf_counter()
+        payments = Payment.objects.all()
+        JSONRenderer().render(PaymentSerializer(payments, many=True).data)
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return total, total, peak
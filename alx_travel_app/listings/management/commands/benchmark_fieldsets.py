@@ -0,0 +1,67 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+from alx_travel_app.listings.benchmark import benchmark_database, percentile, seed_dataset
+from alx_travel_app.listings.models import Booking
+from alx_travel_app.listings.views import BookingViewSet
+
+# (name, query string, whether the list starts compact)
+VARIANTS = [
+    ('full (previous default)', '', False),
+    ('compact (default)', '', True),
+    ('?expand=payment', 'expand=payment', True),
+    ('?fields=id,status,listing.title', 'fields=id,status,listing.title', True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare payload size and response time of the bookings list in its '
+        'full representation, the compact default and sparse fieldsets, on a '
+        'throwaway seeded database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per variant')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            seed_dataset(options['listings'], options['seed'])
+            # Staff see every booking, so each page is a full page
+            staff = User.objects.create_user('bench-staff', is_staff=True)
+            client = APIClient()
+            client.force_authenticate(staff)
+            self.stdout.write(
+                f"{Booking.objects.count()} bookings, 20 per page, "
+                f"{options['requests']} requests per variant"
+            )
+            self.stdout.write(f'{"variant":<34}{"bytes":>9}{"p50 ms":>9}{"p95 ms":>9}')
+            for name, query, compact in VARIANTS:
+                latencies, size = self._measure(
+                    client, f'/api/bookings/?{query}', compact, options['requests']
+                )
+                self.stdout.write(
+                    f'{name:<34}{size:>9,}{statistics.median(latencies):>9.2f}'
+                    f'{percentile(latencies, 95):>9.2f}'
+                )
+
+    def _measure(self, client, url, compact, requests):
+        default = BookingViewSet.compact_actions
+        BookingViewSet.compact_actions = default if compact else ()
+        try:
+            size = len(client.get(url).content)
+            latencies = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = client.get(url)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{url}: HTTP {response.status_code}')
+        finally:
+            BookingViewSet.compact_actions = default
+        return latencies, size
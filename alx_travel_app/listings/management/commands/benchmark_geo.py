@@ -0,0 +1,116 @@
+import random
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from alx_travel_app.listings import geo
+from alx_travel_app.listings.benchmark import benchmark_database, percentile
+from alx_travel_app.listings.models import Listing
+
+# Listings are scattered over a box around Kenya, a few times denser in its towns
+REGION = (-4.7, 33.9, 5.0, 41.9)
+TOWNS = [(-1.2833, 36.8167), (-4.0547, 39.6636), (-0.1022, 34.7617), (-2.2717, 40.902)]
+# The dense cluster: about a kilometre around central Nairobi
+CLUSTER = TOWNS[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the nearby search (radius, radius with a price filter, bounding '
+        'box, and a radius around a dense cluster) on the geohash index against '
+        'scanning every listing with coordinates, on a throwaway database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=1_000_000)
+        parser.add_argument('--cluster', type=int, default=50_000,
+                            help='Extra listings packed within about a kilometre of one point')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with benchmark_database(on_disk=True):
+            owner = User.objects.create_user('bench-geo')
+            self._generate(rng, owner, options['listings'], options['batch_size'])
+            self._generate(rng, owner, options['cluster'], options['batch_size'], self._clustered)
+            client = APIClient()
+            points = [self._point(rng) for _ in range(options['requests'])]
+            routes = [
+                ('radius 5 km', lambda lat, lng: f'lat={lat}&lng={lng}&radius_km=5'),
+                ('radius 50 km', lambda lat, lng: f'lat={lat}&lng={lng}&radius_km=50'),
+                ('radius 50 km, price', lambda lat, lng: (
+                    f'lat={lat}&lng={lng}&radius_km=50&min_price=100&max_price=200'
+                )),
+                ('bbox 0.5 deg', lambda lat, lng: (
+                    f'bbox={lat - .25},{lng - .25},{lat + .25},{lng + .25}'
+                )),
+                ('cluster, radius 500', lambda lat, lng: (
+                    f'lat={CLUSTER[0]}&lng={CLUSTER[1]}&radius_km=500'
+                )),
+            ]
+            self.stdout.write(f'{"query":<22}{"p50 ms":>9}{"p95 ms":>9}{"queries":>9}{"results":>9}')
+            for name, params in routes:
+                latencies, results = [], 0
+                with CaptureQueriesContext(connection) as queries:
+                    for lat, lng in points:
+                        started = time.perf_counter()
+                        response = client.get(f'/api/listings/nearby/?{params(lat, lng)}')
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        results += len(response.json()['results'])
+                self._report(name, latencies, len(queries) / len(points), results / len(points))
+            self._full_scan(points[:5])
+
+    def _point(self, rng):
+        if rng.random() < 0.5:
+            lat, lng = rng.choice(TOWNS)
+            return round(lat + rng.gauss(0, 0.2), 4), round(lng + rng.gauss(0, 0.2), 4)
+        min_lat, min_lng, max_lat, max_lng = REGION
+        return round(rng.uniform(min_lat, max_lat), 4), round(rng.uniform(min_lng, max_lng), 4)
+
+    def _clustered(self, rng):
+        lat, lng = CLUSTER
+        return round(lat + rng.gauss(0, 0.005), 5), round(lng + rng.gauss(0, 0.005), 5)
+
+    def _generate(self, rng, owner, count, batch_size, point=None):
+        point = point or self._point
+        self.stdout.write(f'Generating {count} listings...')
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            listings = []
+            for _ in range(min(batch_size, count - offset)):
+                lat, lng = point(rng)
+                listing = Listing(
+                    title='Geo stay', description='Nearby benchmark', location='Kenya',
+                    price=rng.randint(20, 800), latitude=lat, longitude=lng, owner=owner
+                )
+                listing.update_geohash()
+                listings.append(listing)
+            Listing.objects.bulk_create(listings)
+        self.stdout.write(f'Generated in {time.perf_counter() - started:.1f}s')
+
+    def _full_scan(self, points):
+        """What the radius query costs without the index: distance to every listing"""
+        latencies = []
+        for lat, lng in points:
+            started = time.perf_counter()
+            rows = Listing.objects.filter(latitude__isnull=False).values_list(
+                'id', 'latitude', 'longitude'
+            )
+            sorted(
+                (distance, pk) for pk, distance in (
+                    (pk, geo.distance_km(lat, lng, other_lat, other_lng))
+                    for pk, other_lat, other_lng in rows.iterator(chunk_size=5000)
+                ) if distance <= 50
+            )[:20]
+            latencies.append((time.perf_counter() - started) * 1000)
+        self._report('full scan, 50 km', latencies, 1, 20)
+
+    def _report(self, name, latencies, queries, results):
+        self.stdout.write(
+            f'{name:<22}{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}'
+            f'{queries:>9.1f}{results:>9.1f}'
+        )
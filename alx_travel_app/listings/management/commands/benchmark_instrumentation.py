@@ -0,0 +1,66 @@
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIClient
+from alx_travel_app.listings.benchmark import benchmark_database, seed_dataset, without_listing_cache
+
+MIDDLEWARE_PATH = 'alx_travel_app.listings.middleware.InstrumentationMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the overhead of the instrumentation middleware on an endpoint '
+        '(the listing list by default), alternating rounds with and without it '
+        'against a seeded throwaway database. Fails above --max-overhead.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/listings/')
+        parser.add_argument('--listings', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=15)
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Requests per round and configuration')
+        parser.add_argument('--max-overhead', type=float, default=5.0,
+                            help='Largest acceptable overhead, in percent')
+
+    def handle(self, *args, **options):
+        without = [path for path in settings.MIDDLEWARE if path != MIDDLEWARE_PATH]
+        with benchmark_database(), without_listing_cache():
+            seed_dataset(options['listings'], seed=42)
+            # Each client builds its middleware chain on first use and keeps it
+            with override_settings(MIDDLEWARE=[MIDDLEWARE_PATH] + without):
+                instrumented = APIClient()
+                instrumented.get(options['url'])
+            with override_settings(MIDDLEWARE=without):
+                plain = APIClient()
+                plain.get(options['url'])
+
+            plain_ms, instrumented_ms, ratios = [], [], []
+            pairs = [(plain, plain_ms), (instrumented, instrumented_ms)]
+            for round_number in range(options['rounds']):
+                # Alternate which goes first so drift affects both alike
+                for client, samples in pairs if round_number % 2 else pairs[::-1]:
+                    samples.append(self._time(client, options['url'], options['requests']))
+                ratios.append(instrumented_ms[-1] / plain_ms[-1])
+
+        overhead = (statistics.median(ratios) - 1) * 100
+        self.stdout.write(
+            f"{options['url']}: {statistics.median(plain_ms):.3f}ms without, "
+            f"{statistics.median(instrumented_ms):.3f}ms with instrumentation "
+            f"(median of {options['rounds']} rounds x {options['requests']} requests)"
+        )
+        if overhead > options['max_overhead']:
+            raise CommandError(
+                f"Instrumentation overhead {overhead:.1f}% exceeds {options['max_overhead']}%"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Instrumentation overhead: {overhead:+.1f}%'))
+
+    def _time(self, client, url, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}')
+        return (time.perf_counter() - started) * 1000 / count
@@ -0,0 +1,86 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.test import APIClient
+from alx_travel_app.listings.benchmark import (
+    benchmark_database, percentile, seed_dataset, without_listing_cache
+)
+from alx_travel_app.listings.renderers import ORJSONRenderer
+from alx_travel_app.listings.views import BookingViewSet, ListingViewSet, PaymentViewSet
+
+URLS = [
+    '/api/listings/?page_size=100',
+    '/api/bookings/?page_size=100',
+    '/api/bookings/?page_size=100&expand=listing.owner,payment,user',
+    '/api/payments/?page_size=100',
+]
+
+# (name, renderer, values() fast path)
+CONFIGURATIONS = [
+    ('DRF JSON + serializer', JSONRenderer, False),
+    ('orjson + serializer', ORJSONRenderer, False),
+    ('orjson + values()', ORJSONRenderer, True),
+]
+
+VIEWSETS = (ListingViewSet, BookingViewSet, PaymentViewSet)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare list endpoint latency with DRF\'s JSON renderer and ModelSerializer, '
+        'the orjson renderer, and the orjson renderer with the values() serializer '
+        'fast path, on a throwaway seeded database. Responses are checked to be '
+        'identical across configurations.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Requests per URL and configuration')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with benchmark_database(), without_listing_cache():
+            seed_dataset(options['listings'], options['seed'])
+            staff = User.objects.create_user('bench-staff', is_staff=True)
+            client = APIClient()
+            client.force_authenticate(staff)
+            self.stdout.write(f"{options['requests']} requests per row, 100 rows per page")
+            for url in URLS:
+                self.stdout.write(f'\n{url}')
+                self.stdout.write(f'{"configuration":<26}{"p50 ms":>9}{"p95 ms":>9}{"speedup":>9}')
+                baseline, reference = None, None
+                for name, renderer, fast in CONFIGURATIONS:
+                    latencies, body = self._measure(client, url, renderer, fast, options['requests'])
+                    if reference is None:
+                        reference = body
+                    elif body != reference:
+                        raise CommandError(f'{url}: {name} response differs')
+                    median = statistics.median(latencies)
+                    baseline = baseline or median
+                    self.stdout.write(
+                        f'{name:<26}{median:>9.2f}{percentile(latencies, 95):>9.2f}'
+                        f'{baseline / median:>8.2f}x'
+                    )
+
+    def _measure(self, client, url, renderer, fast, requests):
+        defaults = {viewset: viewset.renderer_classes for viewset in VIEWSETS}
+        for viewset in VIEWSETS:
+            viewset.renderer_classes = [renderer, BrowsableAPIRenderer]
+        try:
+            with override_settings(API_VALUES_FAST_PATH=fast):
+                body = client.get(url).content
+                latencies = []
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        raise CommandError(f'{url}: HTTP {response.status_code}')
+        finally:
+            for viewset, classes in defaults.items():
+                viewset.renderer_classes = classes
+        return latencies, body
@@ -0,0 +1,104 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from django.core.management.base import BaseCommand
+from alx_travel_app.logutils import JsonFormatter, QueueListenerHandler, SamplingFilter
+
+MESSAGE = 'Payment verification successful for reference %s'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare logging throughput on the calling threads: the old synchronous '
+        'console + FileHandler setup against the queue-based JSON pipeline, '
+        'with and without sampling.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--records', type=int, default=20000,
+                            help='Log calls per thread')
+        parser.add_argument('--sample-rate', type=float, default=0.1)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['threads']} threads x {options['records']:,} INFO records"
+        )
+        self.stdout.write(f'{"setup":<28}{"calls/s":>12}{"us/call":>10}{"drain s":>10}')
+        with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull:
+            setups = {
+                'sync file + console': lambda: self._sync(directory, devnull),
+                'queue, JSON': lambda: self._queued(directory, devnull, None),
+                f"queue, JSON, sampled {options['sample_rate']:g}":
+                    lambda: self._queued(directory, devnull, options['sample_rate']),
+            }
+            for name, build in setups.items():
+                handler, finish = build()
+                calls_per_second, drain = self._run(handler, finish, options['threads'], options['records'])
+                self.stdout.write(
+                    f'{name:<28}{calls_per_second:>12,.0f}'
+                    f'{1e6 / calls_per_second:>10.2f}{drain:>10.2f}'
+                )
+
+    def _sync(self, directory, devnull):
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s')
+        handlers = [
+            logging.FileHandler(os.path.join(directory, 'sync.log')),
+            logging.StreamHandler(devnull),
+        ]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        def finish():
+            for handler in handlers:
+                handler.close()
+        return handlers, finish
+
+    def _queued(self, directory, devnull, sample_rate):
+        handlers = [
+            RotatingFileHandler(os.path.join(directory, 'queued.log'), maxBytes=50 * 1024 * 1024,
+                                backupCount=2),
+            logging.StreamHandler(devnull),
+        ]
+        for handler in handlers:
+            handler.setFormatter(JsonFormatter())
+        queued = QueueListenerHandler(handlers, maxsize=0)
+        if sample_rate is not None:
+            queued.addFilter(SamplingFilter({'benchmark': sample_rate}))
+
+        def finish():
+            queued.stop()
+            for handler in handlers:
+                handler.close()
+        return [queued], finish
+
+    def _run(self, handlers, finish, threads, records):
+        logger = logging.getLogger('benchmark.logging')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        for handler in handlers:
+            logger.addHandler(handler)
+        barrier = threading.Barrier(threads + 1)
+
+        def work():
+            barrier.wait()
+            for n in range(records):
+                logger.info(MESSAGE, n)
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        # Time for the background thread to write what is still queued
+        finish()
+        drain = time.perf_counter() - started - elapsed
+        for handler in handlers:
+            logger.removeHandler(handler)
+        return threads * records / elapsed, drain
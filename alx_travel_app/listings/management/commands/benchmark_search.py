@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from alx_travel_app.listings.models import Listing
+from alx_travel_app.listings.search import icontains_listings, rank_listings, search_backend
+
+WORDS = (
+    'ocean beach villa cottage loft studio garden mountain lake river city '
+    'quiet cozy spacious modern rustic sunny bright private pool terrace '
+    'balcony kitchen fireplace view market harbour forest desert island '
+    'family friendly walk minutes downtown airport station historic charming'
+).split()
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ne', 'tu', 'si', 'po', 'da', 'we', 'zu', 'ye']
+
+LOCATIONS = ['Nairobi', 'Mombasa', 'Diani', 'Kisumu', 'Nakuru', 'Lamu', 'Malindi', 'Nanyuki']
+
+
+def vocabulary(rng, size=5000):
+    """Real words first, then pseudo-words, drawn with a Zipf-like skew"""
+    words = list(WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark full-text listing search against the icontains scan on '
+        'synthetic listings. Data is generated inside a transaction that is '
+        'rolled back, so the database is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._generate(options['listings'], options['batch_size'], options['seed'])
+            self._benchmark(options['repeat'])
+            transaction.set_rollback(True)
+
+    def _generate(self, count, batch_size, seed):
+        rng = random.Random(seed)
+        words, weights = vocabulary(rng)
+        # Common, mid-frequency, rare and multi-term queries
+        self.queries = [
+            words[0], words[200], words[3000],
+            f'{words[5]} {words[40]}', f'{words[100]} {words[2000]}',
+        ]
+        owner = User.objects.create(username=f'bench-search-{seed}')
+        self.stdout.write(f'Generating {count} listings...')
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            Listing.objects.bulk_create([
+                Listing(
+                    title=' '.join(rng.choices(words, weights, k=3)).capitalize(),
+                    description=' '.join(rng.choices(words, weights, k=40)),
+                    price=rng.randint(20, 800),
+                    location=rng.choice(LOCATIONS),
+                    owner=owner,
+                )
+                for _ in range(min(batch_size, count - offset))
+            ])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Generated in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s)')
+
+    def _benchmark(self, repeat):
+        backend = search_backend()
+        self.stdout.write(f'Full-text backend: {backend}')
+        self.stdout.write('Median ms for the first page (20 rows) and for counting all matches')
+        self.stdout.write(
+            f'{"query":<24}{"matches":>10}{"index page":>12}{"scan page":>12}'
+            f'{"index count":>13}{"scan count":>12}'
+        )
+        for query in self.queries:
+            indexed = rank_listings(Listing.objects.all(), query)
+            scan = icontains_listings(Listing.objects.all(), query)
+            self.stdout.write(
+                f'{query:<24}{indexed.count():>10}'
+                f'{self._time(lambda: list(indexed.values_list("id", flat=True)[:20]), repeat):>12.2f}'
+                f'{self._time(lambda: list(scan.values_list("id", flat=True)[:20]), repeat):>12.2f}'
+                f'{self._time(indexed.count, repeat):>13.2f}'
+                f'{self._time(scan.count, repeat):>12.2f}'
+            )
+
+    def _time(self, run, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
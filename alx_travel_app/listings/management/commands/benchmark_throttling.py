@@ -0,0 +1,75 @@
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+from alx_travel_app.listings.benchmark import percentile
+from alx_travel_app.listings.middleware import LoadSheddingMiddleware
+from alx_travel_app.listings.throttling import (
+    PAYMENT_THROTTLES, first_refusal, get_store, reset_buckets
+)
+
+
+class Endpoint:
+    throttle_scope = 'payments'
+    action = 'check_status'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-request overhead of the payment throttles (a token from '
+        'each bucket plus the Chapa latency check) and of the in-flight limiter, '
+        'against the configured throttle store, spread over many clients.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Rates no client reaches, so every request takes the allowed path
+        rates = dict.fromkeys(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], '1000000/s')
+        with override_settings(
+            REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates),
+            THROTTLE_ENABLED=True, LOAD_SHED_MAX_IN_FLIGHT=1000,
+        ):
+            reset_buckets()
+            factory = RequestFactory()
+            requests = []
+            for n in range(options['clients']):
+                request = Request(factory.post('/', REMOTE_ADDR=f'10.0.{n // 256}.{n % 256}'))
+                request.user = User(pk=n + 1, username=f'bench-{n}')
+                requests.append(request)
+            endpoint = Endpoint()
+            throttles = [cls() for cls in PAYMENT_THROTTLES]
+
+            def throttle(n):
+                first_refusal(requests[n % len(requests)], endpoint, throttles)
+
+            middleware = LoadSheddingMiddleware(lambda request: response)
+            response = HttpResponse()
+            plain = factory.get('/api/listings/')
+
+            self.stdout.write(
+                f'{options["requests"]} requests over {options["clients"]} clients, '
+                f'store {type(get_store()).__name__}'
+            )
+            self.stdout.write(f'{"step":<28}{"p50 us":>10}{"p95 us":>10}{"p99 us":>10}')
+            self._measure('payment throttles', throttle, options['requests'])
+            self._measure('in-flight limiter', lambda n: middleware(plain), options['requests'])
+            reset_buckets()
+
+    def _measure(self, name, step, count):
+        for n in range(min(count, 1000)):
+            step(n)
+        latencies = []
+        for n in range(count):
+            started = time.perf_counter()
+            step(n)
+            latencies.append((time.perf_counter() - started) * 1e6)
+        self.stdout.write(
+            f'{name:<28}{percentile(latencies, 50):>10.1f}{percentile(latencies, 95):>10.1f}'
+            f'{percentile(latencies, 99):>10.1f}'
+        )
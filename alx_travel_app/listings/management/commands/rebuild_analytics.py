@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from alx_travel_app.listings.analytics import rebuild_rollups
+from alx_travel_app.listings.models import Listing
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the revenue and occupancy rollups from bookings and payments. '
+        'Status changes keep them current; run it after loading bookings or '
+        'payments with bulk inserts (e.g. the seed command) or direct SQL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('listing_ids', nargs='*', type=int,
+                            help='Listings to rebuild (default: every listing)')
+
+    def handle(self, *args, **options):
+        listing_ids = options['listing_ids'] or (
+            Listing.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        listings = days = 0
+        for listing_id in listing_ids:
+            days += rebuild_rollups(listing_id)
+            listings += 1
+        self.stdout.write(f'Rebuilt {days} daily rollups for {listings} listings')
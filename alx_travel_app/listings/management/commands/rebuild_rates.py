@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from alx_travel_app.listings.models import RatePeriod
+from alx_travel_app.listings.pricing import rebuild_nightly_rates
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the nightly rate table from rate periods. Saving a period '
+        'does this for its listing; run it after changing PRICING_WEEKEND_DAYS '
+        'or loading periods with bulk inserts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('listing_ids', nargs='*', type=int,
+                            help='Listings to rebuild (default: every listing with rate periods)')
+
+    def handle(self, *args, **options):
+        listing_ids = options['listing_ids'] or (
+            RatePeriod.objects.values_list('listing_id', flat=True).distinct().order_by()
+        )
+        listings = nights = 0
+        for listing_id in listing_ids:
+            nights += rebuild_nightly_rates(listing_id)
+            listings += 1
+        self.stdout.write(f'Rebuilt {nights} nightly rates for {listings} listings')
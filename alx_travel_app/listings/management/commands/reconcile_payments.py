@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from alx_travel_app.listings.chapa_service import ChapaService
+from alx_travel_app.listings.models import Payment
+from alx_travel_app.listings.transitions import complete_payments, fail_payments
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at most ``rate`` per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Command(BaseCommand):
+    help = (
+        'Verify pending payments with Chapa in bulk and apply the results. '
+        'Rows are streamed in keyset-ordered chunks, verified concurrently '
+        'under a rate limit and written back with bulk updates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Concurrent Chapa verification calls')
+        parser.add_argument('--rate', type=float, default=20.0,
+                            help='Maximum Chapa calls per second (0 for no limit)')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Stop after this many payments')
+        parser.add_argument('--checkpoint', default=None,
+                            help='File recording progress so an interrupted run can resume')
+        parser.add_argument('--reset-checkpoint', action='store_true',
+                            help='Ignore an existing checkpoint and start from the beginning')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Verify but do not write any changes')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+
+        self.dry_run = options['dry_run']
+        self.checkpoint = options['checkpoint']
+        position = None
+        if self.checkpoint and not options['reset_checkpoint']:
+            position = self._load_checkpoint()
+            if position:
+                self.stdout.write(f'Resuming after payment {position[1]} ({position[0].isoformat()})')
+
+        self.service = ChapaService()
+        limiter = RateLimiter(options['rate'])
+        totals = {'processed': 0, 'completed': 0, 'failed': 0, 'pending': 0, 'errors': 0}
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while options['limit'] is None or totals['processed'] < options['limit']:
+                size = options['chunk_size']
+                if options['limit'] is not None:
+                    size = min(size, options['limit'] - totals['processed'])
+                chunk = self._next_chunk(position, size)
+                if not chunk:
+                    break
+
+                def verify(row):
+                    limiter.acquire()
+                    return row, self.service.verify_payment(row['chapa_reference'])
+
+                outcome = self._apply(pool.map(verify, chunk))
+                for key, value in outcome.items():
+                    totals[key] += value
+                totals['processed'] += len(chunk)
+
+                last = chunk[-1]
+                position = (last['created_at'], last['id'])
+                if not self.dry_run:
+                    self._save_checkpoint(position)
+                self._report(totals, started)
+
+        if self.checkpoint and not self.dry_run and os.path.exists(self.checkpoint):
+            if options['limit'] is None or totals['processed'] < options['limit']:
+                os.remove(self.checkpoint)
+
+        elapsed = time.perf_counter() - started
+        prefix = '[dry run] ' if self.dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Reconciled {totals['processed']} payments in {elapsed:.1f}s "
+            f"({totals['processed'] / max(elapsed, 1e-9):,.1f}/s): "
+            f"{totals['completed']} completed, {totals['failed']} failed, "
+            f"{totals['pending']} still pending, {totals['errors']} errors"
+        ))
+
+    def _next_chunk(self, position, size):
+        """Fetch the next keyset page of pending payments, oldest first"""
+        queryset = Payment.objects.filter(status='pending', chapa_reference__isnull=False)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            )
+        return list(
+            queryset.order_by('created_at', 'id')
+            .values('id', 'chapa_reference', 'created_at')[:size]
+        )
+
+    def _apply(self, results):
+        """Bucket verification results and write them back in bulk"""
+        completed, failed = [], []
+        outcome = {'completed': 0, 'failed': 0, 'pending': 0, 'errors': 0}
+        for row, result in results:
+            if not result['success']:
+                outcome['errors'] += 1
+            elif result['status'] == 'success':
+                completed.append(row['id'])
+            elif result['status'] == 'failed':
+                failed.append(row['id'])
+            else:
+                outcome['pending'] += 1
+
+        if self.dry_run:
+            outcome['completed'] = len(completed)
+            outcome['failed'] = len(failed)
+            return outcome
+
+        with transaction.atomic():
+            # Conditional updates: rows a concurrent webhook already moved are skipped
+            outcome['completed'] = len(complete_payments(completed))
+            outcome['failed'] = fail_payments(failed)
+        return outcome
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return None
+        with open(self.checkpoint) as f:
+            data = json.load(f)
+        created_at = parse_datetime(data['created_at'])
+        if created_at is None:
+            raise CommandError(f'Corrupt checkpoint file {self.checkpoint}')
+        return created_at, data['id']
+
+    def _save_checkpoint(self, position):
+        if not self.checkpoint:
+            return
+        tmp = f'{self.checkpoint}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'created_at': position[0].isoformat(), 'id': str(position[1])}, f)
+        os.replace(tmp, self.checkpoint)
+
+    def _report(self, totals, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"  {totals['processed']} processed "
+            f"({totals['processed'] / max(elapsed, 1e-9):,.1f}/s)"
+        )
@@ -1,73 +1,241 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from listings.models import Listing, Booking, Review
-from datetime import datetime, timedelta
+import itertools
 import random
+import re
+import time
+import uuid
+from datetime import date, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from alx_travel_app.listings.availability import nights_between
+from alx_travel_app.listings.cache import invalidate_lists
+from alx_travel_app.listings.management.commands.benchmark_search import LOCATIONS, vocabulary
+from alx_travel_app.listings.models import BookedNight, Booking, Listing, Payment
+
+# Nights per stay: mostly short breaks, a bump at one week
+STAY_LENGTHS = list(range(1, 15))
+STAY_WEIGHTS = [10, 25, 22, 15, 9, 6, 8, 2, 1, 1, 0.5, 0.5, 0.5, 1.5]
+# Empty nights between consecutive stays of a listing
+GAP_LENGTHS = [0, 1, 2, 3, 5, 7, 14, 30]
+GAP_WEIGHTS = [30, 20, 15, 10, 10, 7, 5, 3]
+# Booking status and the payment status that goes with it
+STATUSES = [('confirmed', 'completed'), ('pending', 'pending'), ('cancelled', 'cancelled')]
+STATUS_WEIGHTS = [70, 22, 8]
+
+
+def scaled_count(value):
+    """Parse counts such as ``5000``, ``100k`` or ``1.5M``"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([kKmM]?)', value.strip())
+    if not match:
+        raise ValueError(value)
+    number, suffix = match.groups()
+    return int(float(number) * {'': 1, 'k': 1_000, 'm': 1_000_000}[suffix.lower()])
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
 
 class Command(BaseCommand):
-    help = 'Seeds the database with sample data'
-
-    def handle(self, *args, **kwargs):
-        self.stdout.write('Seeding data...')
-        
-        # Create sample users
-        users = []
-        for i in range(5):
-            user = User.objects.create_user(
-                username=f'user{i+1}',
-                email=f'user{i+1}@example.com',
-                password='password123',
-                first_name=f'First{i+1}',
-                last_name=f'Last{i+1}'
-            )
-            users.append(user)
-            self.stdout.write(f'Created user: {user.username}')
-
-        # Create sample listings
-        property_types = ['HOUSE', 'APARTMENT', 'VILLA', 'CONDO']
-        cities = ['New York', 'Los Angeles', 'Chicago', 'Miami', 'Seattle']
-        
-        listings = []
-        for i in range(10):
-            listing = Listing.objects.create(
-                title=f'Beautiful {property_types[i % 4].lower()} in {cities[i % 5]}',
-                description=f'This is a wonderful {property_types[i % 4].lower()} in the heart of {cities[i % 5]}.',
-                address=f'{random.randint(1, 999)} Main St',
-                city=cities[i % 5],
-                state='State',
-                zipcode=f'{random.randint(10000, 99999)}',
-                price=random.randint(100, 500),
-                bedrooms=random.randint(1, 5),
-                bathrooms=random.randint(1, 4),
-                guests=random.randint(2, 10),
-                property_type=property_types[i % 4],
-                owner=users[i % 5],
-                is_available=True
-            )
-            listings.append(listing)
-            self.stdout.write(f'Created listing: {listing.title}')
-
-        # Create sample bookings
-        for i in range(15):
-            check_in = datetime.now().date() + timedelta(days=random.randint(1, 30))
-            check_out = check_in + timedelta(days=random.randint(1, 7))
-            booking = Booking.objects.create(
-                listing=random.choice(listings),
-                guest=random.choice(users),
-                check_in=check_in,
-                check_out=check_out,
-                total_price=random.randint(100, 1000),
-                status=random.choice(['PENDING', 'CONFIRMED', 'COMPLETED'])
+    help = (
+        'Generate a deterministic synthetic dataset of users, listings, '
+        'bookings (with their booked nights) and payments for load testing. '
+        'Rows are written with bulk inserts; bookings of a listing never overlap.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=scaled_count, default=100,
+                            help='Number of users, e.g. 100k')
+        parser.add_argument('--listings', type=scaled_count, default=1000,
+                            help='Number of listings, e.g. 1M')
+        parser.add_argument('--bookings', type=scaled_count, default=5000,
+                            help='Number of bookings, e.g. 10M')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--start', type=date.fromisoformat, default=date(2026, 1, 1),
+                            help='Earliest check-in date (YYYY-MM-DD)')
+        parser.add_argument('--prefix', default='seed',
+                            help='Username prefix marking generated users')
+        parser.add_argument('--password', default='password123',
+                            help='Password shared by every generated user')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete users with this prefix (and their data) first')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--users and --batch-size must be positive')
+        if options['listings'] < 1 and options['bookings']:
+            raise CommandError('Bookings need at least one listing')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        seeded = User.objects.filter(username__startswith=f'{self.prefix}-')
+        if options['clear']:
+            seeded.delete()
+        elif seeded.exists():
+            raise CommandError(
+                f'Users prefixed "{self.prefix}-" already exist; pass --clear or another --prefix'
             )
-            self.stdout.write(f'Created booking: {booking}')
-
-            # Create sample reviews for some bookings
-            if booking.status == 'COMPLETED':
-                Review.objects.create(
-                    booking=booking,
-                    rating=random.randint(1, 5),
-                    comment=f'Great stay at {booking.listing.title}!'
+
+        started = time.perf_counter()
+        totals = {}
+        totals['users'] = self._users(options['users'], options['password'])
+        totals['listings'] = self._listings(options['listings'])
+        totals.update(self._bookings(options['bookings'], options['start']))
+        invalidate_lists()
+
+        elapsed = time.perf_counter() - started
+        rows = sum(totals.values())
+        summary = ', '.join(f'{count:,} {name}' for name, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {summary} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)'
+        ))
+
+    def _insert(self, model, objs):
+        """
+        Bulk insert one batch, making sure primary keys are set afterwards.
+
+        Backends that cannot return ids from a bulk insert (MySQL) get them
+        read back in insertion order, which assumes nothing else inserts
+        into the table meanwhile.
+        """
+        if model._meta.pk.has_default() or connection.features.can_return_rows_from_bulk_insert:
+            return model.objects.bulk_create(objs)
+        last = model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        model.objects.bulk_create(objs)
+        ids = model.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)
+        for obj, pk in zip(objs, ids):
+            obj.pk = pk
+        return objs
+
+    def _timed(self, label, count, batches):
+        """Insert generated batches, reporting progress and the insert rate"""
+        started = time.perf_counter()
+        done = 0
+        for batch in batches:
+            done += len(batch)
+            self.stdout.write(f'  {label}: {done:,}/{count:,}', ending='\r')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'  {label}: {done:,} in {elapsed:.1f}s ({done / max(elapsed, 1e-9):,.0f} rows/s)')
+        return done
+
+    def _users(self, count, password):
+        # Hashing once instead of per user is what makes large runs feasible
+        password = make_password(password)
+        self.user_ids = []
+
+        def batches():
+            for numbers in batched(range(count), self.batch_size):
+                users = [
+                    User(
+                        username=f'{self.prefix}-{n}',
+                        email=f'{self.prefix}-{n}@example.com',
+                        password=password,
+                    )
+                    for n in numbers
+                ]
+                with transaction.atomic():
+                    self._insert(User, users)
+                self.user_ids.extend(user.pk for user in users)
+                yield users
+
+        return self._timed('users', count, batches())
+
+    def _listings(self, count):
+        rng = self.rng
+        words, weights = vocabulary(rng, size=2000)
+        cum_weights = list(itertools.accumulate(weights))
+        self.listing_ids, self.listing_prices = [], []
+
+        def batches():
+            for numbers in batched(range(count), self.batch_size):
+                listings = [
+                    Listing(
+                        title=' '.join(rng.choices(words, cum_weights=cum_weights, k=3)).capitalize(),
+                        description=' '.join(rng.choices(words, cum_weights=cum_weights, k=30)),
+                        # Log-normal prices: many modest places, a long luxury tail
+                        price=min(round(rng.lognormvariate(4.6, 0.6)), 99_999),
+                        location=rng.choice(LOCATIONS),
+                        owner_id=rng.choice(self.user_ids),
+                    )
+                    for _ in numbers
+                ]
+                with transaction.atomic():
+                    self._insert(Listing, listings)
+                self.listing_ids.extend(listing.pk for listing in listings)
+                self.listing_prices.extend(listing.price for listing in listings)
+                yield listings
+
+        return self._timed('listings', count, batches())
+
+    def _bookings(self, count, start):
+        """
+        Generate bookings with a skewed popularity per listing.
+
+        Each listing keeps a cursor date; a new stay starts after a random
+        gap from the cursor and moves it to the check-out date, so stays on
+        one listing never overlap and cluster like real calendars.
+        """
+        rng = self.rng
+        totals = {'bookings': 0, 'booked nights': 0, 'payments': 0}
+        if not count:
+            return totals
+        popularity = list(itertools.accumulate(
+            rng.paretovariate(1.2) for _ in self.listing_ids
+        ))
+        cursors = [start + timedelta(days=rng.randrange(60)) for _ in self.listing_ids]
+        indexes = range(len(self.listing_ids))
+
+        def stays():
+            for n in range(count):
+                index = rng.choices(indexes, cum_weights=popularity)[0]
+                check_in = cursors[index] + timedelta(
+                    days=rng.choices(GAP_LENGTHS, GAP_WEIGHTS)[0]
                 )
-                self.stdout.write(f'Created review for booking: {booking}')
+                nights = rng.choices(STAY_LENGTHS, STAY_WEIGHTS)[0]
+                cursors[index] = check_in + timedelta(days=nights)
+                booking_status, payment_status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+                yield n, index, check_in, nights, booking_status, payment_status
+
+        def batches():
+            for batch in batched(stays(), self.batch_size):
+                bookings = [
+                    Booking(
+                        listing_id=self.listing_ids[index],
+                        user_id=rng.choice(self.user_ids),
+                        check_in=check_in,
+                        check_out=check_in + timedelta(days=nights),
+                        status=booking_status,
+                    )
+                    for _, index, check_in, nights, booking_status, _ in batch
+                ]
+                with transaction.atomic():
+                    self._insert(Booking, bookings)
+                    booked = BookedNight.objects.bulk_create([
+                        BookedNight(listing_id=booking.listing_id, booking_id=booking.pk, night=night)
+                        for booking in bookings if booking.status != 'cancelled'
+                        for night in nights_between(booking.check_in, booking.check_out)
+                    ], batch_size=self.batch_size)
+                    Payment.objects.bulk_create([
+                        Payment(
+                            id=uuid.UUID(int=rng.getrandbits(128), version=4),
+                            booking_id=booking.pk,
+                            amount=self.listing_prices[index] * stay_nights,
+                            status=payment_status,
+                            chapa_reference=(
+                                f'{self.prefix}-{n}' if payment_status == 'completed' else None
+                            ),
+                        )
+                        for booking, (n, index, _, stay_nights, _, payment_status)
+                        in zip(bookings, batch)
+                    ])
+                totals['booked nights'] += len(booked)
+                totals['payments'] += len(bookings)
+                yield bookings
 
-        self.stdout.write(self.style.SUCCESS('Successfully seeded the database!')) 
\ No newline at end of file
+        totals['bookings'] = self._timed('bookings', count, batches())
+        return totals
@@ -0,0 +1,317 @@
+import hmac
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Seconds; finer at the low end where most API requests land
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram keyed by a fixed tuple of labels"""
+
+    def __init__(self, name, documentation, labelnames, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        """Return ``(labels, cumulative bucket counts, sum, count)`` per series"""
+        with self._lock:
+            series = [(labels, list(counts), total, n) for labels, (counts, total, n) in self._series.items()]
+        for labels, counts, total, n in sorted(series):
+            cumulative, running = [], 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            yield labels, cumulative, total, n
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, cumulative, total, n in self.samples():
+            base = _labels(self.labelnames, labels)
+            bounds = [_number(bound) for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, cumulative):
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {_number(total)}')
+            lines.append(f'{self.name}_count{{{base}}} {n}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter keyed by labels"""
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{{{_labels(self.labelnames, labels)}}} {_number(value)}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REQUEST_LABELS = ('view', 'action', 'method')
+
+requests_total = Counter(
+    'http_requests_total', 'Requests handled, by view, action, method and status',
+    REQUEST_LABELS + ('status',)
+)
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Wall time spent handling a request', REQUEST_LABELS
+)
+request_db_queries = Histogram(
+    'http_request_db_queries', 'Database queries issued per request', REQUEST_LABELS,
+    buckets=COUNT_BUCKETS
+)
+request_db_duration = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries per request',
+    REQUEST_LABELS
+)
+request_serializer_duration = Histogram(
+    'http_request_serializer_duration_seconds',
+    'Time spent validating and rendering serializers per request (includes lazy queries)',
+    REQUEST_LABELS
+)
+request_chapa_duration = Histogram(
+    'http_request_chapa_duration_seconds', 'Time spent calling Chapa per request',
+    REQUEST_LABELS
+)
+chapa_duration = Histogram(
+    'chapa_request_duration_seconds', 'Latency of each outbound Chapa call attempt',
+    ('method', 'endpoint', 'outcome')
+)
+
+requests_shed_total = Counter(
+    'http_requests_shed_total', 'Requests refused by a throttle or the load shedder, by reason',
+    ('reason',)
+)
+
+auth_token_lookups = Counter(
+    'auth_token_lookups_total', 'API token lookups against the per-process cache, by result',
+    ('result',)
+)
+
+REGISTRY = [
+    requests_total, request_duration, request_db_queries, request_db_duration,
+    request_serializer_duration, request_chapa_duration, chapa_duration, requests_shed_total,
+    auth_token_lookups,
+]
+
+
+class RecentLatency:
+    """
+    Exponentially weighted average of recent call latencies.
+
+    An average older than ``LOAD_SHED_CHAPA_WINDOW`` is stale: the next
+    observation replaces it instead of being blended in.
+    """
+
+    ALPHA = 0.2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def observe(self, seconds):
+        now = perf_counter()
+        with self._lock:
+            if self.observed_at is None or now - self.observed_at >= settings.LOAD_SHED_CHAPA_WINDOW:
+                self.average = seconds
+            else:
+                self.average += self.ALPHA * (seconds - self.average)
+            self.observed_at = now
+
+    def reset(self):
+        self.average = 0.0
+        self.observed_at = None
+
+    def slow_for(self, threshold):
+        """Seconds the average stays meaningful if it exceeds ``threshold``, else 0"""
+        observed_at = self.observed_at
+        if observed_at is None or self.average < threshold:
+            return 0.0
+        return max(0.0, settings.LOAD_SHED_CHAPA_WINDOW - (perf_counter() - observed_at))
+
+
+chapa_latency = RecentLatency()
+
+
+class RequestStats:
+    """Timings accumulated while one request is handled"""
+
+    __slots__ = ('db_queries', 'db_time', 'serializer_time', 'serializing',
+                 'chapa_calls', 'chapa_time', 'queries')
+
+    def __init__(self, capture_queries=False):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.chapa_calls = 0
+        self.chapa_time = 0.0
+        # (seconds, sql) per query, only kept for requests sampled for the slow log
+        self.queries = [] if capture_queries else None
+
+
+current_stats = ContextVar('current_stats', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper adding every query to the current request's stats"""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = perf_counter() - started
+        stats.db_queries += 1
+        stats.db_time += elapsed
+        if stats.queries is not None:
+            stats.queries.append((elapsed, sql))
+
+
+def _add_query_timer(connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+
+def install_query_timing():
+    """
+    Keep :func:`time_query` on every database connection, once per process
+
+    Connections are per thread, and under ASGI the ORM runs on a different
+    thread than the middleware, so the wrapper stays installed and finds the
+    request through ``current_stats``, which ``sync_to_async`` carries over.
+    """
+    connection_created.connect(_add_query_timer, dispatch_uid='metrics.time_query')
+    for connection in connections.all(initialized_only=True):
+        _add_query_timer(connection)
+
+
+def observe_chapa(method, path, elapsed, outcome):
+    """Record one outbound Chapa call, attributing it to the current request if any"""
+    # '/transaction/verify/<reference>' -> '/transaction/verify', to bound cardinality
+    endpoint = '/'.join(path.split('/')[:3])
+    chapa_duration.observe((method, endpoint, outcome), elapsed)
+    chapa_latency.observe(elapsed)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.chapa_calls += 1
+        stats.chapa_time += elapsed
+
+
+@contextmanager
+def serializer_timing():
+    """Count the body as serializer time of the current request"""
+    stats = current_stats.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    # Only the outermost serializer call is timed; nested ones are part of it
+    stats.serializing = True
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += perf_counter() - started
+        stats.serializing = False
+
+
+class TimedSerializerMixin:
+    """
+    Count a serializer's work as serializer time of the current request.
+
+    Hooks ``run_validation`` and ``to_representation`` rather than
+    ``is_valid`` and ``.data``, so the items of a ``many=True`` list are
+    timed as well; nested serializers fall inside their parent's time.
+    """
+
+    def run_validation(self, *args, **kwargs):
+        with serializer_timing():
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, instance):
+        with serializer_timing():
+            return super().to_representation(instance)
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    for metric in REGISTRY:
+        metric.clear()
+    chapa_latency.reset()
+
+
+def metrics_view(request):
+    """Prometheus text exposition of this process's metrics, for staff or a scraper"""
+    token = settings.METRICS_TOKEN
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    scraper = bool(token) and hmac.compare_digest(supplied, token)
+    if not scraper and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,160 @@
+import logging
+import random
+from time import perf_counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from . import metrics
+from .throttling import in_flight
+
+slow_logger = logging.getLogger('alx_travel_app.slow_requests')
+
+
+def view_labels(view_func, method):
+    """Name a resolved view as (view, action), e.g. ('BookingViewSet', 'confirm')"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{getattr(view_func, "__name__", "view")}', ''
+    actions = getattr(view_func, 'actions', None) or {}
+    return cls.__name__, actions.get(method.lower(), '')
+
+
+class InstrumentationMiddleware:
+    """
+    Record per-request timings into the in-process metrics histograms.
+
+    Measures wall time, database query count and time, serializer time and
+    time spent calling Chapa, labelled by view and action. A sampled share
+    of requests also keeps its query list and is logged when it turns out
+    slower than ``SLOW_REQUEST_THRESHOLD_MS``. Place it first in
+    ``MIDDLEWARE`` so the other middleware is included in the timings.
+    Works in both sync and async chains, so under ASGI it does not force
+    async views through a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        metrics.install_query_timing()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, token = self.start(request)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        self.record(request, response, stats, perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = self.start(request)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        self.record(request, response, stats, perf_counter() - started)
+        return response
+
+    def start(self, request):
+        sample_rate = settings.SLOW_REQUEST_SAMPLE_RATE
+        stats = metrics.RequestStats(
+            capture_queries=sample_rate > 0 and random.random() < sample_rate
+        )
+        return stats, metrics.current_stats.set(stats)
+
+    def record(self, request, response, stats, elapsed):
+        # Read from the resolver match rather than process_view, which an
+        # async chain would have to run in a thread
+        match = request.resolver_match
+        view, action = view_labels(match.func, request.method) if match else ('unmatched', '')
+        labels = (view, action, request.method)
+        metrics.requests_total.inc(labels + (str(response.status_code),))
+        metrics.request_duration.observe(labels, elapsed)
+        metrics.request_db_queries.observe(labels, stats.db_queries)
+        metrics.request_db_duration.observe(labels, stats.db_time)
+        metrics.request_serializer_duration.observe(labels, stats.serializer_time)
+        if stats.chapa_calls:
+            metrics.request_chapa_duration.observe(labels, stats.chapa_time)
+
+        if stats.queries is not None and elapsed * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            queries = '\n'.join(f'  {seconds * 1000:8.2f}ms  {sql}' for seconds, sql in stats.queries)
+            slow_logger.warning(
+                'Slow request %s %s (%s.%s) %s in %.1fms: %s queries in %.1fms, '
+                'serializers %.1fms, chapa %.1fms\n%s',
+                request.method, request.path, view, action or '-', response.status_code,
+                elapsed * 1000, stats.db_queries, stats.db_time * 1000,
+                stats.serializer_time * 1000, stats.chapa_time * 1000, queries,
+            )
+
+
+class LoadSheddingMiddleware:
+    """
+    Answer 503 with ``Retry-After`` once ``LOAD_SHED_MAX_IN_FLIGHT`` requests
+    are being served by this process, before any work is spent on the rest.
+
+    Place it right after :class:`InstrumentationMiddleware`, so shed
+    requests are still counted. Paths in ``LOAD_SHED_EXEMPT_PATHS`` (the
+    metrics endpoint) are never shed or counted. A streaming response (the
+    CSV/NDJSON exports) keeps its slot until the server closes it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path.startswith(settings.LOAD_SHED_EXEMPT_PATHS):
+            return self.get_response(request)
+        if not in_flight.acquire():
+            return shed_response()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            in_flight.release()
+            raise
+        return release_when_sent(response)
+
+    async def __acall__(self, request):
+        if request.path.startswith(settings.LOAD_SHED_EXEMPT_PATHS):
+            return await self.get_response(request)
+        if not in_flight.acquire():
+            return shed_response()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            in_flight.release()
+            raise
+        return release_when_sent(response)
+
+
+def release_when_sent(response):
+    """Free the in-flight slot now, or once a streaming response has been sent"""
+    if response.streaming:
+        # Still being produced: close() runs these after the last chunk (or a disconnect)
+        response._resource_closers.append(in_flight.release)
+    else:
+        in_flight.release()
+    return response
+
+
+def shed_response():
+    metrics.requests_shed_total.inc(('in_flight',))
+    response = JsonResponse({'error': 'Server is busy, try again later'}, status=503)
+    response['Retry-After'] = str(settings.LOAD_SHED_RETRY_AFTER)
+    return response
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:14
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def backfill_booked_nights(apps, schema_editor):
+    Booking = apps.get_model('listings', 'Booking')
+    BookedNight = apps.get_model('listings', 'BookedNight')
+    batch = []
+    bookings = Booking.objects.exclude(status='cancelled').order_by('created_at', 'id')
+    for booking in bookings.iterator(chunk_size=2000):
+        for offset in range((booking.check_out - booking.check_in).days):
+            batch.append(BookedNight(
+                listing_id=booking.listing_id,
+                booking_id=booking.id,
+                night=booking.check_in + timedelta(days=offset),
+            ))
+        if len(batch) >= 5000:
+            # Pre-existing overlaps keep the earliest booking's claim
+            BookedNight.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    BookedNight.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0003_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookedNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='listings.booking')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='listings.listing')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('listing', 'night'), name='unique_listing_night')],
+            },
+        ),
+        migrations.RunPython(backfill_booked_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE listings_listing_fts USING fts5(
+        title, description, content='listings_listing', content_rowid='id'
+    )
+    """,
+    # Title matches outrank description matches in the default rank column
+    "INSERT INTO listings_listing_fts(listings_listing_fts, rank) VALUES('rank', 'bm25(10.0, 1.0)')",
+    """
+    CREATE TRIGGER listings_listing_fts_ai AFTER INSERT ON listings_listing BEGIN
+        INSERT INTO listings_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER listings_listing_fts_ad AFTER DELETE ON listings_listing BEGIN
+        INSERT INTO listings_listing_fts(listings_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER listings_listing_fts_au AFTER UPDATE OF title, description ON listings_listing
+    BEGIN
+        INSERT INTO listings_listing_fts(listings_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO listings_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO listings_listing_fts(listings_listing_fts) VALUES('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS listings_listing_fts_au',
+    'DROP TRIGGER IF EXISTS listings_listing_fts_ad',
+    'DROP TRIGGER IF EXISTS listings_listing_fts_ai',
+    'DROP TABLE IF EXISTS listings_listing_fts',
+]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX listing_search_idx ON listings_listing USING GIN ((
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ))
+    """,
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS listing_search_idx',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_search_index = _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+drop_search_index = _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_booked_nights'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingSearchIndex',
+            fields=[
+                ('listing', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='listings.listing')),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'listings_listing_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_payment_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chapa_reference', models.CharField(max_length=255)),
+                ('event_id', models.CharField(max_length=255)),
+                ('event_type', models.CharField(blank=True, max_length=50)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('payload', models.JSONField()),
+                ('trusted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='listings.payment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('chapa_reference', 'event_id'), name='unique_payment_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:51
+
+import django.db.models.deletion
+from importlib import import_module
+from django.db import migrations, models
+
+search = import_module('alx_travel_app.listings.migrations.0005_listing_search')
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Adding columns rebuilds listings_listing on SQLite, which drops its triggers
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in search.SQLITE_REVERSE[:3]:
+        schema_editor.execute(statement)
+    for statement in search.SQLITE_FORWARD:
+        if 'CREATE TRIGGER' in statement:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_payment_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='listing',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='weekend_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='RatePeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('first_night', models.DateField()),
+                ('last_night', models.DateField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('weekend_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('priority', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_periods', to='listings.listing')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NightlyRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('weekend', models.BooleanField(default=False)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nightly_rates', to='listings.listing')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('listing', 'night'), name='unique_listing_rate_night')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StayDiscount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_nights', models.PositiveIntegerField()),
+                ('percent', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stay_discounts', to='listings.listing')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('listing', 'min_nights'), name='unique_listing_stay_discount')],
+            },
+        ),
+    ]
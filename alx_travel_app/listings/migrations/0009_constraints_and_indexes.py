@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:11
+
+from importlib import import_module
+from django.conf import settings
+from django.db import migrations, models
+
+# Adding the listing constraints rebuilds listings_listing on SQLite too
+restore_search_triggers = import_module(
+    'alx_travel_app.listings.migrations.0008_pricing'
+).restore_search_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_pricing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddConstraint(
+            model_name='listing',
+            constraint=models.CheckConstraint(condition=models.Q(('price__gte', 0)), name='listing_price_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='listing',
+            constraint=models.CheckConstraint(condition=models.Q(('weekend_price__isnull', True), ('weekend_price__gte', 0), _connector='OR'), name='listing_weekend_price_non_negative'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='payment',
+            name='chapa_reference',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='transaction_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='booking_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'cancelled'), _negated=True), fields=['listing', 'check_in', 'check_out'], name='booking_active_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.CheckConstraint(condition=models.Q(('check_out__gt', models.F('check_in'))), name='booking_check_out_after_check_in'),
+        ),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.CheckConstraint(condition=models.Q(('amount__gte', 0)), name='payment_amount_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='rateperiod',
+            constraint=models.CheckConstraint(condition=models.Q(('last_night__gte', models.F('first_night'))), name='rate_period_nights_ordered'),
+        ),
+        migrations.AddConstraint(
+            model_name='rateperiod',
+            constraint=models.CheckConstraint(condition=models.Q(('price__gte', 0)), name='rate_period_price_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='staydiscount',
+            constraint=models.CheckConstraint(condition=models.Q(('percent__gte', 0), ('percent__lte', 100)), name='stay_discount_percent_range'),
+        ),
+    ]
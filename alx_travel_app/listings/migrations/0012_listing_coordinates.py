@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:22
+
+from importlib import import_module
+from django.conf import settings
+from django.db import migrations, models
+
+# The new listing columns and constraint rebuild listings_listing on SQLite
+restore_search_triggers = import_module(
+    'alx_travel_app.listings.migrations.0008_pricing'
+).restore_search_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_analytics_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='listing',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['geohash', 'latitude', 'longitude'], name='listing_geo_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='listing',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('latitude__isnull', True), ('longitude__isnull', True)), models.Q(('latitude__gte', -90), ('latitude__isnull', False), ('latitude__lte', 90), ('longitude__gte', -180), ('longitude__isnull', False), ('longitude__lte', 180)), _connector='OR'), name='listing_coordinates_valid'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -1,19 +1,82 @@
 from django.db import models
 from django.contrib.auth.models import User
 import uuid
+from . import geo
 
 class Listing(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Friday and Saturday nights; falls back to price when unset
+    weekend_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    currency = models.CharField(max_length=3, default='USD')
     location = models.CharField(max_length=200)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    # Derived from the coordinates on save, see geo.py
+    geohash = models.CharField(max_length=12, blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='listings')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='listing_created_id_idx'),
+            # Covers the nearby search's candidate scan
+            models.Index(fields=['geohash', 'latitude', 'longitude'], name='listing_geo_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(price__gte=0), name='listing_price_non_negative'),
+            models.CheckConstraint(
+                condition=models.Q(weekend_price__isnull=True) | models.Q(weekend_price__gte=0),
+                name='listing_weekend_price_non_negative'
+            ),
+            models.CheckConstraint(
+                # Both or neither; a comparison with NULL alone would pass the check
+                condition=models.Q(latitude__isnull=True, longitude__isnull=True) | models.Q(
+                    latitude__isnull=False, longitude__isnull=False,
+                    latitude__gte=-90, latitude__lte=90, longitude__gte=-180, longitude__lte=180
+                ),
+                name='listing_coordinates_valid'
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+    def update_geohash(self):
+        """Recompute ``geohash``; bulk writes, which skip save(), call this themselves"""
+        if self.latitude is None or self.longitude is None:
+            self.geohash = None
+        else:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+
+class ListingSearchIndex(models.Model):
+    """
+    Read-only view of the SQLite FTS5 table over listing title/description.
+
+    The table and the triggers that keep it in step with ``Listing`` are
+    created by migration; on other backends this model is unused.
+    """
+    listing = models.OneToOneField(
+        Listing, on_delete=models.DO_NOTHING, primary_key=True,
+        db_column='rowid', db_constraint=False, related_name='search_index'
+    )
+    title = models.TextField()
+    description = models.TextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'listings_listing_fts'
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -29,9 +92,143 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='booking_created_id_idx'),
+            # A guest's bookings, newest first
+            models.Index(fields=['user', 'created_at', 'id'], name='booking_user_created_idx'),
+            # Date lookups on the bookings that hold nights; partial where the
+            # backend supports it (not MySQL), so cancellations do not bloat it
+            models.Index(
+                fields=['listing', 'check_in', 'check_out'],
+                condition=~models.Q(status='cancelled'),
+                name='booking_active_dates_idx'
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(check_out__gt=models.F('check_in')),
+                name='booking_check_out_after_check_in'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s booking for {self.listing.title}"
 
+class BookedNight(models.Model):
+    """One row per occupied night of a non-cancelled booking"""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='booked_nights')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='nights')
+    night = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'night'], name='unique_listing_night'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} @ {self.night}"
+
+class RatePeriod(models.Model):
+    """A dated rate override for a listing, e.g. a high season or a holiday"""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='rate_periods')
+    name = models.CharField(max_length=100, blank=True)
+    first_night = models.DateField()
+    last_night = models.DateField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    weekend_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # Where periods overlap the highest priority wins, then the newest
+    priority = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(last_night__gte=models.F('first_night')),
+                name='rate_period_nights_ordered'
+            ),
+            models.CheckConstraint(condition=models.Q(price__gte=0), name='rate_period_price_non_negative'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} {self.first_night}..{self.last_night} @ {self.price}"
+
+class NightlyRate(models.Model):
+    """
+    Precomputed price of one night covered by a rate period.
+
+    Rebuilt from ``RatePeriod`` rows whenever they change. Nights without a
+    row cost the listing's base (or weekend) price, so quoting a stay is
+    one aggregate over a (listing, night) range.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='nightly_rates')
+    night = models.DateField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    weekend = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'night'], name='unique_listing_rate_night'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} @ {self.night}: {self.price}"
+
+class StayDiscount(models.Model):
+    """Percentage off stays of at least ``min_nights``; the largest applicable one is used"""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='stay_discounts')
+    min_nights = models.PositiveIntegerField()
+    percent = models.DecimalField(max_digits=5, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'min_nights'], name='unique_listing_stay_discount'),
+            models.CheckConstraint(
+                condition=models.Q(percent__gte=0, percent__lte=100), name='stay_discount_percent_range'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id}: {self.percent}% off {self.min_nights}+ nights"
+
+class ListingDailyStats(models.Model):
+    """
+    One listing's confirmed stays and completed payments for one day.
+
+    Maintained incrementally by ``analytics``; ``nights_booked`` is 1 when
+    the night starting on ``day`` is booked, ``bookings`` and ``revenue``
+    count the stays checking in that day.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    nights_booked = models.IntegerField(default=0)
+    bookings = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'day'], name='unique_listing_stats_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} @ {self.day}"
+
+class ListingMonthlyStats(models.Model):
+    """The same figures as ``ListingDailyStats`` summed per month; ``month`` is its first day"""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='monthly_stats')
+    month = models.DateField()
+    nights_booked = models.IntegerField(default=0)
+    bookings = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'month'], name='unique_listing_stats_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} @ {self.month:%Y-%m}"
+
 class Payment(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -45,11 +242,86 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='USD')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    transaction_id = models.CharField(max_length=255, blank=True, null=True)
-    chapa_reference = models.CharField(max_length=255, blank=True, null=True)
+    # Unique, so callback lookups are an index probe; NULLs do not collide
+    transaction_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
+    chapa_reference = models.CharField(max_length=255, blank=True, null=True, unique=True)
     payment_url = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='payment_created_id_idx'),
+            # Admin and export filters: one status over a created_at range
+            models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(amount__gte=0), name='payment_amount_non_negative'),
+        ]
+
+    def __str__(self):
+        return f"Payment {self.id} - {self.booking} - {self.status}" 
+class PaymentJob(models.Model):
+    """A background payment task and its outcome, deduplicated by idempotency key"""
+    INITIATE = 'initiate'
+    VERIFY = 'verify'
+    EMAIL = 'email'
+    KIND_CHOICES = [
+        (INITIATE, 'Initiate payment'),
+        (VERIFY, 'Verify payment'),
+        (EMAIL, 'Confirmation email'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} - {self.status}"
+
+class PaymentEvent(models.Model):
+    """A signed Chapa webhook delivery, recorded once per (reference, event id)"""
+    payment = models.ForeignKey(
+        Payment, on_delete=models.CASCADE, related_name='events', blank=True, null=True
+    )
+    chapa_reference = models.CharField(max_length=255)
+    event_id = models.CharField(max_length=255)
+    event_type = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=20, blank=True)
+    payload = models.JSONField()
+    trusted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chapa_reference', 'event_id'], name='unique_payment_event'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type or 'event'} {self.event_id} for {self.chapa_reference}"
+
+class AuthToken(models.Model):
+    """An API token; only the SHA-256 digest of its key is stored"""
+    digest = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='auth_tokens')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
     def __str__(self):
-        return f"Payment {self.id} - {self.booking} - {self.status}" 
\ No newline at end of file
+        return f"Token for {self.user_id} until {self.expires_at:%Y-%m-%d}"
@@ -0,0 +1,111 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from urllib import parse
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+KeysetCursor = namedtuple('KeysetCursor', ['reverse', 'created_at', 'pk'])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination on ``(created_at, pk)``, newest first.
+
+    Unlike DRF's ``CursorPagination`` the cursor carries the full composite
+    key, so every page is a single index range scan with no offset, however
+    deep the client pages or however many rows share a timestamp.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is not None:
+            try:
+                pk = queryset.model._meta.pk.to_python(self.cursor.pk)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            self.cursor = self.cursor._replace(pk=pk)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        if reverse:
+            queryset = queryset.order_by('created_at', 'pk')
+        else:
+            queryset = queryset.order_by('-created_at', '-pk')
+
+        if self.cursor is not None:
+            created_at, pk = self.cursor.created_at, self.cursor.pk
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+                )
+
+        # Fetch one extra row to learn whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._cursor_for(self.page[-1], reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._cursor_for(self.page[0], reverse=True))
+
+    def _cursor_for(self, instance, reverse):
+        if isinstance(instance, dict):
+            # values() rows from the serializer fast path
+            return KeysetCursor(reverse=reverse, created_at=instance['created_at'], pk=instance['pk'])
+        return KeysetCursor(reverse=reverse, created_at=instance.created_at, pk=instance.pk)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            querystring = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, strict_parsing=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            created_at = parse_datetime(tokens['t'][0])
+            pk = tokens['k'][0]
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return KeysetCursor(reverse=reverse, created_at=created_at, pk=pk)
+
+    def encode_cursor(self, cursor):
+        tokens = {'t': cursor.created_at.isoformat(), 'k': str(cursor.pk)}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens)
+        encoded = urlsafe_b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
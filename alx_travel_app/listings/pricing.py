@@ -0,0 +1,179 @@
+"""
+Stay pricing: nightly rates, weekend prices, length-of-stay discounts and taxes.
+
+Dated overrides (``RatePeriod``) are expanded ahead of time into one
+``NightlyRate`` row per covered night. Every other night costs the
+listing's base or weekend price, and weekend nights in a range are counted
+arithmetically, so pricing a stay never walks its nights: it is one
+aggregate over the (listing, night) range, or a prefix-sum lookup when
+many stays are priced from a preloaded :class:`RateBook`.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from .availability import nights_between
+from .models import NightlyRate, RatePeriod, StayDiscount
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0')
+
+
+def weekend_nights(check_in, check_out):
+    """Count the weekend nights in [check_in, check_out) without walking them"""
+    weekend = settings.PRICING_WEEKEND_DAYS
+    full_weeks, rest = divmod((check_out - check_in).days, 7)
+    first = check_in.weekday()
+    # Every full week holds each weekend day once; at most six nights remain
+    return full_weeks * len(weekend) + sum(
+        1 for offset in range(rest) if (first + offset) % 7 in weekend
+    )
+
+
+def rebuild_nightly_rates(listing_id):
+    """Recompute a listing's NightlyRate rows from its rate periods"""
+    weekend = settings.PRICING_WEEKEND_DAYS
+    rates = {}
+    # Later periods overwrite earlier ones, so order by increasing precedence
+    periods = RatePeriod.objects.filter(listing_id=listing_id).order_by(
+        'priority', 'created_at', 'id'
+    )
+    for period in periods:
+        for night in nights_between(period.first_night, period.last_night + timedelta(days=1)):
+            is_weekend = night.weekday() in weekend
+            price = period.price
+            if is_weekend and period.weekend_price is not None:
+                price = period.weekend_price
+            rates[night] = NightlyRate(
+                listing_id=listing_id, night=night, price=price, weekend=is_weekend
+            )
+    with transaction.atomic():
+        NightlyRate.objects.filter(listing_id=listing_id).delete()
+        NightlyRate.objects.bulk_create(
+            rates.values(), batch_size=settings.BULK_CREATE_BATCH_SIZE
+        )
+    return len(rates)
+
+
+def price_stay(listing, check_in, check_out, rated=(ZERO, 0, 0), discount_percent=ZERO):
+    """
+    Price a stay from its rate-table totals
+
+    ``rated`` is ``(sum of prices, nights, weekend nights)`` of the
+    ``NightlyRate`` rows inside the stay; the remaining nights are charged
+    at the listing's base and weekend prices.
+    """
+    rated_total, rated_nights, rated_weekend = rated
+    nights = (check_out - check_in).days
+    weekend = weekend_nights(check_in, check_out) - rated_weekend
+    weekday = nights - rated_nights - weekend
+    weekend_price = listing.weekend_price if listing.weekend_price is not None else listing.price
+    subtotal = (rated_total or ZERO) + weekend * weekend_price + weekday * listing.price
+    discount = (subtotal * discount_percent / 100).quantize(CENT, ROUND_HALF_UP)
+    taxes = ((subtotal - discount) * settings.PRICING_TAX_RATE / 100).quantize(CENT, ROUND_HALF_UP)
+    return {
+        'listing_id': listing.id,
+        'check_in': check_in,
+        'check_out': check_out,
+        'nights': nights,
+        'currency': listing.currency,
+        'subtotal': subtotal,
+        'discount_percent': discount_percent,
+        'discount': discount,
+        'taxes': taxes,
+        'total': subtotal - discount + taxes,
+    }
+
+
+def rate_totals(listing_ids, check_in, check_out):
+    """Sum the rate-table rows of each listing within a stay, in one grouped query"""
+    rows = (
+        NightlyRate.objects
+        .filter(listing_id__in=listing_ids, night__gte=check_in, night__lt=check_out)
+        .values('listing_id')
+        .annotate(total=Sum('price'), nights=Count('id'), weekend=Count('id', filter=Q(weekend=True)))
+        .values_list('listing_id', 'total', 'nights', 'weekend')
+    )
+    return {listing_id: (total, nights, weekend) for listing_id, total, nights, weekend in rows}
+
+
+def discount_percents(listing_ids, nights):
+    """The best length-of-stay discount of each listing for a stay of ``nights``"""
+    return dict(
+        StayDiscount.objects
+        .filter(listing_id__in=listing_ids, min_nights__lte=nights)
+        .values('listing_id')
+        .annotate(best=Max('percent'))
+        .values_list('listing_id', 'best')
+    )
+
+
+def quote_many(listings, check_in, check_out):
+    """Price one stay at each of ``listings`` with two queries in total"""
+    ids = [listing.id for listing in listings]
+    rated = rate_totals(ids, check_in, check_out)
+    discounts = discount_percents(ids, (check_out - check_in).days)
+    return [
+        price_stay(
+            listing, check_in, check_out,
+            rated.get(listing.id, (ZERO, 0, 0)), discounts.get(listing.id, ZERO)
+        )
+        for listing in listings
+    ]
+
+
+def quote(listing, check_in, check_out):
+    """Price a stay at one listing"""
+    return quote_many([listing], check_in, check_out)[0]
+
+
+class RateBook:
+    """
+    Rate tables and discounts of many listings, loaded once.
+
+    For pricing many stays with different dates, such as a bulk booking
+    request: the rows for the whole span are read in one query and turned
+    into per-listing prefix sums, so each stay is priced by two bisections.
+    """
+
+    def __init__(self, listing_ids, start, end):
+        rows = defaultdict(list)
+        rates = NightlyRate.objects.filter(
+            listing_id__in=listing_ids, night__gte=start, night__lt=end
+        ).order_by('listing_id', 'night').values_list('listing_id', 'night', 'price', 'weekend')
+        for listing_id, night, price, weekend in rates:
+            rows[listing_id].append((night, price, weekend))
+        # nights[i] pairs with the totals of rows before it: sums[i], weekends[i]
+        self.tables = {}
+        for listing_id, table in rows.items():
+            sums, weekends = [ZERO], [0]
+            for night, price, weekend in table:
+                sums.append(sums[-1] + price)
+                weekends.append(weekends[-1] + weekend)
+            self.tables[listing_id] = ([night for night, _, _ in table], sums, weekends)
+        self.discounts = defaultdict(list)
+        for listing_id, min_nights, percent in StayDiscount.objects.filter(
+            listing_id__in=listing_ids
+        ).values_list('listing_id', 'min_nights', 'percent'):
+            self.discounts[listing_id].append((min_nights, percent))
+
+    def rated(self, listing_id, check_in, check_out):
+        if listing_id not in self.tables:
+            return ZERO, 0, 0
+        nights, sums, weekends = self.tables[listing_id]
+        lo, hi = bisect_left(nights, check_in), bisect_left(nights, check_out)
+        return sums[hi] - sums[lo], hi - lo, weekends[hi] - weekends[lo]
+
+    def discount(self, listing_id, nights):
+        eligible = [percent for min_nights, percent in self.discounts[listing_id] if min_nights <= nights]
+        return max(eligible, default=ZERO)
+
+    def quote(self, listing, check_in, check_out):
+        return price_stay(
+            listing, check_in, check_out,
+            self.rated(listing.id, check_in, check_out),
+            self.discount(listing.id, (check_out - check_in).days),
+        )
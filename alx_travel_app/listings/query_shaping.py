@@ -0,0 +1,270 @@
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+from rest_framework import serializers
+
+
+class FieldSelection(NamedTuple):
+    """
+    Which fields of a :class:`SparseFieldsMixin` serializer to render.
+
+    ``fields`` and ``expand`` hold dotted paths (``listing.title``);
+    ``fields=None`` keeps the serializer's default set. Hashable, so query
+    shapes can be cached per selection.
+    """
+    fields: Optional[Tuple[str, ...]] = None
+    expand: Tuple[str, ...] = ()
+    compact: bool = False
+
+    @classmethod
+    def from_params(cls, params, compact=False):
+        """Read ``?fields=`` and ``?expand=`` from a request's query parameters"""
+        fields = params.get('fields')
+        return cls(
+            fields=None if fields is None else _split(fields),
+            expand=_split(params.get('expand', '')),
+            compact=compact,
+        )
+
+
+def _split(value):
+    return tuple(sorted({part.strip() for part in value.split(',') if part.strip()}))
+
+
+def _subpaths(paths, name):
+    prefix = name + '.'
+    return tuple(path[len(prefix):] for path in paths if path.startswith(prefix))
+
+
+class SparseFieldsMixin:
+    """
+    Serializer that renders only the fields a client selected.
+
+    Takes the :class:`FieldSelection` attributes as keyword arguments:
+    ``fields`` keeps the named fields, ``expand`` renders the named nested
+    serializers, and ``compact`` starts from ``Meta.compact_fields`` instead
+    of every field. In compact mode a nested serializer that is kept but not
+    expanded collapses to the related primary key when the relation is a
+    local foreign key, and is dropped otherwise. Selections pass down to
+    nested serializers through their dotted paths. Write-only fields are
+    never touched.
+    """
+
+    def __init__(self, *args, fields=None, expand=(), compact=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and not expand and not compact:
+            return
+        readable = {name for name, field in self.fields.items() if not field.write_only}
+        top_fields = None if fields is None else {path.split('.')[0] for path in fields}
+        top_expand = {path.split('.')[0] for path in expand}
+        unknown = sorted(((top_fields or set()) | top_expand) - readable)
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': [f'Unknown field "{name}".' for name in unknown]}
+            )
+        if top_fields is not None:
+            keep = top_fields | top_expand
+        elif compact:
+            keep = set(getattr(self.Meta, 'compact_fields', readable)) | top_expand
+        else:
+            keep = readable
+        for name in readable:
+            field = self.fields[name]
+            if name not in keep:
+                del self.fields[name]
+            elif isinstance(field, serializers.BaseSerializer) and not isinstance(
+                    field, serializers.ListSerializer):
+                child_fields = _subpaths(fields or (), name) or None
+                if compact and name not in top_expand and child_fields is None:
+                    self._collapse(name, field)
+                elif isinstance(field, SparseFieldsMixin):
+                    self.fields[name] = type(field)(
+                        *field._args, **field._kwargs, fields=child_fields,
+                        expand=_subpaths(expand, name), compact=compact
+                    )
+
+    def _collapse(self, name, field):
+        model_field = self.Meta.model._meta.get_field(field.source)
+        if model_field.concrete and model_field.is_relation:
+            source = {} if field.source == name else {'source': field.source}
+            self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **source)
+        else:
+            del self.fields[name]
+
+
+class QueryShapingMixin:
+    """
+    Shape viewset querysets to match what their serializers walk.
+
+    Viewsets declare the relations their serializers traverse in
+    ``select_related_fields`` (forward FKs and reverse one-to-ones) and
+    ``prefetch_related_fields`` (reverse FKs and many-to-many). The matching
+    ``only()`` column list is derived from the serializer so unused columns
+    are not fetched either.
+
+    In ``deferred_actions`` clients may narrow the response with
+    ``?fields=`` and ``?expand=`` (see :class:`SparseFieldsMixin`), and
+    ``compact_actions`` start from the compact representation. Relations
+    the narrowed serializer no longer renders are not joined.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    # Actions that only render the serializer; others may touch any column
+    deferred_actions = ('list', 'retrieve')
+    compact_actions = ('list',)
+
+    def field_selection(self):
+        """The FieldSelection requested for this action, or None if it renders in full"""
+        action = getattr(self, 'action', None)
+        request = getattr(self, 'request', None)
+        if action not in self.deferred_actions or request is None:
+            return None
+        return FieldSelection.from_params(request.query_params, action in self.compact_actions)
+
+    def get_serializer(self, *args, **kwargs):
+        selection = self.field_selection()
+        if selection is not None and issubclass(self.get_serializer_class(), SparseFieldsMixin):
+            kwargs.update(selection._asdict())
+        return super().get_serializer(*args, **kwargs)
+
+    def shape_queryset(self, queryset, serializer_class=None,
+                       select_related=None, prefetch_related=None, defer=None,
+                       selection=None):
+        """Apply select_related / prefetch_related / only() to a queryset"""
+        if serializer_class is None:
+            serializer_class = self.get_serializer_class()
+        if select_related is None:
+            select_related = self.select_related_fields
+        if prefetch_related is None:
+            prefetch_related = self.prefetch_related_fields
+        if defer is None:
+            defer = getattr(self, 'action', None) in self.deferred_actions
+        if selection is None and defer:
+            selection = self.field_selection()
+        return shape_queryset(queryset, serializer_class, tuple(select_related),
+                              tuple(prefetch_related), defer=defer, selection=selection,
+                              keep=self.ordering_columns())
+
+    def ordering_columns(self):
+        """Columns the paginator orders by, which it reads back to build cursors"""
+        ordering = getattr(getattr(self, 'paginator', None), 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return tuple(field.lstrip('-') for field in ordering if field.lstrip('-') != 'pk')
+
+
+def shape_queryset(queryset, serializer_class, select_related=(), prefetch_related=(),
+                   defer=True, selection=None, keep=()):
+    """
+    Apply a declared query shape to ``queryset`` for ``serializer_class``
+
+    ``keep`` names local columns to load even if the serializer does not render them.
+    """
+    columns = ()
+    if defer:
+        if selection is not None and issubclass(serializer_class, SparseFieldsMixin):
+            select_related, columns = sparse_shape(
+                serializer_class, tuple(select_related), selection
+            )
+        else:
+            columns = serializer_columns(serializer_class, tuple(select_related))
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    if columns:
+        queryset = queryset.only(*columns, *keep)
+    return queryset
+
+
+@lru_cache(maxsize=None)
+def serializer_columns(serializer_class, select_related=()):
+    """
+    Return the ``only()`` lookups needed to render ``serializer_class``.
+
+    Returns an empty tuple when the serializer reads anything that cannot be
+    mapped to a concrete column (method fields, dotted sources, properties),
+    in which case the queryset is left undeferred.
+    """
+    return _columns(serializer_class(), select_related)
+
+
+# Bounded: selections come from query strings
+@lru_cache(maxsize=512)
+def sparse_shape(serializer_class, select_related, selection):
+    """
+    Return ``(select_related, only() lookups)`` for a narrowed serializer
+
+    Joins for relations the full serializer renders but the narrowed one
+    does not are cut back to the deepest relation still rendered.
+    """
+    narrowed = serializer_class(**selection._asdict())
+    dropped = _rendered_relations(serializer_class()) - _rendered_relations(narrowed)
+    kept = []
+    for path in select_related:
+        parts = path.split('__')
+        for i in range(1, len(parts) + 1):
+            if '__'.join(parts[:i]) in dropped:
+                parts = parts[:i - 1]
+                break
+        if parts and '__'.join(parts) not in kept:
+            kept.append('__'.join(parts))
+    kept = tuple(kept)
+    return kept, _columns(narrowed, kept)
+
+
+def _rendered_relations(serializer, prefix=''):
+    paths = set()
+    for field in serializer.fields.values():
+        if field.write_only or isinstance(field, serializers.ListSerializer):
+            continue
+        if isinstance(field, serializers.BaseSerializer) and '.' not in field.source:
+            path = prefix + field.source
+            paths.add(path)
+            paths |= _rendered_relations(field, path + '__')
+    return paths
+
+
+def _columns(serializer, select_related):
+    joined = set()
+    for path in select_related:
+        parts = path.split('__')
+        for i in range(1, len(parts) + 1):
+            joined.add('__'.join(parts[:i]))
+    visited = set()
+    try:
+        columns = _collect_columns(serializer, '', joined, visited)
+    except _Unshapeable:
+        return ()
+    # Relations joined for the view's own use (not rendered) are loaded whole
+    columns.extend(sorted(joined - visited))
+    return tuple(columns)
+
+
+class _Unshapeable(Exception):
+    pass
+
+
+def _collect_columns(serializer, prefix, joined, visited):
+    model = serializer.Meta.model
+    concrete = {f.name for f in model._meta.concrete_fields}
+    columns = [prefix + model._meta.pk.name]
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        source = field.source
+        if source == '*' or '.' in source:
+            raise _Unshapeable()
+        if isinstance(field, serializers.ListSerializer):
+            # Many-valued relations are prefetched; only the local key is needed
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            path = prefix + source
+            if path not in joined:
+                raise _Unshapeable()
+            visited.add(path)
+            columns.extend(_collect_columns(field, path + '__', joined, visited))
+            continue
+        if source not in concrete:
+            raise _Unshapeable()
+        columns.append(prefix + source)
+    return columns
@@ -0,0 +1,78 @@
+import re
+from django.db import connection
+from django.db.models import BooleanField, Exists, F, FloatField, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from .models import BookedNight
+
+# Must match the expression indexed by migration 0005 so Postgres can use it
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(listings_listing.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(listings_listing.description, '')), 'B')"
+)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts5_query(text):
+    """Turn free text into an FTS5 MATCH expression that cannot raise a syntax error"""
+    return ' '.join(f'"{token}"' for token in _TOKEN_RE.findall(text))
+
+
+def search_backend():
+    """Name of the full-text strategy available on the default database"""
+    if connection.vendor == 'sqlite':
+        return 'fts5'
+    if connection.vendor == 'postgresql':
+        return 'tsvector'
+    return 'icontains'
+
+
+def filter_listings(queryset, location=None, min_price=None, max_price=None,
+                    check_in=None, check_out=None):
+    """Apply the structured (non-text) search filters"""
+    if location:
+        queryset = queryset.filter(location__icontains=location)
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+    if check_in and check_out:
+        booked = BookedNight.objects.filter(
+            listing=OuterRef('pk'), night__gte=check_in, night__lt=check_out
+        )
+        queryset = queryset.filter(~Exists(booked))
+    return queryset
+
+
+def rank_listings(queryset, text, backend=None):
+    """
+    Restrict ``queryset`` to listings matching ``text`` and order by relevance.
+
+    Title matches weigh more than description matches. Falls back to an
+    unranked ``icontains`` scan on backends without a full-text index.
+    """
+    backend = backend or search_backend()
+    if backend == 'fts5':
+        match = fts5_query(text)
+        if not match:
+            return queryset.none()
+        # The inner join lets FTS5 drive the query from its MATCH index
+        return queryset.filter(
+            RawSQL('listings_listing_fts MATCH %s', [match], output_field=BooleanField()),
+            search_index__isnull=False
+        ).annotate(rank=F('search_index__rank')).order_by('rank', '-pk')
+    if backend == 'tsvector':
+        query = "websearch_to_tsquery('english', %s)"
+        return queryset.filter(
+            RawSQL(f'({PG_SEARCH_VECTOR}) @@ {query}', [text], output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f'ts_rank({PG_SEARCH_VECTOR}, {query})', [text], output_field=FloatField())
+        ).order_by('-rank', '-pk')
+    return icontains_listings(queryset, text)
+
+
+def icontains_listings(queryset, text):
+    """The unindexed substring scan used before full-text search existed"""
+    return queryset.filter(
+        Q(title__icontains=text) | Q(description__icontains=text)
+    ).order_by('-created_at', '-pk')
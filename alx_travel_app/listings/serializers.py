@@ -1,30 +1,71 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Listing, Booking, Payment
+from .models import Listing, Booking, Payment, PaymentJob
+from .metrics import TimedSerializerMixin
+from .query_shaping import SparseFieldsMixin
+from . import geo
 from django.contrib.auth.models import User
 
-class UserSerializer(serializers.ModelSerializer):
+def validate_stay(check_in, check_out):
+    """Check-out must follow check-in, by at most ``BOOKING_MAX_NIGHTS`` nights"""
+    if check_out <= check_in:
+        raise serializers.ValidationError({'check_out': 'Check-out must be after check-in.'})
+    if (check_out - check_in).days > settings.BOOKING_MAX_NIGHTS:
+        raise serializers.ValidationError(
+            {'check_out': f'A stay can be at most {settings.BOOKING_MAX_NIGHTS} nights.'}
+        )
+
+class UserSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email']
 
-class ListingSerializer(serializers.ModelSerializer):
+class ListingSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
 
     class Meta:
         model = Listing
-        fields = ['id', 'title', 'description', 'price', 'location', 
-                 'created_at', 'updated_at', 'owner']
+        fields = ['id', 'title', 'description', 'price', 'weekend_price', 'currency',
+                 'location', 'latitude', 'longitude', 'created_at', 'updated_at', 'owner']
+        # Rendered by list views unless ?fields= or ?expand= ask for more
+        compact_fields = ['id', 'title', 'price', 'currency', 'location', 'owner']
         read_only_fields = ['created_at', 'updated_at']
+        # Mirror the database check constraints, so bad input is a 400 not an IntegrityError
+        extra_kwargs = {
+            'price': {'min_value': 0}, 'weekend_price': {'min_value': 0},
+            'latitude': {'min_value': -90, 'max_value': 90},
+            'longitude': {'min_value': -180, 'max_value': 180},
+        }
+
+    def validate(self, attrs):
+        coordinates = [
+            attrs.get(field, getattr(self.instance, field, None))
+            for field in ('latitude', 'longitude')
+        ]
+        if (coordinates[0] is None) != (coordinates[1] is None):
+            raise serializers.ValidationError('latitude and longitude must be given together.')
+        return attrs
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'amount', 'currency', 'status', 'transaction_id', 
                  'chapa_reference', 'payment_url', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'transaction_id', 'chapa_reference', 
+        compact_fields = ['id', 'amount', 'currency', 'status', 'created_at']
+        # status only changes through the transitions module
+        read_only_fields = ['id', 'status', 'transaction_id', 'chapa_reference', 
                            'payment_url', 'created_at', 'updated_at']
 
-class BookingSerializer(serializers.ModelSerializer):
+class PaymentJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = PaymentJob
+        fields = ['id', 'payment', 'kind', 'status', 'attempts', 'result', 'error',
+                 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class BookingSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     listing = ListingSerializer(read_only=True)
     payment = PaymentSerializer(read_only=True)
@@ -38,4 +79,175 @@ class BookingSerializer(serializers.ModelSerializer):
         model = Booking
         fields = ['id', 'listing', 'listing_id', 'user', 'check_in', 
                  'check_out', 'status', 'payment', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at'] 
\ No newline at end of file
+        # listing and user collapse to their ids; payment is left out
+        compact_fields = ['id', 'listing', 'user', 'check_in', 'check_out', 'status', 'created_at']
+        # Use the confirm/cancel actions to change status
+        read_only_fields = ['status', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        check_in = attrs.get('check_in', getattr(self.instance, 'check_in', None))
+        check_out = attrs.get('check_out', getattr(self.instance, 'check_out', None))
+        if check_in and check_out:
+            validate_stay(check_in, check_out)
+        return attrs
+
+class DateRangeSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Validates a check_in/check_out query window"""
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+
+    def validate(self, attrs):
+        validate_stay(attrs['check_in'], attrs['check_out'])
+        return attrs 
+
+class AnalyticsQuerySerializer(TimedSerializerMixin, serializers.Serializer):
+    """Validates the period and date range of the analytics actions"""
+    period = serializers.ChoiceField(choices=['day', 'month'], default='day')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    owner = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        # Default to the last 30 days, or the last 12 months
+        end = attrs.setdefault('end', timezone.localdate())
+        if 'start' not in attrs:
+            if attrs['period'] == 'day':
+                attrs['start'] = end - timedelta(days=29)
+            else:
+                months = end.year * 12 + end.month - 12
+                attrs['start'] = date(months // 12, months % 12 + 1, 1)
+        if attrs['end'] < attrs['start']:
+            raise serializers.ValidationError({'end': 'Must not be before start.'})
+        if (attrs['end'] - attrs['start']).days >= settings.ANALYTICS_MAX_DAYS:
+            raise serializers.ValidationError(
+                f'The range can span at most {settings.ANALYTICS_MAX_DAYS} days.'
+            )
+        return attrs
+
+class TokenRequestSerializer(TimedSerializerMixin, serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(trim_whitespace=False)
+
+class ExportQuerySerializer(TimedSerializerMixin, serializers.Serializer):
+    """Validates the query string of the export actions"""
+    output = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    status = serializers.CharField(required=False)
+    created_from = serializers.DateField(required=False)
+    created_to = serializers.DateField(required=False)
+
+    def validate_status(self, value):
+        statuses = [part.strip() for part in value.split(',') if part.strip()]
+        allowed = self.context['statuses']
+        unknown = [status for status in statuses if status not in allowed]
+        if unknown:
+            raise serializers.ValidationError(f'Unknown status "{unknown[0]}".')
+        return statuses
+
+    def validate(self, attrs):
+        start, end = attrs.get('created_from'), attrs.get('created_to')
+        if start and end and end < start:
+            raise serializers.ValidationError({'created_to': 'Must not be before created_from.'})
+        return attrs
+
+class ListingSearchSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Validates the query string of the listing search action"""
+    q = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    location = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    check_in = serializers.DateField(required=False)
+    check_out = serializers.DateField(required=False)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+
+    def validate(self, attrs):
+        check_in, check_out = attrs.get('check_in'), attrs.get('check_out')
+        if (check_in is None) != (check_out is None):
+            raise serializers.ValidationError('check_in and check_out must be given together.')
+        if check_in and check_out <= check_in:
+            raise serializers.ValidationError({'check_out': 'Check-out must be after check-in.'})
+        return attrs
+
+class NearbyQuerySerializer(ListingSearchSerializer):
+    """
+    Validates the nearby action: a point with ``radius_km``, or a ``bbox``
+    of "min_lat,min_lng,max_lat,max_lng", plus the structured search filters
+    """
+    q = None
+    lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    lng = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(required=False, min_value=0)
+    bbox = serializers.CharField(required=False)
+
+    def validate_radius_km(self, value):
+        if value > settings.GEO_MAX_RADIUS_KM:
+            raise serializers.ValidationError(
+                f'The radius may be at most {settings.GEO_MAX_RADIUS_KM:g} km.'
+            )
+        return value
+
+    def validate_bbox(self, value):
+        try:
+            box = tuple(float(part) for part in value.split(','))
+        except ValueError:
+            box = ()
+        if len(box) != 4:
+            raise serializers.ValidationError('Expected min_lat,min_lng,max_lat,max_lng.')
+        min_lat, min_lng, max_lat, max_lng = box
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            raise serializers.ValidationError('Coordinates out of range.')
+        # min_lng > max_lng is a box across the antimeridian
+        width = max_lng - min_lng if min_lng <= max_lng else max_lng - min_lng + 360
+        # As wide as the widest radius search, so either scans a bounded area
+        widest = 2 * settings.GEO_MAX_RADIUS_KM / geo.KM_PER_DEGREE
+        if max_lat - min_lat > widest or width > widest:
+            raise serializers.ValidationError(
+                f'The box may span at most {widest:.2f} degrees each way.'
+            )
+        return box
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        lat, lng, bbox = attrs.get('lat'), attrs.get('lng'), attrs.get('bbox')
+        if (lat is None) != (lng is None):
+            raise serializers.ValidationError('lat and lng must be given together.')
+        if bbox is None:
+            if lat is None or 'radius_km' not in attrs:
+                raise serializers.ValidationError('Give lat, lng and radius_km, or a bbox.')
+        elif lat is None:
+            # Distances in a box without a point are measured from its centre
+            min_lat, min_lng, max_lat, max_lng = bbox
+            if min_lng > max_lng:
+                max_lng += 360
+            attrs['lat'] = (min_lat + max_lat) / 2
+            attrs['lng'] = ((min_lng + max_lng) / 2 + 180) % 360 - 180
+        return attrs
+
+class BatchQuoteSerializer(DateRangeSerializer):
+    """Validates a batch quote: a comma-separated ``ids`` list and a date window"""
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        try:
+            ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+        except ValueError:
+            raise serializers.ValidationError('Expected comma-separated listing ids.')
+        if not ids:
+            raise serializers.ValidationError('At least one listing id is required.')
+        if len(ids) > settings.PRICING_BATCH_MAX_LISTINGS:
+            raise serializers.ValidationError(
+                f'At most {settings.PRICING_BATCH_MAX_LISTINGS} listings can be quoted at once.'
+            )
+        return ids
+
+class QuoteSerializer(TimedSerializerMixin, serializers.Serializer):
+    """The price of one stay, as returned by the pricing module"""
+    listing_id = serializers.IntegerField()
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    nights = serializers.IntegerField()
+    currency = serializers.CharField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discount_percent = serializers.DecimalField(max_digits=5, decimal_places=2)
+    discount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    taxes = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
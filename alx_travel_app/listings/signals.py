@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .authentication import mark_revoked
+from .cache import invalidate_listing, invalidate_owner
+from .analytics import record_removal
+from .models import AuthToken, Booking, Listing, Payment, PaymentJob, RatePeriod
+from .pricing import rebuild_nightly_rates
+from .tasks import enqueue_job
+from .transitions import payment_completed
+
+# User fields rendered inside listing payloads
+OWNER_FIELDS = {'username', 'email'}
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def listing_changed(sender, instance, **kwargs):
+    invalidate_listing(instance.pk)
+
+
+@receiver(post_save, sender=RatePeriod)
+@receiver(post_delete, sender=RatePeriod)
+def rate_period_changed(sender, instance, **kwargs):
+    rebuild_nightly_rates(instance.listing_id)
+
+
+@receiver(pre_delete, sender=Booking)
+def booking_deleted(sender, instance, origin=None, **kwargs):
+    # A listing takes its rollup rows with it
+    if isinstance(origin, Listing):
+        return
+    record_removal(instance)
+
+
+@receiver(post_save, sender=User)
+def owner_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not OWNER_FIELDS & set(update_fields):
+        # e.g. the last_login bump on every login
+        return
+    invalidate_owner(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def token_user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Cached tokens carry a copy of the user; reload it after e.g. deactivation
+    if created or update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    mark_revoked(instance.auth_tokens.values_list('digest', flat=True))
+
+
+@receiver(post_delete, sender=AuthToken)
+def token_deleted(sender, instance, **kwargs):
+    mark_revoked([instance.digest])
+
+
+@receiver(payment_completed, sender=Payment)
+def queue_confirmation_email(sender, payment, **kwargs):
+    enqueue_job(PaymentJob.EMAIL, payment)
@@ -0,0 +1,196 @@
+import logging
+import uuid
+from datetime import timedelta
+from celery import Task, shared_task
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .chapa_service import ChapaService
+from .models import Payment, PaymentJob
+from .transitions import apply_chapa_status
+
+logger = logging.getLogger(__name__)
+
+
+class TransientJobError(Exception):
+    """A job step failed in a way that is worth retrying"""
+
+
+class JobFailed(Exception):
+    """A job step failed permanently"""
+
+
+def stale_cutoff():
+    """Jobs still 'running' but untouched since then were left by a crashed worker"""
+    return timezone.now() - timedelta(seconds=settings.PAYMENT_JOB_STALE_AFTER)
+
+
+def stale_running():
+    return Q(status='running', updated_at__lt=stale_cutoff())
+
+
+def enqueue_job(kind, payment, idempotency_key=None):
+    """
+    Create a job for ``payment`` and dispatch it once the transaction commits.
+
+    Jobs are deduplicated on their idempotency key: enqueueing a key that
+    already exists returns the existing job without dispatching again.
+    Without an explicit key, the confirmation email gets one key per payment
+    so it is sent at most once; other kinds reuse a job of the same kind that
+    is still in flight and otherwise start a fresh one. A job stuck in
+    'running' by a crashed worker is not in flight: it is passed over, or
+    dispatched again when its key is asked for.
+    """
+    if idempotency_key is None:
+        if kind == PaymentJob.EMAIL:
+            idempotency_key = f"{kind}:{payment.id}"
+        else:
+            active = PaymentJob.objects.filter(
+                payment=payment, kind=kind, status__in=PaymentJob.ACTIVE_STATUSES
+            ).exclude(stale_running()).first()
+            if active is not None:
+                return active
+            idempotency_key = f"{kind}:{payment.id}:{uuid.uuid4().hex}"
+
+    job, created = PaymentJob.objects.get_or_create(
+        idempotency_key=idempotency_key,
+        defaults={'kind': kind, 'payment': payment}
+    )
+    if created or (job.status == 'running' and job.updated_at < stale_cutoff()):
+        transaction.on_commit(lambda: run_payment_job.delay(str(job.id)))
+    return job
+
+
+class PaymentJobTask(Task):
+    autoretry_for = (TransientJobError,)
+    max_retries = settings.PAYMENT_JOB_MAX_RETRIES
+    retry_backoff = True
+    retry_backoff_max = settings.PAYMENT_JOB_RETRY_BACKOFF_MAX
+    retry_jitter = True
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        job_id = args[0] if args else kwargs.get('job_id')
+        PaymentJob.objects.filter(id=job_id).update(
+            status='failed', error=str(exc), updated_at=timezone.now()
+        )
+        logger.error('Payment job %s failed: %s', job_id, exc)
+
+
+@shared_task(bind=True, base=PaymentJobTask)
+def run_payment_job(self, job_id):
+    """Run a queued PaymentJob once, recording its result on the job row"""
+    # A stale 'running' job was claimed by a worker that died; acks_late
+    # redelivers its task, which takes the job over
+    claimed = PaymentJob.objects.filter(Q(status='queued') | stale_running(), id=job_id).update(
+        status='running', attempts=F('attempts') + 1, updated_at=timezone.now()
+    )
+    if not claimed:
+        # Already running elsewhere or finished: redelivery is a no-op
+        return None
+
+    job = PaymentJob.objects.select_related(
+        'payment__booking__listing', 'payment__booking__user'
+    ).get(id=job_id)
+    try:
+        result = JOB_HANDLERS[job.kind](job.payment)
+    except TransientJobError as e:
+        PaymentJob.objects.filter(id=job_id).update(
+            status='queued', error=str(e), updated_at=timezone.now()
+        )
+        raise
+
+    PaymentJob.objects.filter(id=job_id).update(
+        status='succeeded', result=result, error='', updated_at=timezone.now()
+    )
+    return result
+
+
+def _raise_for_result(result):
+    if result.get('retryable'):
+        raise TransientJobError(result['error'])
+    raise JobFailed(result['error'])
+
+
+def initiate_payment(payment):
+    """Create the Chapa checkout for a payment"""
+    result = ChapaService().initiate_payment(
+        booking=payment.booking,
+        amount=float(payment.amount),
+        currency=payment.currency
+    )
+    if not result['success']:
+        _raise_for_result(result)
+    return record_checkout(payment, result)
+
+
+def record_checkout(payment, result):
+    """Store the checkout URL and reference of a successful initiation"""
+    Payment.objects.filter(id=payment.id).update(
+        payment_url=result['payment_url'],
+        chapa_reference=result['reference'],
+        updated_at=timezone.now()
+    )
+    payment.payment_url = result['payment_url']
+    payment.chapa_reference = result['reference']
+    return {'payment_url': result['payment_url'], 'reference': result['reference']}
+
+
+def verify_payment(payment):
+    """Fetch the payment status from Chapa and apply it"""
+    if not payment.chapa_reference:
+        raise JobFailed('No Chapa reference found for this payment')
+
+    result = ChapaService().verify_payment(payment.chapa_reference)
+    if not result['success']:
+        _raise_for_result(result)
+    return apply_verification(payment, result['status'])
+
+
+def apply_verification(payment, chapa_status):
+    """Move a payment and its booking to the state Chapa reported"""
+    apply_chapa_status(payment, chapa_status)
+    booking = payment.booking
+    return {
+        'chapa_status': chapa_status,
+        'payment_status': payment.status,
+        'booking_status': booking.status
+    }
+
+
+def send_confirmation_email(payment):
+    """Send the booking confirmation email for a completed payment"""
+    booking = payment.booking
+    subject = f'Booking Confirmed - {booking.listing.title}'
+    message = f"""
+    Dear {booking.user.username},
+
+    Your booking has been confirmed!
+
+    Booking Details:
+    - Property: {booking.listing.title}
+    - Check-in: {booking.check_in}
+    - Check-out: {booking.check_out}
+    - Total Amount: ${payment.amount}
+
+    Thank you for choosing our service!
+    """
+    try:
+        send_mail(
+            subject,
+            message,
+            settings.DEFAULT_FROM_EMAIL,
+            [booking.user.email],
+        )
+    except Exception as e:
+        raise TransientJobError(f"Error sending confirmation email: {str(e)}")
+    logger.info('Confirmation email sent to %s', booking.user.email)
+    return {'sent_to': booking.user.email}
+
+
+JOB_HANDLERS = {
+    PaymentJob.INITIATE: initiate_payment,
+    PaymentJob.VERIFY: verify_payment,
+    PaymentJob.EMAIL: send_confirmation_email,
+}
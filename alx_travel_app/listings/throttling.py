@@ -0,0 +1,275 @@
+"""
+Token-bucket throttles and load shedding for the API.
+
+Each bucket holds up to N tokens and refills at N per period, so a client
+may burst N requests and then sustain the average rate; a refused request
+gets 429 with the seconds until its next token as ``Retry-After``. Buckets
+are kept per user, per client IP and, for the Chapa-bound payment actions,
+per action across all clients (``payments_endpoint``), with rates from
+``DEFAULT_THROTTLE_RATES`` named ``<scope>_<kind>``. Views pick a scope with
+``throttle_scope``; unscoped views throttle writes only, as ``writes``.
+
+Taking a token is one atomic read-modify-write: under a lock in process
+memory, or as a Lua script when ``THROTTLE_CACHE_ALIAS`` is a Redis cache,
+so every node draws from the same buckets. :class:`ChapaLatencyThrottle`
+and the middleware's :class:`InFlightLimiter` shed load with 503 instead,
+when Chapa is slow or too many requests are already being served.
+"""
+import math
+import threading
+import time
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework import exceptions, status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from .metrics import chapa_latency, requests_shed_total
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# KEYS[1] bucket; ARGV capacity, tokens per second. Returns {allowed, wait}
+# with wait as a string, since Redis truncates Lua numbers to integers.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(state[1]) or capacity
+local at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - at) * rate)
+local allowed, wait = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'20/min' -> (20 tokens, 20/60 tokens per second)"""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class LocalBucketStore:
+    """Buckets in this process's memory, for a single process"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._sweep_at = 1024
+
+    def take(self, key, capacity, rate):
+        """Take a token: ``(True, 0)``, or ``(False, seconds until one is free)``"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, at, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - at) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now, now + (capacity - tokens + 1) / rate)
+                allowed, wait = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+                allowed, wait = False, (1 - tokens) / rate
+            if len(self._buckets) >= self._sweep_at:
+                self._sweep(now)
+        return allowed, wait
+
+    def _sweep(self, now):
+        # A full bucket is the same as no bucket; amortized O(1) per take
+        self._buckets = {key: entry for key, entry in self._buckets.items() if entry[2] > now}
+        self._sweep_at = max(1024, 2 * len(self._buckets))
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketStore:
+    """Buckets in a Redis-compatible server shared by every node"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._script = None
+
+    def take(self, key, capacity, rate):
+        key = self.cache.make_and_validate_key(key)
+        # Django's RedisCache has no public way to run a script; its client
+        # hands out redis-py connections from the cache's own pool
+        client = self.cache._cache.get_client(key, write=True)
+        if self._script is None:
+            self._script = client.register_script(TAKE_SCRIPT)
+        allowed, wait = self._script(keys=[key], args=[capacity, rate], client=client)
+        return bool(allowed), float(wait)
+
+    def clear(self):
+        pattern = self.cache.make_key('throttle:*')
+        client = self.cache._cache.get_client(pattern, write=True)
+        keys = list(client.scan_iter(match=pattern))
+        if keys:
+            client.delete(*keys)
+
+
+_stores = {}
+
+
+def get_store():
+    alias = settings.THROTTLE_CACHE_ALIAS
+    store = _stores.get(alias)
+    if store is None:
+        cache = caches[alias]
+        store = _stores[alias] = (
+            RedisBucketStore(cache) if isinstance(cache, RedisCache) else LocalBucketStore()
+        )
+    return store
+
+
+def reset_buckets():
+    """Refill every bucket, e.g. between tests"""
+    for store in _stores.values():
+        store.clear()
+
+
+class Overloaded(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Service temporarily overloaded, try again later.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait, detail=None):
+        super().__init__(detail)
+        # Sent as Retry-After by DRF's exception handler
+        self.wait = max(1, math.ceil(wait))
+
+
+class BucketThrottle(BaseThrottle):
+    """One token per request from the bucket :meth:`get_bucket` names"""
+
+    kind = None
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            if request.method in SAFE_METHODS:
+                return True
+            scope = 'writes'
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.kind}')
+        bucket = rate and self.get_bucket(request, view)
+        if not bucket:
+            return True
+        allowed, self._wait = get_store().take(f'throttle:{scope}:{bucket}', *parse_rate(rate))
+        if not allowed:
+            requests_shed_total.inc((f'throttle_{self.kind}',))
+        return allowed
+
+    def get_bucket(self, request, view):
+        raise NotImplementedError
+
+    def wait(self):
+        return self._wait
+
+
+class UserBucketThrottle(BucketThrottle):
+    """Per authenticated user; anonymous clients are left to the IP buckets"""
+
+    kind = 'user'
+
+    def get_bucket(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return None
+
+
+class IPBucketThrottle(BucketThrottle):
+    """Per client address (honours ``NUM_PROXIES`` like DRF's throttles)"""
+
+    kind = 'ip'
+
+    def get_bucket(self, request, view):
+        return f'ip:{self.get_ident(request)}'
+
+
+class EndpointBucketThrottle(BucketThrottle):
+    """One bucket per action shared by all clients"""
+
+    kind = 'endpoint'
+
+    def get_bucket(self, request, view):
+        return f'endpoint:{getattr(view, "action", None) or type(view).__name__}'
+
+
+class ChapaLatencyThrottle(BaseThrottle):
+    """Refuse Chapa-bound requests with 503 while recent Chapa calls are slow"""
+
+    def allow_request(self, request, view):
+        threshold = settings.LOAD_SHED_CHAPA_LATENCY_MS
+        wait = threshold and chapa_latency.slow_for(threshold / 1000)
+        if wait:
+            requests_shed_total.inc(('chapa_latency',))
+            raise Overloaded(wait, 'Payment provider is responding slowly, try again later.')
+        return True
+
+
+# Checked in this order up to the first refusal: shedding first, so a shed
+# request spends no tokens, and the shared endpoint bucket last, so requests
+# a client's own buckets refuse cannot drain it for everyone else
+PAYMENT_THROTTLES = [
+    ChapaLatencyThrottle, UserBucketThrottle, IPBucketThrottle, EndpointBucketThrottle
+]
+
+
+def first_refusal(request, view, throttles):
+    """
+    Return the first throttle that refuses the request, or ``None``.
+
+    DRF's ``check_throttles`` asks every throttle even after one refuses, so
+    each bucket would spend a token on a request that is refused anyway.
+    """
+    for throttle in throttles:
+        if not throttle.allow_request(request, view):
+            return throttle
+    return None
+
+
+class FirstRefusalMixin:
+    """Stop checking a view's throttles at the first refusal"""
+
+    def check_throttles(self, request):
+        throttle = first_refusal(request, self, self.get_throttles())
+        if throttle is not None:
+            self.throttled(request, throttle.wait())
+
+
+class InFlightLimiter:
+    """Count the requests this process is serving, refusing more than the limit"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        limit = settings.LOAD_SHED_MAX_IN_FLIGHT
+        with self._lock:
+            if limit and self.count >= limit:
+                return False
+            self.count += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.count -= 1
+
+
+in_flight = InFlightLimiter()
@@ -0,0 +1,192 @@
+"""
+Status transitions for bookings and payments.
+
+Every change is a conditional ``UPDATE ... SET status = <target> WHERE
+status = <source>``, tried for each allowed source (the one the instance
+holds first, so usually once). When two requests race for the same row
+the database lets exactly one of them match; only that caller gets
+``True`` and runs the side effects (releasing nights, confirming the
+booking, updating the analytics rollups, sending ``payment_completed``).
+Nothing here reads a status, decides in Python and writes the whole row
+back.
+"""
+import logging
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from .availability import release_nights
+from .models import Booking, Payment
+from . import analytics
+
+logger = logging.getLogger(__name__)
+
+# Target status -> the statuses it may be entered from
+BOOKING_TRANSITIONS = {
+    'confirmed': ('pending',),
+    'cancelled': ('pending', 'confirmed'),
+}
+PAYMENT_TRANSITIONS = {
+    'completed': ('pending', 'failed'),
+    'failed': ('pending',),
+    'cancelled': ('pending', 'failed', 'completed'),
+}
+TRANSITIONS = {Booking: BOOKING_TRANSITIONS, Payment: PAYMENT_TRANSITIONS}
+
+# Chapa transaction status -> payment status
+PAYMENT_STATUS_FOR_CHAPA = {
+    'success': 'completed',
+    'failed': 'failed',
+}
+
+# Sent inside the transaction, once per payment, by whoever completed it
+payment_completed = Signal()
+
+
+def can_move(instance, target):
+    """
+    Whether ``instance`` may still reach ``target``, judged from memory
+
+    Statuses only move forward: once a row holds a status that is not a
+    source for ``target``, it never holds one again. So a ``False`` here is
+    final even if ``instance`` is stale, and saves the UPDATE; a ``True``
+    still has to win the conditional UPDATE.
+    """
+    return instance.status in TRANSITIONS[type(instance)][target]
+
+
+def move(instance, target):
+    """
+    Move one booking or payment to ``target`` if its stored status allows it
+
+    Returns whether this call made the change. After a lost race
+    ``instance.status`` is refreshed, so callers report what the row holds.
+    """
+    if not can_move(instance, target):
+        return False
+    model = type(instance)
+    now = timezone.now()
+    # Matching one source at a time tells which status the row really left
+    sources = sorted(TRANSITIONS[model][target], key=lambda source: source != instance.status)
+    for source in sources:
+        # The rollups commit (or roll back) with the status change
+        with transaction.atomic(savepoint=False):
+            if not model.objects.filter(pk=instance.pk, status=source).update(
+                    status=target, updated_at=now):
+                continue
+            instance.status = target
+            instance.updated_at = now
+            analytics.record_transition(instance, source, target)
+        return True
+    instance.refresh_from_db(fields=['status'])
+    return False
+
+
+def lock_bookings(**filters):
+    """
+    Row-lock bookings, in pk order, before touching their payments
+
+    Everything that changes a booking and its payment takes the booking
+    first, so cancel and complete racing on one pair cannot deadlock.
+    """
+    if not connection.features.has_select_for_update:
+        return
+    list(Booking.objects.select_for_update().filter(**filters).order_by('pk').values_list('pk'))
+
+
+def confirm_booking(booking):
+    """Confirm a pending booking"""
+    return move(booking, 'confirmed')
+
+
+def cancel_booking(booking):
+    """Cancel a booking, free its nights and cancel its payment"""
+    with transaction.atomic():
+        if not move(booking, 'cancelled'):
+            return False
+        release_nights(booking)
+        try:
+            payment = booking.payment
+        except Payment.DoesNotExist:
+            payment = None
+        if payment is not None:
+            move(payment, 'cancelled')
+    logger.info('Booking %s cancelled', booking.id)
+    return True
+
+
+def complete_payment(payment):
+    """Complete a payment and confirm its booking if that is still pending"""
+    if not can_move(payment, 'completed'):
+        return False
+    with transaction.atomic():
+        lock_bookings(pk=payment.booking_id)
+        if not move(payment, 'completed'):
+            return False
+        move(payment.booking, 'confirmed')
+        payment_completed.send(sender=Payment, payment=payment)
+    logger.info('Payment %s completed successfully', payment.id)
+    return True
+
+
+def fail_payment(payment):
+    """Mark a pending payment failed"""
+    if not move(payment, 'failed'):
+        return False
+    logger.warning('Payment %s failed', payment.id)
+    return True
+
+
+def apply_chapa_status(payment, chapa_status):
+    """
+    Apply a transaction status reported by Chapa to a payment
+
+    Returns the payment status this call moved it to, or ``None`` if the
+    status is not final or the payment can no longer take it.
+    """
+    target = PAYMENT_STATUS_FOR_CHAPA.get(chapa_status)
+    if target == 'completed' and complete_payment(payment):
+        return target
+    if target == 'failed' and fail_payment(payment):
+        return target
+    return None
+
+
+def complete_payments(payment_ids):
+    """
+    Bulk version of :func:`complete_payment`; returns the ids this call moved
+
+    The candidates are locked first so the ids that were moved are known
+    without a query per payment.
+    """
+    sources = PAYMENT_TRANSITIONS['completed']
+    now = timezone.now()
+    with transaction.atomic():
+        lock_bookings(payment__id__in=payment_ids)
+        won = list(
+            Payment.objects.select_for_update()
+            .filter(id__in=payment_ids, status__in=sources)
+            .values_list('id', flat=True)
+        )
+        Payment.objects.filter(id__in=won, status__in=sources).update(
+            status='completed', updated_at=now
+        )
+        # Locked above, so these are exactly the bookings the UPDATE confirms
+        confirmed = set(
+            Booking.objects.filter(
+                payment__id__in=won, status__in=BOOKING_TRANSITIONS['confirmed']
+            ).values_list('id', flat=True)
+        )
+        Booking.objects.filter(id__in=confirmed).update(status='confirmed', updated_at=now)
+        for payment in Payment.objects.filter(id__in=won).select_related('booking'):
+            analytics.record_booking(
+                payment.booking, stays=int(payment.booking_id in confirmed), revenue=payment.amount
+            )
+            payment_completed.send(sender=Payment, payment=payment)
+    return won
+
+
+def fail_payments(payment_ids):
+    """Bulk version of :func:`fail_payment`; returns how many were moved"""
+    return Payment.objects.filter(
+        id__in=payment_ids, status__in=PAYMENT_TRANSITIONS['failed']
+    ).update(status='failed', updated_at=timezone.now())
@@ -1,12 +1,23 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ListingViewSet, BookingViewSet, PaymentViewSet
+from .views import (
+    ListingViewSet, BookingViewSet, PaymentViewSet, PaymentJobViewSet, AuthTokenViewSet
+)
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'listings', ListingViewSet)
 router.register(r'bookings', BookingViewSet, basename='booking')
 router.register(r'payments', PaymentViewSet, basename='payment')
+router.register(r'payment-jobs', PaymentJobViewSet, basename='payment-job')
+router.register(r'auth/token', AuthTokenViewSet, basename='auth-token')
 
 urlpatterns = [
     path('', include(router.urls)),
+    # Inline (non-queued) Chapa calls; serve these from an ASGI worker
+    path('async/bookings/<int:pk>/initiate_payment/', async_views.initiate_payment,
+         name='async-booking-initiate-payment'),
+    path('async/payments/verify/', async_views.verify_payment, name='async-payment-verify'),
+    path('async/payments/<uuid:pk>/check_status/', async_views.check_status,
+         name='async-payment-check-status'),
 ] 
\ No newline at end of file
@@ -1,68 +1,280 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.contrib.auth import authenticate
 from django.shortcuts import get_object_or_404
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import Listing, Booking, Payment
-from .serializers import ListingSerializer, BookingSerializer, PaymentSerializer
-from .chapa_service import ChapaService
+from django.db import transaction
+from .models import AuthToken, Listing, Booking, Payment, PaymentJob
+from .serializers import (
+    ListingSerializer, BookingSerializer, PaymentSerializer, DateRangeSerializer,
+    ListingSearchSerializer, PaymentJobSerializer, BatchQuoteSerializer, QuoteSerializer,
+    ExportQuerySerializer, TokenRequestSerializer, AnalyticsQuerySerializer, NearbyQuerySerializer
+)
+from .authentication import digest, issue_token
+from .export import BOOKING_COLUMNS, PAYMENT_COLUMNS, export_response, filter_export
+from .bulk import (
+    BulkItemsInvalid, create_bookings, create_listings, payment_for, reprice_payment
+)
+from .availability import lock_listing, reserve_nights, sync_nights, unavailable_nights
+from .search import filter_listings, rank_listings
+from .tasks import enqueue_job
+from .transitions import cancel_booking, confirm_booking
+from .analytics import record_update, report as analytics_report
+from . import cache as listing_cache
+from . import geo
+from . import pricing
+from .throttling import PAYMENT_THROTTLES, FirstRefusalMixin, IPBucketThrottle, first_refusal
+from .webhooks import handle_webhook, signature_is_valid
+from .fast_serializers import ValuesListMixin
+from .query_shaping import FieldSelection, QueryShapingMixin
+import copy
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
-class ListingViewSet(viewsets.ModelViewSet):
+class ListingViewSet(FirstRefusalMixin, ValuesListMixin, QueryShapingMixin, viewsets.ModelViewSet):
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    select_related_fields = ['owner']
+    deferred_actions = ('list', 'retrieve', 'search', 'nearby')
+    compact_actions = ('list', 'search', 'nearby')
+
+    def get_queryset(self):
+        return self.shape_queryset(super().get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        return listing_cache.cached_list(
+            request, lambda: super(ListingViewSet, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'fields' in request.query_params or 'expand' in request.query_params:
+            # The detail cache holds the full payload only
+            return super().retrieve(request, *args, **kwargs)
+        return listing_cache.cached_detail(
+            request, kwargs['pk'],
+            lambda: super(ListingViewSet, self).retrieve(request, *args, **kwargs)
+        )
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """Create many listings from an array in one transaction"""
+        try:
+            listings = create_listings(
+                request.data, request.user, self.get_serializer_context()
+            )
+        except BulkItemsInvalid as e:
+            return Response({'errors': e.errors}, status=e.status_code)
+        serializer = self.get_serializer(listings, many=True)
+        return Response({'results': serializer.data}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """Hit ratios of the listing payload cache in this process"""
+        return Response(listing_cache.metrics.snapshot())
+
     @action(detail=True, methods=['get'])
     def bookings(self, request, pk=None):
         listing = self.get_object()
-        bookings = Booking.objects.filter(listing=listing)
-        serializer = BookingSerializer(bookings, many=True)
-        return Response(serializer.data)
+        selection = FieldSelection.from_params(request.query_params, compact=True)
+        bookings = self.shape_queryset(
+            Booking.objects.filter(listing=listing),
+            BookingSerializer,
+            select_related=BookingViewSet.select_related_fields,
+            defer=True,
+            selection=selection
+        )
+        page = self.paginate_queryset(bookings)
+        serializer = BookingSerializer(page, many=True, **selection._asdict())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def available(self, request, pk=None):
+        """Check whether a listing is free for a check_in/check_out window"""
+        listing = self.get_object()
+        query = DateRangeSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        taken = unavailable_nights(
+            listing.id, query.validated_data['check_in'], query.validated_data['check_out']
+        )
+        return Response({
+            'available': not taken,
+            'unavailable_nights': taken
+        })
 
-class BookingViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def quote(self, request, pk=None):
+        """Price a stay: nightly rates, weekend prices, stay discount and taxes"""
+        listing = self.get_object()
+        query = DateRangeSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(QuoteSerializer(
+            pricing.quote(listing, query.validated_data['check_in'], query.validated_data['check_out'])
+        ).data)
+
+    @action(detail=False, methods=['get'], url_path='quote')
+    def batch_quote(self, request):
+        """Price one stay at many listings (?ids=1,2,3) in a fixed number of queries"""
+        query = BatchQuoteSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        ids = query.validated_data['ids']
+        listings = Listing.objects.filter(pk__in=ids).only(
+            'id', 'price', 'weekend_price', 'currency'
+        ).order_by('pk')
+        quotes = pricing.quote_many(
+            listings, query.validated_data['check_in'], query.validated_data['check_out']
+        )
+        found = {listing.id for listing in listings}
+        return Response({
+            'results': QuoteSerializer(quotes, many=True).data,
+            'missing': [pk for pk in ids if pk not in found]
+        })
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def analytics(self, request, pk=None):
+        """Revenue, occupancy and booking counts of a listing per day or month"""
+        listing = self.get_object()
+        if listing.owner_id != request.user.id and not request.user.is_staff:
+            return Response(
+                {'error': 'Only the owner can view listing analytics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        query = AnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = dict(query.validated_data)
+        params.pop('owner', None)
+        report = analytics_report({listing.id: listing.currency}, **params)
+        del report['listings']
+        return Response({'listing_id': listing.id, **report})
+
+    @action(detail=False, methods=['get'], url_path='analytics',
+            permission_classes=[permissions.IsAuthenticated])
+    def owner_analytics(self, request):
+        """The analytics of all of an owner's listings (staff may pass ?owner=)"""
+        query = AnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = dict(query.validated_data)
+        owner_id = params.pop('owner', request.user.id)
+        if owner_id != request.user.id and not request.user.is_staff:
+            return Response(
+                {'error': 'Only staff can view another owner\'s analytics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        listings = Listing.objects.filter(owner_id=owner_id).order_by('pk').values_list(
+            'id', 'title', 'currency'
+        )
+        titles = {pk: title for pk, title, _ in listings}
+        report = analytics_report({pk: currency for pk, _, currency in listings}, **params)
+        report['listings'] = [
+            {'listing_id': pk, 'title': titles[pk], **figures}
+            for pk, figures in report['listings'].items()
+        ]
+        return Response({'owner_id': owner_id, **report})
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Search listings by text, location, price range and availability window"""
+        query = ListingSearchSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = dict(query.validated_data)
+        text = params.pop('q', '').strip()
+        limit = params.pop('limit')
+
+        listings = filter_listings(self.get_queryset(), **params)
+        if text:
+            listings = rank_listings(listings, text)
+        else:
+            listings = listings.order_by('-created_at', '-pk')
+        serializer = self.get_serializer(listings[:limit], many=True)
+        return Response({'results': serializer.data})
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Listings within a radius or bounding box, nearest first, with the search filters"""
+        query = NearbyQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = dict(query.validated_data)
+        point = params.pop('lat'), params.pop('lng')
+        radius_km, bbox = params.pop('radius_km', None), params.pop('bbox', None)
+        limit = params.pop('limit')
+
+        listings = filter_listings(Listing.objects.all(), **params)
+        distances = dict(geo.nearby(listings, *point, radius_km=radius_km, bbox=bbox, limit=limit))
+        page = self.get_queryset().filter(pk__in=distances).in_bulk()
+        results = self.get_serializer([page[pk] for pk in distances], many=True).data
+        for result, km in zip(results, distances.values()):
+            result['distance_km'] = round(km, 3)
+        return Response({'results': results})
+
+class BookingViewSet(FirstRefusalMixin, ValuesListMixin, QueryShapingMixin, viewsets.ModelViewSet):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    select_related_fields = ['user', 'listing__owner', 'payment']
+    # Set per action; see throttling.py
+    throttle_scope = None
 
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return Booking.objects.all()
-        return Booking.objects.filter(user=user)
+            return self.shape_queryset(Booking.objects.all())
+        return self.shape_queryset(Booking.objects.filter(user=user))
 
     def perform_create(self, serializer):
-        booking = serializer.save(user=self.request.user)
+        with transaction.atomic():
+            lock_listing(serializer.validated_data['listing'].id)
+            booking = serializer.save(user=self.request.user)
+            reserve_nights(booking)
         # Create payment record for the booking
         self._create_payment_for_booking(booking)
 
+    def perform_update(self, serializer):
+        listing = serializer.validated_data.get('listing', serializer.instance.listing)
+        before = copy.copy(serializer.instance)
+        with transaction.atomic():
+            lock_listing(listing.id)
+            booking = serializer.save()
+            stay = (booking.listing_id, booking.check_in, booking.check_out)
+            if stay != (before.listing_id, before.check_in, before.check_out):
+                # The payment was priced for the old stay
+                reprice_payment(booking)
+            sync_nights(booking)
+            record_update(before, booking)
+
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """Create many bookings with their payments from an array in one transaction"""
+        try:
+            bookings = create_bookings(
+                request.data, request.user, self.get_serializer_context()
+            )
+        except BulkItemsInvalid as e:
+            return Response({'errors': e.errors}, status=e.status_code)
+        serializer = self.get_serializer(bookings, many=True)
+        return Response({'results': serializer.data}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream bookings with their listing, guest and payment as CSV or NDJSON"""
+        return stream_export(request, self.get_queryset(), Booking, BOOKING_COLUMNS, 'bookings')
+
     def _create_payment_for_booking(self, booking):
         """Create a payment record for a booking"""
         try:
-            # Calculate total amount based on nights and listing price
-            nights = (booking.check_out - booking.check_in).days
-            total_amount = booking.listing.price * nights
-            
-            payment = Payment.objects.create(
-                booking=booking,
-                amount=total_amount,
-                currency='USD'
-            )
-            logger.info(f"Payment record created for booking {booking.id}")
+            # Total amount is the listing price times the number of nights
+            payment_for(booking).save()
+            logger.info('Payment record created for booking %s', booking.id)
         except Exception as e:
-            logger.error(f"Error creating payment for booking {booking.id}: {str(e)}")
+            logger.error('Error creating payment for booking %s: %s', booking.id, e)
 
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
         booking = self.get_object()
-        if booking.status == 'pending':
-            booking.status = 'confirmed'
-            booking.save()
+        if confirm_booking(booking):
             return Response({'status': 'booking confirmed'})
         return Response(
             {'error': 'Booking cannot be confirmed'},
@@ -72,22 +284,17 @@ class BookingViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         booking = self.get_object()
-        if booking.status != 'cancelled':
-            booking.status = 'cancelled'
-            booking.save()
-            # Update payment status if exists
-            if hasattr(booking, 'payment'):
-                booking.payment.status = 'cancelled'
-                booking.payment.save()
+        if cancel_booking(booking):
             return Response({'status': 'booking cancelled'})
         return Response(
             {'error': 'Booking is already cancelled'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_scope='payments',
+            throttle_classes=PAYMENT_THROTTLES)
     def initiate_payment(self, request, pk=None):
-        """Initiate payment for a booking using Chapa API"""
+        """Queue payment initiation for a booking using Chapa API"""
         booking = self.get_object()
         
         # Check if payment already exists
@@ -101,99 +308,106 @@ class BookingViewSet(viewsets.ModelViewSet):
         # Create payment if it doesn't exist
         if not hasattr(booking, 'payment'):
             self._create_payment_for_booking(booking)
+            if not hasattr(booking, 'payment'):
+                return Response({
+                    'error': 'Failed to create payment for booking'
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        # Initiate payment with Chapa
-        chapa_service = ChapaService()
-        result = chapa_service.initiate_payment(
-            booking=booking,
-            amount=float(booking.payment.amount),
-            currency=booking.payment.currency
+        job = enqueue_job(
+            PaymentJob.INITIATE, booking.payment, idempotency_key(request, PaymentJob.INITIATE)
         )
-        
-        if result['success']:
-            # Update payment record with Chapa response
-            booking.payment.payment_url = result['payment_url']
-            booking.payment.chapa_reference = result['reference']
-            booking.payment.save()
-            
-            return Response({
-                'message': 'Payment initiated successfully',
-                'payment_url': result['payment_url'],
-                'payment_id': str(booking.payment.id),
-                'reference': result['reference']
-            })
-        else:
-            return Response({
-                'error': 'Failed to initiate payment',
-                'details': result['error']
-            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': 'Payment initiation queued',
+            'payment_id': str(booking.payment.id),
+            'job_id': str(job.id),
+            'job_status': job.status
+        }, status=status.HTTP_202_ACCEPTED)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+def stream_export(request, queryset, model, columns, filename):
+    """Validate the export query string and stream the filtered rows"""
+    query = ExportQuerySerializer(
+        data=request.query_params,
+        context={'statuses': [value for value, _ in model._meta.get_field('status').choices]}
+    )
+    query.is_valid(raise_exception=True)
+    params = dict(query.validated_data)
+    output = params.pop('output')
+    return export_response(request, filter_export(queryset, **params), columns, output, filename)
+
+
+class PaymentViewSet(FirstRefusalMixin, ValuesListMixin, QueryShapingMixin, viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = None
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_staff:
-            return Payment.objects.all()
-        return Payment.objects.filter(booking__user=user)
+        payments = Payment.objects.all() if user.is_staff else Payment.objects.filter(
+            booking__user=user
+        )
+        # The serializer renders no booking fields; only check_status reads one
+        select_related = ['booking'] if self.action == 'check_status' else None
+        return self.shape_queryset(payments, select_related=select_related)
 
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream payments with their booking, listing and guest as CSV or NDJSON"""
+        return stream_export(request, self.get_queryset(), Payment, PAYMENT_COLUMNS, 'payments')
+
+    @action(detail=False, methods=['post'], throttle_scope='payments',
+            throttle_classes=PAYMENT_THROTTLES)
     def verify(self, request):
-        """Verify payment status from Chapa callback"""
-        try:
-            reference = request.data.get('reference')
-            if not reference:
-                return Response({
-                    'error': 'Reference is required'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Find payment by reference
-            payment = get_object_or_404(Payment, chapa_reference=reference)
-            
-            # Verify with Chapa API
-            chapa_service = ChapaService()
-            result = chapa_service.verify_payment(reference)
-            
-            if result['success']:
-                chapa_status = result['status']
-                
-                # Update payment status based on Chapa response
-                if chapa_status == 'success':
-                    payment.status = 'completed'
-                    payment.save()
-                    
-                    # Update booking status
-                    booking = payment.booking
-                    booking.status = 'confirmed'
-                    booking.save()
-                    
-                    # Send confirmation email
-                    self._send_confirmation_email(booking)
-                    
-                    logger.info(f"Payment {payment.id} completed successfully")
-                    
-                elif chapa_status == 'failed':
-                    payment.status = 'failed'
-                    payment.save()
-                    logger.warning(f"Payment {payment.id} failed")
-                
-                return Response({
-                    'message': 'Payment verification completed',
-                    'payment_status': payment.status,
-                    'booking_status': payment.booking.status
-                })
-            else:
+        """Queue payment verification for a Chapa callback"""
+        reference = request.data.get('reference')
+        if not reference:
+            return Response({
+                'error': 'Reference is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Callers can only have their own payments verified
+        payment = get_object_or_404(self.get_queryset(), chapa_reference=reference)
+        job = enqueue_job(PaymentJob.VERIFY, payment, idempotency_key(request, PaymentJob.VERIFY))
+        return Response({
+            'message': 'Payment verification queued',
+            'payment_id': str(payment.id),
+            'payment_status': payment.status,
+            'job_id': str(job.id),
+            'job_status': job.status
+        }, status=status.HTTP_202_ACCEPTED)
+
+    # Signed deliveries are never throttled (Chapa retries refused ones, but
+    # late); unsigned ones draw from a per-address bucket, checked in the body
+    @action(detail=False, methods=['get', 'post'], permission_classes=[permissions.AllowAny],
+            authentication_classes=[], throttle_classes=[], throttle_scope='webhooks')
+    def webhook(self, request):
+        """Ingest a Chapa webhook delivery, or the checkout's callback"""
+        # The signature covers the raw bytes, so read them before parsing
+        body = request.body
+        trusted = request.method == 'POST' and signature_is_valid(body, request.headers)
+        if not trusted:
+            throttle = first_refusal(request, self, [IPBucketThrottle()])
+            if throttle is not None:
+                self.throttled(request, throttle.wait())
+        if request.method == 'GET':
+            # The callback_url of a checkout is requested with the reference
+            # as trx_ref; it is unsigned, so all it can do is queue a verify
+            payload = {'tx_ref': request.query_params.get('trx_ref')}
+        else:
+            try:
+                payload = json.loads(body)
+            except ValueError:
                 return Response({
-                    'error': 'Payment verification failed',
-                    'details': result['error']
+                    'error': 'Invalid JSON payload'
                 }, status=status.HTTP_400_BAD_REQUEST)
-                
-        except Exception as e:
-            logger.error(f"Error in payment verification: {str(e)}")
+        # Signed or not, tx_ref is what the delivery is looked up and deduplicated by
+        tx_ref = payload.get('tx_ref') if isinstance(payload, dict) else None
+        if not tx_ref or not isinstance(tx_ref, str):
             return Response({
-                'error': 'Internal server error'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'error': 'tx_ref is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        outcome = handle_webhook(payload, trusted)
+        return Response({'status': outcome})
 
     @action(detail=False, methods=['get'])
     def success(self, request):
@@ -210,38 +424,10 @@ class PaymentViewSet(viewsets.ModelViewSet):
             'message': 'Payment completed'
         })
 
-    def _send_confirmation_email(self, booking):
-        """Send confirmation email to user"""
-        try:
-            subject = f'Booking Confirmed - {booking.listing.title}'
-            message = f"""
-            Dear {booking.user.username},
-            
-            Your booking has been confirmed!
-            
-            Booking Details:
-            - Property: {booking.listing.title}
-            - Check-in: {booking.check_in}
-            - Check-out: {booking.check_out}
-            - Total Amount: ${booking.payment.amount}
-            
-            Thank you for choosing our service!
-            """
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [booking.user.email],
-                fail_silently=True,
-            )
-            logger.info(f"Confirmation email sent to {booking.user.email}")
-        except Exception as e:
-            logger.error(f"Error sending confirmation email: {str(e)}")
-
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_scope='payments',
+            throttle_classes=PAYMENT_THROTTLES)
     def check_status(self, request, pk=None):
-        """Manually check payment status"""
+        """Queue a manual payment status check"""
         payment = self.get_object()
         
         if not payment.chapa_reference:
@@ -249,32 +435,64 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 'error': 'No Chapa reference found for this payment'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        chapa_service = ChapaService()
-        result = chapa_service.verify_payment(payment.chapa_reference)
-        
-        if result['success']:
-            chapa_status = result['status']
-            
-            # Update payment status
-            if chapa_status == 'success' and payment.status != 'completed':
-                payment.status = 'completed'
-                payment.save()
-                
-                # Update booking status
-                booking = payment.booking
-                booking.status = 'confirmed'
-                booking.save()
-                
-                # Send confirmation email
-                self._send_confirmation_email(booking)
-            
-            return Response({
-                'payment_status': payment.status,
-                'chapa_status': chapa_status,
-                'booking_status': payment.booking.status
-            })
-        else:
-            return Response({
-                'error': 'Failed to check payment status',
-                'details': result['error']
-            }, status=status.HTTP_400_BAD_REQUEST) 
\ No newline at end of file
+        job = enqueue_job(PaymentJob.VERIFY, payment, idempotency_key(request, PaymentJob.VERIFY))
+        return Response({
+            'payment_status': payment.status,
+            'booking_status': payment.booking.status,
+            'job_id': str(job.id),
+            'job_status': job.status
+        }, status=status.HTTP_202_ACCEPTED)
+
+class PaymentJobViewSet(FirstRefusalMixin, viewsets.ReadOnlyModelViewSet):
+    """Poll the state and result of background payment jobs"""
+    serializer_class = PaymentJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff:
+            return PaymentJob.objects.all()
+        return PaymentJob.objects.filter(payment__booking__user=user)
+
+class AuthTokenViewSet(FirstRefusalMixin, viewsets.ViewSet):
+    """Exchange a username and password for an API token, and revoke it"""
+    permission_classes = [permissions.AllowAny]
+
+    def create(self, request):
+        credentials = TokenRequestSerializer(data=request.data)
+        credentials.is_valid(raise_exception=True)
+        user = authenticate(request, **credentials.validated_data)
+        if user is None:
+            return Response(
+                {'error': 'Invalid username or password'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        key, token = issue_token(user)
+        return Response(
+            {'token': key, 'expires_at': token.expires_at},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def revoke(self, request):
+        """Revoke the token of this request, or with ?all=true every token of the user"""
+        tokens = AuthToken.objects.filter(user=request.user)
+        if request.query_params.get('all') != 'true':
+            if not isinstance(request.auth, str):
+                return Response(
+                    {'error': 'Request was not authenticated with a token'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            tokens = tokens.filter(digest=digest(request.auth))
+        # Deleted one by one, so the post_delete signal marks each as revoked
+        revoked, _ = tokens.delete()
+        return Response({'revoked': revoked})
+
+
+def idempotency_key(request, kind):
+    """Scope a client-supplied Idempotency-Key header to the job kind and caller"""
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        return None
+    caller = request.user.pk if request.user.is_authenticated else 'anon'
+    return f"{kind}:{caller}:{key}"[:255]
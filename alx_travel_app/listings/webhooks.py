@@ -0,0 +1,100 @@
+import hashlib
+import hmac
+import logging
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .models import Payment, PaymentEvent, PaymentJob
+from .tasks import enqueue_job
+from .transitions import apply_chapa_status
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADERS = ('X-Chapa-Signature', 'Chapa-Signature')
+
+
+def signature_is_valid(body: bytes, headers) -> bool:
+    """Check the HMAC-SHA256 signature Chapa computes over the raw body"""
+    secret = settings.CHAPA_WEBHOOK_SECRET
+    if not secret:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    for header in SIGNATURE_HEADERS:
+        signature = headers.get(header)
+        if signature and hmac.compare_digest(signature, expected):
+            return True
+    return False
+
+
+def event_id_for(payload: dict) -> str:
+    """
+    Chapa does not always send an event id; derive a stable one if needed.
+
+    Built from ``tx_ref``, the reference deliveries are looked up and
+    deduplicated by, not from Chapa's own ``reference``.
+    """
+    if payload.get('id'):
+        return str(payload['id'])
+    return f"{payload.get('event', '')}:{payload['tx_ref']}:{payload.get('status', '')}"
+
+
+def record_event(payload: dict):
+    """
+    Store a signed webhook delivery, returning ``None`` if it was already seen.
+
+    Deduplication rides on the unique (chapa_reference, event_id) index, so
+    a redelivered event costs one failed insert and nothing else.
+    """
+    reference = payload['tx_ref']
+    try:
+        with transaction.atomic():
+            return PaymentEvent.objects.create(
+                payment=Payment.objects.filter(chapa_reference=reference).first(),
+                chapa_reference=reference,
+                event_id=event_id_for(payload)[:255],
+                event_type=str(payload.get('event', ''))[:50],
+                status=str(payload.get('status', ''))[:20],
+                payload=payload,
+                trusted=True,
+            )
+    except IntegrityError:
+        return None
+
+
+def apply_event(event):
+    """
+    Move the payment forward according to a trusted event.
+
+    Goes through the transitions module, so an event can only advance a
+    payment from the states allowed there; stale or reordered events are
+    no-ops. Returns the new payment status, or ``None`` if nothing changed.
+    """
+    if event.payment_id is None:
+        return None
+    new_status = apply_chapa_status(event.payment, event.status)
+    if new_status is not None:
+        logger.info('Payment %s moved to %s by webhook', event.payment_id, new_status)
+    return new_status
+
+
+def handle_webhook(payload: dict, trusted: bool):
+    """
+    Record a webhook delivery and act on it; returns a short outcome string.
+
+    ``trusted`` is whether :func:`signature_is_valid` accepted the delivery.
+    The payload must carry a ``tx_ref``; the view answers 400 without one.
+    """
+    if not trusted:
+        # Unsigned or badly signed: ask Chapa instead of believing the payload.
+        # Nothing is recorded, so a forged delivery cannot take the dedupe
+        # slot of the genuine event it imitates.
+        payment = Payment.objects.filter(chapa_reference=payload['tx_ref']).first()
+        if payment is None:
+            return 'unknown_reference'
+        enqueue_job(PaymentJob.VERIFY, payment)
+        return 'verifying'
+    event = record_event(payload)
+    if event is None:
+        return 'duplicate'
+    if event.payment_id is None:
+        return 'unknown_reference'
+    return 'applied' if apply_event(event) else 'ignored'
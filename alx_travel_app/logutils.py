@@ -0,0 +1,134 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON object per line, including ``extra`` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+            .isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep one in every ``1 / rate`` records of chatty loggers.
+
+    ``rates`` maps logger names to the share of records to keep; child
+    loggers inherit their parent's rate. Only records at ``max_level`` or
+    below are sampled, so warnings and errors always get through. Kept
+    records carry ``sample_rate`` so aggregates can be scaled back up.
+    """
+
+    def __init__(self, rates=None, max_level='INFO'):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.max_level = logging._checkLevel(max_level)
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return None
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        rate = self.rate_for(record.name)
+        if rate is None or rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        # Deterministic 1-in-N per logger and message, so rare messages are not starved
+        key = (record.name, record.msg)
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        if seen % round(1 / rate):
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Hand records to a background thread that runs the real handlers.
+
+    Logging calls on request threads only format the message and put the
+    record on an in-memory queue; file writes and console output happen on
+    the listener thread. The listener is stopped (and drained) at exit and
+    restarted in forked children such as Celery prefork workers.
+    """
+
+    def __init__(self, handlers, maxsize=10000, respect_handler_level=True):
+        super().__init__(queue.Queue(maxsize))
+        self.handlers = [handlers[i] for i in range(len(handlers))]
+        self.respect_handler_level = respect_handler_level
+        self.dropped = 0
+        self.listener = None
+        self._start()
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def _start(self):
+        self.listener = QueueListener(
+            self.queue, *self.handlers, respect_handler_level=self.respect_handler_level
+        )
+        self.listener.start()
+
+    def _restart_in_child(self):
+        # The listener thread does not survive fork; records queued since are lost
+        self.queue = queue.Queue(self.queue.maxsize)
+        self._start()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on logging; count what was shed instead
+            self.dropped += 1
+
+    def stop(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        # Logging is being reconfigured or shut down: drain and end the thread
+        self.stop()
+        super().close()
+
+    def flush(self):
+        """Wait until every queued record has been handled"""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+            self.listener.start()
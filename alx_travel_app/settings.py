@@ -1,5 +1,6 @@
 import os
 import environ
+from decimal import Decimal
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'alx_travel_app.listings.middleware.InstrumentationMiddleware',
+    'alx_travel_app.listings.middleware.LoadSheddingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -66,6 +69,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'alx_travel_app.wsgi.application'
+ASGI_APPLICATION = 'alx_travel_app.asgi.application'
+
+# Drops the console copy of the logs while the suite runs
+TEST_RUNNER = 'alx_travel_app.test_runner.TestRunner'
 
 # Database
 DATABASES = {
@@ -79,6 +86,22 @@ DATABASES = {
     }
 }
 
+# Cache
+# locmem by default; set CACHE_URL=redis://host:6379/1 (or any Redis-compatible
+# server) in production so all workers share one cache
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+}
+
+# Sessions are read from the cache and written through to the database, so
+# session-authenticated requests skip the django_session table
+SESSION_ENGINE = env('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = env('SESSION_CACHE_ALIAS', default='default')
+
+# Serialized listing payloads (detail and list pages)
+LISTING_CACHE_ALIAS = env('LISTING_CACHE_ALIAS', default='default')
+LISTING_CACHE_TIMEOUT = env.int('LISTING_CACHE_TIMEOUT', default=300)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -107,43 +130,213 @@ STATIC_URL = '/static/'
 
 # Django REST Framework
 REST_FRAMEWORK = {
+    # Views open to anonymous clients (token exchange, webhooks) say so themselves
     'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.AllowAny',
+        'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'alx_travel_app.listings.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'alx_travel_app.listings.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # Token buckets on writes; the Chapa-bound payment actions add their own
+    # (see listings/throttling.py). A rate of N/period is a bucket of N
+    # requests refilled evenly over the period.
+    'DEFAULT_THROTTLE_CLASSES': [
+        'alx_travel_app.listings.throttling.UserBucketThrottle',
+        'alx_travel_app.listings.throttling.IPBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'writes_user': env('THROTTLE_WRITES_USER', default='300/min'),
+        'writes_ip': env('THROTTLE_WRITES_IP', default='600/min'),
+        'payments_user': env('THROTTLE_PAYMENTS_USER', default='20/min'),
+        'payments_ip': env('THROTTLE_PAYMENTS_IP', default='60/min'),
+        # All clients together, per action: what we are willing to send Chapa
+        'payments_endpoint': env('THROTTLE_PAYMENTS_ENDPOINT', default='600/min'),
+        # Unsigned webhook deliveries per client address; signed ones are not throttled
+        'webhooks_ip': env('THROTTLE_WEBHOOKS_IP', default='30/min'),
+    },
 }
+# HTTP Basic runs a full password hash on every request; only for clients
+# that cannot move to tokens yet
+if env.bool('API_BASIC_AUTH', default=False):
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'].append(
+        'rest_framework.authentication.BasicAuthentication'
+    )
+# orjson-backed renderer and parser; same output as DRF's JSON classes, and
+# they fall back to them when orjson is not installed
+if env.bool('API_FAST_JSON', default=True):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'alx_travel_app.listings.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'alx_travel_app.listings.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+# Build list responses straight from values() rows where the serializer allows it
+API_VALUES_FAST_PATH = env.bool('API_VALUES_FAST_PATH', default=True)
+
+# Largest array accepted by the bulk_create actions
+BULK_CREATE_MAX_ITEMS = env.int('BULK_CREATE_MAX_ITEMS', default=5000)
+BULK_CREATE_BATCH_SIZE = env.int('BULK_CREATE_BATCH_SIZE', default=500)
+
+# Longest stay a booking or quote may cover; a booking stores a row per night
+BOOKING_MAX_NIGHTS = env.int('BOOKING_MAX_NIGHTS', default=365)
+
+# API tokens: lifetime in seconds (30 days), and the per-process cache of
+# resolved tokens (entries, seconds before a token is re-read from the
+# database) plus the shared cache alias that carries revocations; it must be
+# shared by every worker (not locmem), which check --deploy enforces
+AUTH_TOKEN_TTL = env.int('AUTH_TOKEN_TTL', default=30 * 24 * 3600)
+AUTH_TOKEN_CACHE_SIZE = env.int('AUTH_TOKEN_CACHE_SIZE', default=10000)
+AUTH_TOKEN_CACHE_TTL = env.int('AUTH_TOKEN_CACHE_TTL', default=60)
+AUTH_TOKEN_CACHE_ALIAS = env('AUTH_TOKEN_CACHE_ALIAS', default='default')
+
+# Rows per query of the streaming CSV/NDJSON exports
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=2000)
+
+# Stay pricing: tax percentage added to every quote, the weekdays whose
+# nights take a listing's weekend price (Monday=0, so Friday and Saturday
+# nights by default) and the most listings one batch quote may price
+PRICING_TAX_RATE = Decimal(env('PRICING_TAX_RATE', default='0'))
+PRICING_WEEKEND_DAYS = tuple(env.list('PRICING_WEEKEND_DAYS', cast=int, default=[4, 5]))
+PRICING_BATCH_MAX_LISTINGS = env.int('PRICING_BATCH_MAX_LISTINGS', default=100)
+
+# Nearby search: the most geohash ranges one query may scan (fewer, coarser
+# cells read more rows) and the widest radius accepted
+GEO_MAX_CELLS = env.int('GEO_MAX_CELLS', default=16)
+GEO_MAX_RADIUS_KM = env.float('GEO_MAX_RADIUS_KM', default=500.0)
+
+# Longest date range one analytics request may cover
+ANALYTICS_MAX_DAYS = env.int('ANALYTICS_MAX_DAYS', default=731)
 
 # CORS
 CORS_ALLOW_ALL_ORIGINS = True
 
-# Celery Configuration (for future use)
+# Chapa API client
+CHAPA_BASE_URL = env('CHAPA_BASE_URL', default='https://api.chapa.co/v1')
+CHAPA_CONNECT_TIMEOUT = env.float('CHAPA_CONNECT_TIMEOUT', default=3.05)
+CHAPA_READ_TIMEOUT = env.float('CHAPA_READ_TIMEOUT', default=15.0)
+CHAPA_POOL_SIZE = env.int('CHAPA_POOL_SIZE', default=20)
+# Concurrent connections per event loop for the async client used by /api/async/
+CHAPA_ASYNC_MAX_CONNECTIONS = env.int('CHAPA_ASYNC_MAX_CONNECTIONS', default=100)
+CHAPA_MAX_RETRIES = env.int('CHAPA_MAX_RETRIES', default=3)
+CHAPA_BACKOFF_BASE = env.float('CHAPA_BACKOFF_BASE', default=0.25)
+CHAPA_BACKOFF_MAX = env.float('CHAPA_BACKOFF_MAX', default=4.0)
+CHAPA_BREAKER_THRESHOLD = env.int('CHAPA_BREAKER_THRESHOLD', default=5)
+CHAPA_BREAKER_RESET_TIMEOUT = env.float('CHAPA_BREAKER_RESET_TIMEOUT', default=30.0)
+# Webhook signing secret from the Chapa dashboard; unsigned events are re-verified
+CHAPA_WEBHOOK_SECRET = env('CHAPA_WEBHOOK_SECRET', default='')
+
+# Celery Configuration
+# Payment initiation, verification and confirmation emails run as Celery
+# tasks. Set CELERY_TASK_ALWAYS_EAGER=True to run them in-process without a
+# broker, or point CELERY_BROKER_URL at memory:// for a local broker.
 CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='amqp://localhost')
+CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=False)
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_IGNORE_RESULT = True
+
+# Retry policy for payment jobs (PaymentJob rows are the results store)
+PAYMENT_JOB_MAX_RETRIES = env.int('PAYMENT_JOB_MAX_RETRIES', default=5)
+PAYMENT_JOB_RETRY_BACKOFF_MAX = env.int('PAYMENT_JOB_RETRY_BACKOFF_MAX', default=300)
+# A job left 'running' this many seconds by a crashed worker is taken over by
+# the next delivery of its task; keep it well above the Chapa timeouts
+PAYMENT_JOB_STALE_AFTER = env.int('PAYMENT_JOB_STALE_AFTER', default=600)
+
+# Token buckets live in this cache when it is Redis (shared by every node,
+# updated atomically by a Lua script) and in process memory otherwise
+THROTTLE_ENABLED = env.bool('THROTTLE_ENABLED', default=True)
+THROTTLE_CACHE_ALIAS = env('THROTTLE_CACHE_ALIAS', default='default')
+
+# Load shedding, per process: answer 503 with Retry-After once this many
+# requests are in flight (0 disables it), and refuse the Chapa-bound actions
+# while recent Chapa calls average over LOAD_SHED_CHAPA_LATENCY_MS (0
+# disables it); that verdict stands for at most LOAD_SHED_CHAPA_WINDOW
+# seconds after the last call, then requests are let through to re-measure
+LOAD_SHED_MAX_IN_FLIGHT = env.int('LOAD_SHED_MAX_IN_FLIGHT', default=256)
+LOAD_SHED_CHAPA_LATENCY_MS = env.float('LOAD_SHED_CHAPA_LATENCY_MS', default=5000.0)
+LOAD_SHED_CHAPA_WINDOW = env.float('LOAD_SHED_CHAPA_WINDOW', default=30.0)
+LOAD_SHED_RETRY_AFTER = env.int('LOAD_SHED_RETRY_AFTER', default=2)
+LOAD_SHED_EXEMPT_PATHS = tuple(env.list('LOAD_SHED_EXEMPT_PATHS', default=['/metrics']))
+
+# Request instrumentation, exposed in Prometheus format on /metrics.
+# Only staff may read it, or scrapers sending "Authorization: Bearer <token>"
+# once METRICS_TOKEN is set.
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+# Share of requests that keep their query list for the slow-request log (0 disables it)
+SLOW_REQUEST_SAMPLE_RATE = env.float('SLOW_REQUEST_SAMPLE_RATE', default=0.0)
+SLOW_REQUEST_THRESHOLD_MS = env.float('SLOW_REQUEST_THRESHOLD_MS', default=500.0)
 
 # Logging configuration
+# Loggers hand records to a queue; a background thread formats them as JSON
+# lines and writes them to the console and a rotating file, so requests never
+# block on log I/O. Chatty success messages are sampled (see LOG_SAMPLING).
+LOG_LEVEL = env('LOG_LEVEL', default='INFO')
+LOG_FILE = env('LOG_FILE', default=os.path.join(BASE_DIR, 'debug.log'))
+LOG_FILE_MAX_BYTES = env.int('LOG_FILE_MAX_BYTES', default=10 * 1024 * 1024)
+LOG_FILE_BACKUP_COUNT = env.int('LOG_FILE_BACKUP_COUNT', default=5)
+LOG_QUEUE_SIZE = env.int('LOG_QUEUE_SIZE', default=10000)
+# Copy the logs to the console as well as the file; the test runner turns
+# this off, since the suite logs expected failures on purpose
+LOG_CONSOLE = env.bool('LOG_CONSOLE', default=True)
+# Share of INFO records kept per logger; warnings and errors are never sampled
+LOG_SAMPLING = {
+    'alx_travel_app.listings.chapa_service': env.float('LOG_SAMPLE_CHAPA', default=0.1),
+    'celery.app.trace': env.float('LOG_SAMPLE_CELERY_TASKS', default=0.1),
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'alx_travel_app.logutils.JsonFormatter',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'alx_travel_app.logutils.SamplingFilter',
+            'rates': LOG_SAMPLING,
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
+            'formatter': 'json',
         },
         'file': {
-            'class': 'logging.FileHandler',
-            'filename': 'debug.log',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': LOG_FILE,
+            'maxBytes': LOG_FILE_MAX_BYTES,
+            'backupCount': LOG_FILE_BACKUP_COUNT,
+            'formatter': 'json',
+            'delay': True,
+        },
+        # Configured after the handlers it wraps (handlers are set up by name)
+        'queue': {
+            '()': 'alx_travel_app.logutils.QueueListenerHandler',
+            'handlers': (
+                ['cfg://handlers.console', 'cfg://handlers.file'] if LOG_CONSOLE
+                else ['cfg://handlers.file']
+            ),
+            'maxsize': LOG_QUEUE_SIZE,
+            'filters': ['sampling'],
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
-        'level': 'INFO',
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
-            'level': 'INFO',
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
             'propagate': False,
         },
     },
-} 
\ No newline at end of file
+}
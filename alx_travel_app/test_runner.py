@@ -0,0 +1,25 @@
+import copy
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.utils.log import configure_logging
+
+CONSOLE = 'cfg://handlers.console'
+
+
+class TestRunner(DiscoverRunner):
+    """
+    The default runner without the console copy of the logs.
+
+    The suite logs failures on purpose (Chapa outages, rejected webhooks),
+    so only the log file keeps them while it runs. ``settings.LOGGING``
+    itself is changed, so a later ``django.setup()`` keeps it that way.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        logging_config = copy.deepcopy(settings.LOGGING)
+        queue = logging_config['handlers']['queue']
+        if CONSOLE in queue['handlers']:
+            queue['handlers'] = [name for name in queue['handlers'] if name != CONSOLE]
+            settings.LOGGING = logging_config
+            configure_logging(settings.LOGGING_CONFIG, settings.LOGGING)